@@ -18,6 +18,9 @@ use ieee.std_logic_textio.all;
 use ieee.numeric_std.all;
 
 entity i2s_loopback_filter_squarewave_tb is
+  generic (
+    LOG_FILE : string := "C:/Users/ASUS/Desktop/TRIOSSI/final_project/i2s_pMod_HowToUse_2/log_simulations/fir_squarewave_sim_logs.csv"
+  );
 end;
 
 
@@ -126,7 +129,7 @@ begin
   -- 2) Apertura file all'avvio (dopo il reset)
   open_file: process
   begin
-    file_open(fcsv, string'("C:/Users/ASUS/Desktop/TRIOSSI/final_project/i2s_pMod_HowToUse_2/log_simulations/fir_squarewave_sim_logs.csv"), write_mode);
+    file_open(fcsv, LOG_FILE, write_mode);
     wait; -- resta aperto per tutta la sim
   end process;
   
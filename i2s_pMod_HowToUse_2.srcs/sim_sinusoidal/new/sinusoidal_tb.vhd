@@ -12,6 +12,9 @@ use ieee.std_logic_textio.all;  -- to write std_logic_vector/signed
 use std.env.all; -- for stop()
 
 entity fir_filter_4_24bit_tb is
+  generic (
+    LOG_FILE : string := "C:/Users/ASUS/Desktop/TRIOSSI/final_project/i2s_pMod_HowToUse_2/log_simulations/fir_sinusoidal_sim_logs.csv"
+  );
 end;
 
 architecture tb of fir_filter_4_24bit_tb is
@@ -39,7 +42,7 @@ architecture tb of fir_filter_4_24bit_tb is
   constant CLK_PERIOD : time := CLK_T_NS_i * 1 ns;
 
   -- for logging input and output 
-  file fcsv : text open write_mode is "C:/Users/ASUS/Desktop/TRIOSSI/final_project/i2s_pMod_HowToUse_2/log_simulations/fir_sinusoidal_sim_logs.csv";
+  file fcsv : text open write_mode is LOG_FILE; -- override with -generic_top to run several simulations at once
   signal sample_idx : integer := 0;
 
   
@@ -0,0 +1,124 @@
+-- ============================================================
+-- Testbench behavior summary
+-- ============================================================
+-- Standalone test of fir_MA driven by a stimulus vector file exported from Python
+-- (scripts/vectors.py): one sample per line, hex (HEX_FORMAT = true) or binary text,
+-- DATA_W-bit two's complement. One sample enters the filter at every clock (1 tick = 1 sample,
+-- as in sinusoidal_tb.vhd) and input/output are logged to a CSV with the same columns as
+-- fir_sinusoidal_sim_logs.csv, so the Python analysis reads it as it is.
+--
+-- Long runs are split in shards (one vector file each) that can run in separate simulator
+-- processes: the paths are generics, e.g. with xsim
+--   xelab fir_vectors_tb -generic_top "VECTOR_FILE=sine_0003.hex" -generic_top "LOG_FILE=sine_0003_out.csv" ...
+-- vectors.py merges the shard logs back into one CSV.
+-- ============================================================
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+use std.textio.all;
+use ieee.std_logic_textio.all;  -- hread/read of std_logic_vector
+use std.env.all; -- for stop()
+
+entity fir_vectors_tb is
+  generic (
+    VECTOR_FILE : string  := "../../../../log_simulations/vectors/sine_0000.hex";
+    LOG_FILE    : string  := "../../../../log_simulations/vectors/sine_0000_out.csv";
+    HEX_FORMAT  : boolean := true;
+    DATA_W      : integer := 24;
+    COEFF_W     : integer := 12;
+    ACC_W       : integer := 44;
+    N_TAPS      : integer := 20
+  );
+end;
+
+architecture tb of fir_vectors_tb is
+
+  signal clk   : std_logic := '0';
+  signal rst   : std_logic := '0';  -- fir_MA reset is active low
+  signal din   : std_logic_vector(DATA_W-1 downto 0) := (others => '0');
+  signal dout  : std_logic_vector(DATA_W-1 downto 0);
+
+  constant CLK_PERIOD : time := 20 ns;
+
+  file fvec : text open read_mode is VECTOR_FILE;
+  file fcsv : text open write_mode is LOG_FILE;
+
+begin
+  clk <= not clk after CLK_PERIOD/2;
+
+  -- reset
+  process
+  begin
+    rst <= '0';
+    wait for 5*CLK_PERIOD;
+    rst <= '1';
+    wait;
+  end process;
+
+  dut: entity work.fir_MA
+    generic map (
+      DATA_W  => DATA_W,
+      COEFF_W => COEFF_W,
+      ACC_W   => ACC_W,
+      N_TAPS  => N_TAPS
+    )
+    port map (
+      clock  => clk,
+      reset  => rst,
+      i_data => din,
+      o_data => dout
+    );
+
+  -- stimulus from file + logging
+  process(clk)
+    variable Lin  : line;
+    variable L    : line;
+    variable v    : std_logic_vector(DATA_W-1 downto 0);
+    variable ok   : boolean;
+    variable idx  : integer := 0;
+    variable header_done : boolean := false;
+  begin
+    if rising_edge(clk) then
+      if rst = '1' then
+
+        if not header_done then
+          L := null;
+          write(L, string'("sample,in_l_24,out_l_24"));
+          writeline(fcsv, L);
+          header_done := true;
+        end if;
+
+        if not endfile(fvec) then
+          readline(fvec, Lin);
+          if HEX_FORMAT then
+            hread(Lin, v, ok);
+          else
+            read(Lin, v, ok);
+          end if;
+          assert ok report "Bad vector at line " & integer'image(idx + 1) severity failure;
+
+          din <= v;
+
+          -- log: sample index in the shard, input applied now, current filter output
+          L := null;
+          write(L, idx);
+          write(L, string'(","));
+          write(L, to_integer(signed(v)));
+          write(L, string'(","));
+          write(L, to_integer(signed(dout)));
+          writeline(fcsv, L);
+
+          idx := idx + 1;
+
+        else
+          report "DONE: wrote " & integer'image(idx) & " samples." severity note;
+          file_close(fcsv);
+          stop(0);
+        end if;
+
+      end if;
+    end if;
+  end process;
+
+end architecture;
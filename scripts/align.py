@@ -0,0 +1,141 @@
+import numpy as np
+
+# Alignment of two signals of a capture (e.g. FIR input and output): delay by FFT cross-correlation
+# with sub-sample (parabolic) refinement, then gain and DC offset by least squares. O(N log N).
+
+
+def _next_pow2(n):
+    return 1 << (int(n) - 1).bit_length()
+
+
+def xcorr(x, y, max_lag=None):
+    """
+    Cross-correlation c[lag] = sum_n x[n] y[n + lag] of the zero-mean signals, computed with FFTs.
+    x and y may have shape (n,) or (channels, n) (one correlation per row).
+
+    Returns lags (from -max_lag to max_lag) and c with the lag on the last axis.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = min(x.shape[-1], y.shape[-1])
+    x = x[..., :n] - x[..., :n].mean(axis=-1, keepdims=True)
+    y = y[..., :n] - y[..., :n].mean(axis=-1, keepdims=True)
+
+    max_lag = n - 1 if max_lag is None else min(max_lag, n - 1)
+    nfft = _next_pow2(2 * n - 1)
+
+    c = np.fft.irfft(np.conj(np.fft.rfft(x, nfft)) * np.fft.rfft(y, nfft), nfft)
+    c = np.concatenate([c[..., nfft - max_lag:], c[..., :max_lag + 1]], axis=-1)
+
+    return np.arange(-max_lag, max_lag + 1), c
+
+
+def estimate_delay(x, y, max_lag=None):
+    """
+    Delay of y with respect to x in samples (positive: y comes later), with sub-sample resolution
+    from a parabola through the correlation peak and its two neighbours.
+    Works row by row for (channels, n) inputs.
+    """
+    lags, c = xcorr(x, y, max_lag)
+    c = np.atleast_2d(c)
+
+    i = np.argmax(c, axis=-1)
+    i_in = np.clip(i, 1, c.shape[-1] - 2) # the refinement needs both neighbours
+    rows = np.arange(c.shape[0])
+    c0, c1, c2 = c[rows, i_in - 1], c[rows, i_in], c[rows, i_in + 1]
+
+    denom = c0 - 2*c1 + c2
+    frac = np.where((i == i_in) & (denom != 0), 0.5 * (c0 - c2) / np.where(denom != 0, denom, 1), 0.0)
+    delay = lags[i] + frac
+
+    return delay if np.ndim(x) > 1 else float(delay[0])
+
+
+def shift(y, delay):
+    """
+    Advance y by a (fractional) delay in samples with linear interpolation: shift(y, d)[n] = y[n + d].
+    y may have shape (n,) or (channels, n), with one delay per row. Samples outside y are NaN.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = y.shape[-1]
+    pos = np.broadcast_to(np.arange(n) + np.asarray(delay, dtype=np.float64)[..., None], y.shape)
+
+    i0 = np.floor(pos)
+    t = pos - i0
+    i0 = i0.astype(np.intp)
+    y0 = np.take_along_axis(y, np.clip(i0, 0, n - 1), axis=-1)
+    y1 = np.take_along_axis(y, np.clip(i0 + 1, 0, n - 1), axis=-1)
+
+    return np.where((pos >= 0) & (pos <= n - 1), y0 + t * (y1 - y0), np.nan)
+
+
+def align(x, y, max_lag=None, integer=False):
+    """
+    Align y to x: find the delay d, then the gain g and offset b such that y[n + d] ~ g * x[n] + b.
+    x and y may have shape (n,) or (channels, n): every row is aligned on its own, in one pass.
+
+    Args:
+    max_lag: largest delay searched (default: the whole signal).
+    integer: round the delay to whole samples (no interpolation).
+
+    Returns a dict with delay, gain, offset, residual_rms (floats, or arrays with one value per row)
+    and the aligned, overlapping segments x_aligned and y_aligned (arrays, or lists of arrays per row:
+    the overlap depends on the delay of the row).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = min(x.shape[-1], y.shape[-1])
+    x2 = np.atleast_2d(x[..., :n])
+    y2 = np.atleast_2d(y[..., :n])
+
+    delay = np.atleast_1d(estimate_delay(x2, y2, max_lag))
+    if integer:
+        delay = np.round(delay)
+
+    y_al = shift(y2, delay)
+    valid = ~np.isnan(y_al)
+    cnt = valid.sum(axis=-1)
+
+    # least squares fit y_al = g * x + b over the valid samples of each row
+    with np.errstate(invalid="ignore", divide="ignore"):
+        xm = np.where(valid, x2, 0).sum(axis=-1) / cnt
+        ym = np.where(valid, y_al, 0).sum(axis=-1) / cnt
+        dx = np.where(valid, x2 - xm[:, None], 0)
+        dy = np.where(valid, y_al - ym[:, None], 0)
+        sxx = (dx * dx).sum(axis=-1)
+        g = np.where(sxx > 0, (dx * dy).sum(axis=-1) / np.where(sxx > 0, sxx, 1), 0.0)
+        b = ym - g * xm
+        rms = np.sqrt(((dy - g[:, None] * dx)**2).sum(axis=-1) / cnt)
+
+    xs = [r[v] for r, v in zip(x2, valid)]
+    ys = [r[v] for r, v in zip(y_al, valid)]
+
+    if x.ndim > 1:
+        return {"delay": delay, "gain": g, "offset": b, "residual_rms": rms, "x_aligned": xs, "y_aligned": ys}
+
+    return {
+        "delay": float(delay[0]),
+        "gain": float(g[0]),
+        "offset": float(b[0]),
+        "residual_rms": float(rms[0]),
+        "x_aligned": xs[0],
+        "y_aligned": ys[0],
+    }
+
+
+def align_columns(data, a, b, max_lag=None, integer=False):
+    """
+    Align column b of a capture to column a (one sample per frame for ILA captures, see
+    capture_io.frame_samples).
+    """
+    from capture_io import frame_samples
+
+    x = np.asarray(data[a])
+    y = np.asarray(data[b])
+    if "sample_ok" in data.dtype.names:
+        x, _ = frame_samples(x)
+        y, _ = frame_samples(y)
+
+    n = min(len(x), len(y))
+
+    return align(x[:n], y[:n], max_lag, integer)
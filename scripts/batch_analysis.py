@@ -0,0 +1,269 @@
+#########
+# Batch analysis of many captures at once, spread over a pool of processes.
+# No interactive window is opened: plots are saved to files, and every capture gets a JSON summary
+# (plus one CSV with a row per capture for each analysis kind).
+#
+# Usage (from the scripts folder):
+#   python batch_analysis.py "../log_from_hardware/*TAPS.csv" --kind golden-diff
+#   python batch_analysis.py "../log_from_hardware/*.csv" --kind spectrum --out ../plots_batch
+#   python batch_analysis.py "../log_from_hardware/song*.csv" --kind spectrogram
+##################
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg") # headless: never block on plt.show()
+import matplotlib.pyplot as plt
+import numpy as np
+
+from capture_cache import load_cached
+from fir_model import ma_coeff, FRAC
+from freq_response import freq_response
+from align import align
+from capture_io import WS_frequency, db, io_signals
+from golden_diff import diff_capture, n_taps_from_name
+from render import configure, plot_decimated
+from spectrogram import difference_db, plot_spectrograms, spectrogram
+
+KINDS = ("time", "spectrum", "golden-diff", "tap-compare", "spectrogram")
+MAX_LAG = 256 # largest input/output delay searched by the alignment (frames)
+HF_MIN = 5000.0 # lower edge (Hz) of the HF noise band tracked by the spectrogram analysis
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plots_batch")
+
+
+def _save(fig, out_dir, name):
+    path = os.path.join(out_dir, name)
+    fig.savefig(path)
+    plt.close(fig)
+
+    return path
+
+
+def analyze_time(path, data, out_dir, fs, n_taps=None):
+    summary = {}
+    for ch, x, y in io_signals(data):
+        fig = plt.figure()
+        plot_decimated(plt.gca(), x, label="Input", color="blue", alpha=0.5)
+        plot_decimated(plt.gca(), y, label="Output", color="red", alpha=0.5)
+        plt.title(f"{os.path.basename(path)} - Input vs Output signals (Channel {ch})")
+        plt.xlabel("Samples"); plt.ylabel("Amplitude")
+        plt.grid(True); plt.legend()
+        _save(fig, out_dir, f"input_output_{ch}.png")
+
+        al = align(x, y, max_lag=MAX_LAG)
+        summary[ch] = {
+            "samples": len(x),
+            "delay": al["delay"],
+            "gain": al["gain"],
+            "offset": al["offset"],
+            "in_rms": float(np.sqrt(np.mean(x**2))),
+            "out_rms": float(np.sqrt(np.mean(y**2))),
+            "in_peak": float(np.max(np.abs(x))),
+            "out_peak": float(np.max(np.abs(y))),
+        }
+
+    return summary
+
+
+def analyze_spectrum(path, data, out_dir, fs, n_taps=None):
+    summary = {}
+    for ch, x, y in io_signals(data):
+        w = np.hanning(len(x))
+        X = np.fft.rfft((x - x.mean()) * w)
+        Y = np.fft.rfft((y - y.mean()) * w)
+        f = np.fft.rfftfreq(len(x), d=1/fs)
+
+        peak = np.max(np.abs(X)) # input peak as common reference (0 dB)
+        XdB = db(np.abs(X) / peak)
+        YdB = db(np.abs(Y) / peak)
+
+        fig = plt.figure()
+        plt.semilogx(f+1e-6, XdB, label="Input", alpha=0.5, color="green")
+        plt.semilogx(f+1e-6, YdB, label="Output", alpha=0.5, color="red")
+        plt.title(f"{os.path.basename(path)} - Input vs Output spectra (Channel {ch})")
+        plt.xlabel("Frequency [Hz]"); plt.ylabel("Amplitude [dB]")
+        plt.grid(True, which='both'); plt.legend()
+        _save(fig, out_dir, f"spectrum_{ch}.png")
+
+        summary[ch] = {
+            "samples": len(x),
+            "in_peak_hz": float(f[np.argmax(np.abs(X))]),
+            "out_peak_hz": float(f[np.argmax(np.abs(Y))]),
+        }
+
+    return summary
+
+
+def analyze_golden(path, data, out_dir, fs, n_taps=None):
+    return diff_capture(path, n_taps=n_taps, data=data)
+
+
+def analyze_tap_compare(path, data, out_dir, fs, n_taps=None, nfft=4096):
+    """
+    Compare the measured gain |Y|/|X| with the theoretical response of the fir_MA coefficients
+    (tap count taken from the file name, if not given).
+    """
+    n_taps = n_taps or n_taps_from_name(path)
+    if n_taps is None:
+        raise ValueError(f"Cannot infer N_TAPS from '{path}'")
+
+    coeff = ma_coeff(n_taps) / 2**FRAC
+    r = freq_response(coeff, fs, nfft=nfft)
+    f, H = r["f"], r["mag_db"]
+
+    summary = {"n_taps": n_taps}
+    for ch, x, y in io_signals(data):
+        # average the spectra over segments of nfft samples (Hann window)
+        n_seg = len(x) // nfft
+        if n_seg == 0:
+            continue
+        w = np.hanning(nfft)
+        X = np.fft.rfft((x[:n_seg*nfft].reshape(n_seg, nfft) - x.mean()) * w, axis=1)
+        Y = np.fft.rfft((y[:n_seg*nfft].reshape(n_seg, nfft) - y.mean()) * w, axis=1)
+        Pxx = np.mean(np.abs(X)**2, axis=0)
+        Pyy = np.mean(np.abs(Y)**2, axis=0)
+        G = 10*np.log10(np.maximum(Pyy, 1e-24) / np.maximum(Pxx, 1e-24))
+
+        # only the bins where the input carries energy are meaningful
+        mask = Pxx > 1e-3 * Pxx.max()
+        dev = G[mask] - H[mask]
+
+        fig = plt.figure()
+        plt.plot(f, H, label=f"Theoretical MA{n_taps}", color="navy", alpha=0.6)
+        plt.plot(f[mask], G[mask], ".", label="Measured |Y|/|X|", color="red", alpha=0.5)
+        plt.title(f"{os.path.basename(path)} - measured vs theoretical response (Channel {ch})")
+        plt.xlabel("Frequency [Hz]"); plt.ylabel("Magnitude [dB]")
+        plt.ylim(-80, 10)
+        plt.grid(True); plt.legend()
+        _save(fig, out_dir, f"tap_compare_{ch}.png")
+
+        summary[ch] = {
+            "bins": int(mask.sum()),
+            "rms_dev_db": float(np.sqrt(np.mean(dev**2))) if len(dev) else None,
+            "max_dev_db": float(np.max(np.abs(dev))) if len(dev) else None,
+        }
+
+    return summary
+
+
+def analyze_spectrogram(path, data, out_dir, fs, n_taps=None):
+    """
+    Input, output and difference spectrograms of every channel, and the gain of the filter on the
+    HF noise band (>= HF_MIN) over time.
+    """
+    configure(headless=True, fmt=None) # the figure is reused by every capture of the worker
+
+    channels = {}
+    summary = {}
+    for ch, x, y in io_signals(data):
+        t, f, S = spectrogram(np.stack([x, y]), fs)
+        diff = difference_db(S[0], S[1])
+        channels[ch] = {"in": S[0], "out": S[1], "diff_db": diff}
+
+        hf = f >= HF_MIN
+        gain = 10*np.log10(np.maximum(S[1][:, hf].sum(axis=1), 1e-30) / np.maximum(S[0][:, hf].sum(axis=1), 1e-30))
+        summary[ch] = {
+            "columns": len(t),
+            "column_s": float(t[1] - t[0]) if len(t) > 1 else None,
+            "hf_gain_db_median": float(np.median(gain)),
+            "hf_gain_db_min": float(np.min(gain)),
+            "hf_gain_db_max": float(np.max(gain)),
+        }
+
+    if channels:
+        plot_spectrograms(t, f, channels, os.path.join(out_dir, "spectrogram.png"), title=os.path.basename(path))
+
+    return summary
+
+
+ANALYSES = {
+    "time": analyze_time,
+    "spectrum": analyze_spectrum,
+    "golden-diff": analyze_golden,
+    "tap-compare": analyze_tap_compare,
+    "spectrogram": analyze_spectrogram,
+}
+
+
+def run_one(path, kind, out_root, fs=WS_frequency, n_taps=None):
+    """
+    Run one analysis on one capture (executed in a worker process).
+    Returns (path, summary, error message or None).
+    """
+    out_dir = os.path.join(out_root, os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(out_dir, exist_ok=True)
+
+    try:
+        data = load_cached(path)
+        summary = ANALYSES[kind](path, data, out_dir, fs, n_taps)
+        error = None
+    except Exception as e:
+        summary, error = {}, f"{type(e).__name__}: {e}"
+
+    with open(os.path.join(out_dir, f"summary_{kind}.json"), "w") as f:
+        json.dump({"capture": path, "kind": kind, "error": error, "results": summary}, f, indent=1)
+
+    return path, summary, error
+
+
+def _flatten(summary, prefix=""):
+    row = {}
+    for k, v in summary.items():
+        if isinstance(v, dict):
+            row.update(_flatten(v, f"{prefix}{k}."))
+        else:
+            row[prefix + k] = v
+    return row
+
+
+def run_batch(pattern, kind, out_root=OUT_DIR, workers=None, fs=WS_frequency, n_taps=None):
+    """
+    Run an analysis on every capture matching the glob pattern, in parallel.
+    Writes out_root/summary_<kind>.csv with one row per capture and returns the list of results.
+    """
+    paths = sorted(glob.glob(pattern))
+    os.makedirs(out_root, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        n = len(paths)
+        results = list(pool.map(run_one, paths, [kind]*n, [out_root]*n, [fs]*n, [n_taps]*n))
+
+    rows = [dict(capture=os.path.basename(p), error=err or "", **_flatten(s)) for p, s, err in results]
+    fields = list(dict.fromkeys(k for r in rows for k in r))
+    with open(os.path.join(out_root, f"summary_{kind}.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze many captures in parallel, without interactive plots.")
+    parser.add_argument("pattern", help="glob of the capture files (quote it)")
+    parser.add_argument("--kind", choices=KINDS, default="time")
+    parser.add_argument("--out", default=OUT_DIR, help="output folder for plots and summaries")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: CPU count)")
+    parser.add_argument("--fs", type=float, default=WS_frequency, help="sample rate of the frames in Hz")
+    parser.add_argument("--n-taps", type=int, default=None, help="fir_MA N_TAPS (default: from file name)")
+    args = parser.parse_args(argv)
+
+    results = run_batch(args.pattern, args.kind, args.out, args.workers, args.fs, args.n_taps)
+    if not results:
+        print("ERROR: None captures were found!")
+        return 2
+
+    for path, _, error in results:
+        print(f"{os.path.basename(path)}: {'ERROR ' + error if error else 'ok'}")
+
+    return 1 if any(err for _, _, err in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+#########
+# Benchmarks of the analysis and modeling hot paths on synthetic captures (10k to 50M samples).
+# Every (case, size) runs in a fresh process, so that its peak RSS is its own; the memory compared is
+# the peak of the allocations made by one run (tracemalloc, which also sees the numpy buffers: the
+# input allocated by the setup does not count), and the wall time is the best and the median of a
+# few (untraced) repetitions. Results can be saved as a JSON baseline
+# and later runs compared with it.
+#
+# Usage (from the scripts folder):
+#   python bench.py --save                       # measure and write the baseline
+#   python bench.py --compare                    # measure and flag regressions (exit status 1)
+#   python bench.py --cases fir_model fft --sizes 1e5 1e7
+##################
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINE = os.path.join(REPO_DIR, "bench_baseline.json")
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000, 50_000_000)
+REPEAT = 5
+THRESHOLD = 0.25 # relative slowdown (or allocation growth) reported as a regression
+MIN_DELTA_S = 0.005 # ... provided the wall time grew by at least this (sub-millisecond runs are noise)
+MIN_DELTA_MB = 8.0 # ... or the allocations by at least this
+FS = 48820.0
+N_TAPS = 64 # taps of the convolution case (the fixed-point case uses fir_MA 20 taps and a generic filter)
+
+
+# ----------------------------------------------------------------------------------------------
+# Synthetic data
+
+def synthetic_signal(n, seed=0):
+    """
+    24-bit signed samples: 1 kHz sine at half scale plus noise, as the captures of the filter tests.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / FS
+    x = 0.5 * (1 << 23) * np.sin(2*np.pi*1000*t) + rng.normal(0, 1 << 16, n)
+
+    return np.clip(np.rint(x), -(1 << 23), (1 << 23) - 1).astype(np.int32)
+
+
+def write_ila_csv(path, n, chunk=1 << 20):
+    """
+    Vivado ILA style CSV (header, radix row, two rows per frame) of n rows.
+    """
+    with open(path, "w") as f:
+        f.write("Sample in Buffer,Sample in Window,TRIGGER,l_in[23:0],l_data_tx[23:0],sample_ok\n")
+        f.write("Radix - UNSIGNED,UNSIGNED,UNSIGNED,SIGNED,SIGNED,HEX\n")
+        for start in range(0, n, chunk):
+            m = min(chunk, n - start)
+            idx = np.arange(start, start + m)
+            x = synthetic_signal(m, seed=start)
+            cols = np.stack([idx, idx, np.zeros(m, dtype=np.int64), x, x >> 1, idx & 1], axis=1)
+            np.savetxt(f, cols, fmt="%d", delimiter=",")
+
+
+# ----------------------------------------------------------------------------------------------
+# Cases: setup(n, tmp) builds the input (not timed), run(state) is timed.
+
+def _setup_csv(n, tmp):
+    path = os.path.join(tmp, f"capture_{n}.csv")
+    write_ila_csv(path, n)
+    return path
+
+
+def _run_load_csv(path):
+    from capture_io import load_ila_csv
+    return load_ila_csv(path)
+
+
+def _setup_cached(n, tmp):
+    from capture_cache import load_cached
+    path = _setup_csv(n, tmp)
+    cache_dir = os.path.join(tmp, "cache")
+    load_cached(path, cache_dir=cache_dir) # first load fills the cache
+    return path, cache_dir
+
+
+def _run_load_cached(state):
+    from capture_cache import load_cached
+    path, cache_dir = state
+    data = load_cached(path, cache_dir=cache_dir)
+    return np.asarray(data["l_in230"]).sum() # touch the data, the cache is memory mapped
+
+
+def _setup_signal(n, tmp):
+    return synthetic_signal(n).astype(np.float64)
+
+
+def _run_fft(x):
+    from spectrum import welch
+    return welch(x, FS)
+
+
+def _run_convolution(x):
+    from reference_filter import fir_filter
+    h = np.hanning(N_TAPS) / np.hanning(N_TAPS).sum()
+    return fir_filter(x, h)
+
+
+def _setup_int(n, tmp):
+    return synthetic_signal(n)
+
+
+def _run_fir_model(x):
+    from fir_model import fir_fixed_point, ma_coeff
+    fir_fixed_point(x, ma_coeff(20)) # moving average (running sum path)
+    return fir_fixed_point(x, np.array([-10, 120, -127, 20, 683, 1365, 1365, 683])) # generic taps
+
+
+def _run_render(x):
+    import render
+    render.configure(headless=True, fmt="png")
+    fig, ax = render.new_axes("bench", figsize=(10, 4))
+    render.plot_decimated(ax, x)
+    with tempfile.TemporaryDirectory() as tmp:
+        return render.finish(fig, os.path.join(tmp, "bench.png"))
+
+
+# name: (setup, run, largest size run by default)
+CASES = {
+    "load_csv": (_setup_csv, _run_load_csv, 1_000_000),
+    "load_cached": (_setup_cached, _run_load_cached, 1_000_000),
+    "fft": (_setup_signal, _run_fft, 50_000_000),
+    "convolution": (_setup_signal, _run_convolution, 50_000_000),
+    "fir_model": (_setup_int, _run_fir_model, 50_000_000),
+    "render": (_setup_signal, _run_render, 50_000_000),
+}
+
+
+def _peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (peak working set on Windows), or None if unknown.
+    """
+    if sys.platform != "win32":
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        return rss / 2**20 if sys.platform == "darwin" else rss / 2**10 # bytes on macOS, KiB on Linux
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    except ImportError:
+        pass
+
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+
+    return counters.PeakWorkingSetSize / 2**20
+
+
+def _measure(case, n, repeat):
+    """
+    Body of the child process: setup, then best and median wall time of repeat runs, and peak of the
+    allocations of one more run, traced apart so the tracing does not slow down the timed ones.
+    """
+    setup, run, _ = CASES[case]
+    with tempfile.TemporaryDirectory() as tmp:
+        state = setup(n, tmp)
+        rss_setup = _peak_rss_mb()
+
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            run(state)
+            times.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        try:
+            run(state)
+            _, alloc = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    best = min(times)
+    peak = _peak_rss_mb()
+
+    return {
+        "case": case,
+        "samples": n,
+        "wall_s": best,
+        "wall_median_s": float(np.median(times)),
+        "samples_per_s": n / best if best > 0 else float("inf"),
+        "alloc_mb": alloc / 2**20, # peak memory allocated by the code under test
+        "peak_rss_mb": peak,
+        "setup_rss_mb": rss_setup,
+    }
+
+
+def run_case(case, n, repeat=REPEAT):
+    """
+    Measure one (case, size) in a fresh process.
+    """
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as ex:
+        return ex.submit(_measure, case, n, repeat).result()
+
+
+def run_suite(cases=None, sizes=SIZES, repeat=REPEAT, full=False, log=print):
+    """
+    Run the selected cases on every size (up to the default limit of each case unless full=True).
+    Returns {"meta": ..., "results": {"case/size": result}}.
+    """
+    results = {}
+    for case in cases or CASES:
+        if case not in CASES:
+            raise ValueError(f"Unknown case '{case}', expected one of {list(CASES)}")
+
+        for n in sizes:
+            if not full and n > CASES[case][2]:
+                continue
+
+            r = run_case(case, int(n), repeat)
+            results[f"{case}/{int(n)}"] = r
+            log(f"{case:<12} {int(n):>10} {r['wall_s'] * 1e3:>10.1f} ms {r['samples_per_s'] / 1e6:>9.2f} Msamples/s "
+                f"{r['alloc_mb']:>8.1f} MB")
+
+    meta = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+    return {"meta": meta, "results": results}
+
+
+def compare(current, baseline, threshold=THRESHOLD, min_delta_s=MIN_DELTA_S, min_delta_mb=MIN_DELTA_MB):
+    """
+    Regressions of current with respect to baseline: entries whose wall time (both the best and the
+    median of the repetitions) or allocation peak of a run grew by more than threshold (relative) and by more
+    than an absolute floor. Returns a list of (key, metric, baseline, current).
+    """
+    floors = {"wall_s": min_delta_s, "wall_median_s": min_delta_s, "alloc_mb": min_delta_mb}
+
+    def grew(metric, b, r):
+        old, new = b.get(metric), r.get(metric)
+        if old is None or new is None: # not measured (older baseline)
+            return False
+        return new > old * (1 + threshold) and new - old > floors[metric]
+
+    regressions = []
+    for key, r in current["results"].items():
+        b = baseline["results"].get(key)
+        if b is None:
+            continue
+
+        if grew("wall_s", b, r) and (grew("wall_median_s", b, r) or "wall_median_s" not in b):
+            regressions.append((key, "wall_s", b["wall_s"], r["wall_s"]))
+        if grew("alloc_mb", b, r):
+            regressions.append((key, "alloc_mb", b["alloc_mb"], r["alloc_mb"]))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the analysis and modeling hot paths.")
+    parser.add_argument("--cases", nargs="+", default=None, help=f"subset of {list(CASES)}")
+    parser.add_argument("--sizes", nargs="+", type=float, default=SIZES, help="samples (rows for CSV cases)")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--full", action="store_true", help="run every size, also the slow CSV ones")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="flag regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    current = run_suite(args.cases, args.sizes, args.repeat, args.full)
+
+    failed = False
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"ERROR: baseline {args.baseline} not found, run with --save first")
+            return 2
+
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(current, baseline, args.threshold)
+        for key, metric, old, new in regressions:
+            print(f"REGRESSION {key} {metric}: {old:.4g} -> {new:.4g} ({(new / old - 1) * 100:+.0f}%)")
+        failed = bool(regressions)
+        if not failed:
+            print(f"No regressions above {args.threshold * 100:.0f}%")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=1)
+        print(f"Baseline written to {args.baseline}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
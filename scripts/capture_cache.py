@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from capture_io import load_ila_csv
+
+# Binary cache of the parsed captures: every CSV is converted once into a .npy file
+# (named after the hash of its content), then mapped in memory without copying.
+CACHE_DIR = os.environ.get(
+    "CAPTURE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".capture_cache"),
+)
+MAX_CACHE_BYTES = 2 * 1024**3 # size bound of the cache directory (least recently used files are evicted)
+
+_INDEX = "index.json" # maps path -> (mtime, size, content hash)
+
+
+def _index_path(cache_dir):
+    return os.path.join(cache_dir, _INDEX)
+
+
+def _read_index(cache_dir):
+    try:
+        with open(_index_path(cache_dir), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    # write to a temporary file and rename it, so that concurrent readers never see half a file
+    tmp = _index_path(cache_dir) + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, _index_path(cache_dir))
+
+
+def content_hash(path, block=1 << 20):
+    """
+    SHA-1 of the content of a file, read in blocks of 1 MB.
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def _entry_file(cache_dir, digest):
+    return os.path.join(cache_dir, digest + ".npy")
+
+
+def load_cached(path, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, loader=load_ila_csv):
+    """
+    Load a CSV capture through the binary cache.
+
+    The key of a capture is its path, mtime and size: if they did not change since the last load,
+    the content hash stored in the index is reused and the file is not read at all.
+    Otherwise the content is hashed, and parsed (with loader) only if no cached file with the
+    same hash exists.
+
+    Returns a read-only structured array memory-mapped from the cache file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    index = _read_index(cache_dir)
+    entry = index.get(key)
+
+    if entry is not None and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+        digest = entry["hash"]
+    else:
+        digest = content_hash(key)
+        index[key] = {"mtime": st.st_mtime_ns, "size": st.st_size, "hash": digest}
+        _write_index(cache_dir, index)
+
+    npy = _entry_file(cache_dir, digest)
+
+    if not os.path.exists(npy):
+        data = loader(key)
+        tmp = npy + f".{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp, npy)
+
+        evict(cache_dir, max_bytes, keep=npy)
+    else:
+        os.utime(npy) # mark as recently used (for the eviction policy)
+
+    return np.load(npy, mmap_mode="r")
+
+
+def invalidate(path=None, cache_dir=CACHE_DIR):
+    """
+    Remove the cached copy of a capture (or of every capture, if path is None).
+    """
+    index = _read_index(cache_dir)
+
+    if path is None:
+        keys = list(index)
+    else:
+        keys = [os.path.abspath(path)]
+
+    for key in keys:
+        entry = index.pop(key, None)
+        if entry is None:
+            continue
+
+        # the binary file may be shared by other paths with the same content
+        if not any(e["hash"] == entry["hash"] for e in index.values()):
+            try:
+                os.remove(_entry_file(cache_dir, entry["hash"]))
+            except FileNotFoundError:
+                pass
+
+    if os.path.isdir(cache_dir):
+        _write_index(cache_dir, index)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """
+    Delete the least recently used cache files until the directory is below max_bytes.
+
+    Args:
+    keep: a cache file that must not be removed (e.g. the one just written).
+    """
+    files = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".npy"):
+            continue
+        f = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(f)
+        except FileNotFoundError: # evicted by another worker in the meantime
+            continue
+        files.append((st.st_mtime, st.st_size, f))
+    files.sort() # oldest first
+
+    total = sum(size for _, size, _ in files)
+    removed = set()
+
+    for _, size, f in files:
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(f) == os.path.abspath(keep):
+            continue
+
+        try:
+            os.remove(f)
+        except FileNotFoundError: # another worker got there first: the space is freed anyway
+            pass
+        except PermissionError: # still memory mapped by a reader (Windows): leave it for a later pass
+            continue
+        total -= size
+        removed.add(os.path.basename(f)[:-len(".npy")])
+
+    if removed:
+        index = _read_index(cache_dir)
+        index = {k: e for k, e in index.items() if e["hash"] not in removed}
+        _write_index(cache_dir, index)
+
+    return len(removed)
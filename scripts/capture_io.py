@@ -0,0 +1,189 @@
+import itertools
+
+import numpy as np
+
+# Characters dropped from column names, same set used by np.genfromtxt (names=True),
+# so that e.g. "l_in[23:0]" becomes "l_in230" and "Sample in Buffer" becomes "Sample_in_Buffer"
+_DELETE_CHARS = set("""~!@#$%^&*()-=+~\\|]}[{';: /?.>,<""")
+
+RADIX_PREFIX = "Radix - " # first cell of the second line in the Vivado ILA exports
+RADIXES = ("UNSIGNED", "SIGNED", "HEX")
+
+CHUNK_ROWS = 1 << 18 # default number of rows per block when streaming
+
+WS_frequency = 48820.0 # sample rate in Hz (sclk_freq/64 with sclk_freq=mclk_freq/4 and mclk_period=80ns)
+
+ILA_SAMPLES_PER_FRAME = 2 # the ILA stores a sample at every word select toggle (sample_ok)
+
+# (channel, input column, output column) of the captures we produce, hardware and simulation
+IO_PAIRS = [
+    ("L", "l_in230", "l_data_tx230"),
+    ("R", "r_in230", "r_data_tx230"),
+    ("L", "input_L230", "output_L230"),
+    ("R", "r_data_rx230", "r_data_filt230"),
+    ("L", "in_l_24", "out_l_24"),
+    ("L", "in_l_8", "out_l_10"),
+]
+
+
+def db(x):
+    """
+    Convert a signal to decibels (dB).
+    """
+    eps = 1e-12 # needed to avoid log(0)
+
+    return 20*np.log10(np.maximum(np.abs(x), eps))
+
+
+def normalize_name(name):
+    """
+    Normalize a column name of the CSV header the same way np.genfromtxt does.
+    Example: "l_in[23:0]" -> "l_in230".
+    """
+    name = name.strip().replace(" ", "_")
+
+    return "".join(c for c in name if c not in _DELETE_CHARS)
+
+
+def read_header(f):
+    """
+    Read the header of an open CSV file (ILA export or Vivado simulation log).
+
+    Args:
+    f: text file object, positioned at the beginning of the file.
+
+    Returns:
+    names: list of normalized column names.
+    radix: list with the radix (UNSIGNED/SIGNED/HEX) of each column.
+           Simulation logs have no radix row: every column is treated as SIGNED.
+    """
+    names = [normalize_name(n) for n in f.readline().strip().split(",")]
+
+    pos = f.tell()
+    line = f.readline()
+
+    if line.startswith(RADIX_PREFIX):
+        radix = [r.strip() for r in line[len(RADIX_PREFIX):].strip().split(",")]
+        if len(radix) != len(names) or not set(radix).issubset(RADIXES):
+            raise ValueError(f"Malformed radix row: {line.strip()!r}")
+    else:
+        f.seek(pos) # no radix row: the second line is already data
+        radix = ["SIGNED"] * len(names)
+
+    return names, radix
+
+
+def _hex(s):
+    return int(s, 16)
+
+
+def _parse_rows(lines, dtype, cols, converters):
+    """
+    Parse a list of CSV text lines into a structured array with the given dtype.
+    """
+    return np.loadtxt(lines, delimiter=",", dtype=dtype, usecols=cols, converters=converters, ndmin=1)
+
+
+def iter_ila_csv(path, chunk_rows=CHUNK_ROWS, usecols=None, start=0, stop=None):
+    """
+    Stream a CSV capture in blocks of (at most) chunk_rows rows.
+
+    Every block is a structured array with one int32 field per column, named as in read_header.
+    The radix row is consumed here: HEX columns are converted to integers, so no slicing
+    or astype is needed afterwards.
+
+    Args:
+    path: path of the CSV file.
+    chunk_rows: number of rows per yielded block.
+    usecols: optional list of (normalized) column names to keep.
+    start, stop: range of data rows to read (the rows before start are skipped without parsing them).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        names, radix = read_header(f)
+
+        if usecols is None:
+            usecols = names
+        missing = set(usecols) - set(names)
+        if missing:
+            raise KeyError(f"Columns {sorted(missing)} not found; fields found: {names}")
+
+        cols = [names.index(n) for n in usecols]
+        dtype = np.dtype([(n, np.int32) for n in usecols])
+        # only HEX columns need a (slow, python level) converter, the others are parsed in C
+        converters = {i: _hex for i in cols if radix[i] == "HEX"} or None
+
+        for _ in itertools.islice(f, start):
+            pass
+        remaining = None if stop is None else max(0, stop - start)
+
+        empty = True
+        while remaining is None or remaining > 0:
+            n = chunk_rows if remaining is None else min(chunk_rows, remaining)
+            lines = list(itertools.islice(f, n))
+            if not lines:
+                break
+
+            empty = False
+            if remaining is not None:
+                remaining -= len(lines)
+            yield _parse_rows(lines, dtype, cols, converters)
+
+        if empty:
+            yield np.empty(0, dtype=dtype)
+
+
+def load_ila_csv(path, usecols=None, chunk_rows=CHUNK_ROWS, start=0, stop=None):
+    """
+    Load a CSV capture (the whole file, or the rows from start to stop) as a compact int32 structured array.
+    """
+    blocks = list(iter_ila_csv(path, chunk_rows=chunk_rows, usecols=usecols, start=start, stop=stop))
+
+    return blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+
+
+def frame_samples(col, step=ILA_SAMPLES_PER_FRAME):
+    """
+    Keep one ILA sample per word select frame.
+
+    The phase is the one where the signal changes value (the register updates), so that every
+    returned sample is a new frame.
+
+    Returns:
+    values: one sample per frame.
+    rows: the corresponding row indices in the capture.
+    """
+    changed = np.flatnonzero(col[1:] != col[:-1]) + 1
+    counts = np.bincount(changed % step, minlength=step)
+    phase = int(np.argmax(counts))
+    rows = np.arange(phase, len(col), step)
+
+    return col[rows], rows
+
+
+def io_signals(data):
+    """
+    Input/output pairs found in a capture, one sample per frame.
+
+    ILA captures (with the sample_ok column) store two samples per word select frame:
+    they are reduced to one with frame_samples. Simulation logs are already one sample per frame.
+
+    Returns a list of (channel, input, output) with float64 arrays of the same length.
+    """
+    names = data.dtype.names
+    ila = "sample_ok" in names
+
+    pairs = []
+    for ch, in_name, out_name in IO_PAIRS:
+        if not {in_name, out_name}.issubset(names):
+            continue
+
+        x = np.asarray(data[in_name])
+        y = np.asarray(data[out_name])
+        if ila:
+            x, _ = frame_samples(x)
+            y, _ = frame_samples(y)
+
+        n = min(len(x), len(y))
+        pairs.append((ch, x[:n].astype(np.float64), y[:n].astype(np.float64)))
+
+    return pairs
@@ -0,0 +1,482 @@
+#########
+# Columnar store of the captures (ILA exports and simulation logs). Every run is imported once from
+# its CSV: each column is split into chunks of CHUNK_ROWS int32 rows, delta encoded and compressed
+# with zlib, and appended to one data file per run. A SQLite index holds the metadata of the runs
+# (tap count, coefficients, stimulus, noise, fs, bitstream id, ...), the columns (with their channel)
+# and the byte offset of every chunk, so a query such as "all the 20-tap runs with noise, left
+# channel, samples 4600-7600" only reads and decompresses the chunks that overlap that range.
+# The metadata that lives in the file names (20TAPS, _noise, sinusoidal, ...) is inferred at import,
+# and can be given or changed explicitly (import --n-taps/--bitstream/..., tag).
+#
+# Usage (from the scripts folder):
+#   python capture_store.py import ../log_from_hardware/*.csv ../log_simulations/*.csv
+#   python capture_store.py import ../log_from_hardware/20TAPS.csv --noise 1 --bitstream fir20_v2
+#   python capture_store.py list --n-taps 20
+#   python capture_store.py read --n-taps 20 --noise 1 --channel L --start 4600 --stop 7600
+#   python capture_store.py tag 20TAPS --bitstream fir20_v2
+##################
+
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+import re
+import sqlite3
+import sys
+import zlib
+
+import numpy as np
+
+from capture_cache import content_hash
+from capture_io import IO_PAIRS, WS_frequency, iter_ila_csv
+from fir_model import ma_coeff
+from golden_diff import n_taps_from_name
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STORE_DIR = os.environ.get("CAPTURE_STORE_DIR", os.path.join(REPO_DIR, "capture_store"))
+
+CHUNK_ROWS = 4096 # rows per compressed chunk (the unit of a range read)
+ZLIB_LEVEL = 6
+
+_INDEX = "index.db"
+
+# metadata of a run that can be used in queries (besides name, source and hash)
+META_FIELDS = ("kind", "n_taps", "coeff", "stimulus", "noise", "fs", "bitstream")
+
+# directory of a capture -> kind of run
+KINDS = {"log_from_hardware": "hardware", "log_simulations": "simulation"}
+# file name pattern -> stimulus
+STIMULI = (("sinusoidal", "sinusoidal"), ("squarewave", "squarewave"), ("square", "squarewave"), ("song", "song"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY, name TEXT UNIQUE, source TEXT, hash TEXT UNIQUE,
+    kind TEXT, n_taps INTEGER, coeff TEXT, stimulus TEXT, noise INTEGER, fs REAL, bitstream TEXT,
+    rows INTEGER, imported TEXT, extra TEXT
+);
+CREATE TABLE IF NOT EXISTS columns (
+    run_id INTEGER, name TEXT, position INTEGER, channel TEXT, role TEXT, codec TEXT,
+    min INTEGER, max INTEGER,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    run_id INTEGER, column TEXT, first INTEGER, rows INTEGER, offset INTEGER, nbytes INTEGER,
+    min INTEGER, max INTEGER,
+    PRIMARY KEY (run_id, column, first)
+);
+CREATE INDEX IF NOT EXISTS runs_meta ON runs (n_taps, noise, stimulus);
+"""
+
+_CODEC = "delta-zlib"
+
+
+def encode_chunk(x, level=ZLIB_LEVEL):
+    """
+    Delta encode an int32 block (the differences wrap around, so the decoding is exact) and compress it.
+    Consecutive audio samples, and the repeated samples of the ILA frames, make small differences.
+    """
+    x = np.ascontiguousarray(x, dtype="<i4")
+    d = np.empty_like(x)
+    d[:1] = x[:1]
+    np.subtract(x[1:], x[:-1], out=d[1:]) # int32 arithmetic: wraps around
+
+    return zlib.compress(d.tobytes(), level)
+
+
+def decode_chunk(buf):
+    """
+    Inverse of encode_chunk.
+    """
+    d = np.frombuffer(zlib.decompress(buf), dtype="<i4")
+
+    return np.cumsum(d, dtype=np.int32) # wraps around like the encoder
+
+
+def channel_of(name):
+    """
+    Channel ("L"/"R") and role ("in"/"out") of a capture column, from IO_PAIRS or from the l_/r_ prefix.
+    The frame flag of the ILA (sample_ok) has role "frame"; other columns have no channel.
+    """
+    for ch, in_name, out_name in IO_PAIRS:
+        if name == in_name:
+            return ch, "in"
+        if name == out_name:
+            return ch, "out"
+
+    if name == "sample_ok":
+        return None, "frame"
+
+    m = re.match(r"([lr])_", name, re.IGNORECASE)
+    if m:
+        return m.group(1).upper(), None
+
+    return None, None
+
+
+def infer_meta(path):
+    """
+    Metadata of a capture inferred from its path: kind (log_from_hardware/log_simulations), tap count
+    (20TAPS.csv -> 20, with the fir_MA coefficients), stimulus and noise (from the words of the name).
+    Unknown fields are None.
+    """
+    base = os.path.basename(path).lower()
+    parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+    meta = dict.fromkeys(META_FIELDS)
+    meta["kind"] = KINDS.get(parent)
+    meta["fs"] = WS_frequency
+
+    n_taps = n_taps_from_name(path)
+    if n_taps is not None:
+        meta["n_taps"] = n_taps
+        meta["coeff"] = ma_coeff(n_taps).tolist()
+
+    for word, stimulus in STIMULI:
+        if word in base:
+            meta["stimulus"] = stimulus
+            break
+
+    if "noise" in base:
+        meta["noise"] = True
+
+    return meta
+
+
+class CaptureStore:
+    """
+    Columnar store of captures in a directory: index.db (SQLite) and one <run_id>.col data file per run.
+    """
+
+    def __init__(self, root=STORE_DIR, chunk_rows=CHUNK_ROWS):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.db = sqlite3.connect(os.path.join(root, _INDEX))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.bytes_read = 0 # compressed bytes read by the last read()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _data_path(self, run_id):
+        return os.path.join(self.root, f"{run_id}.col")
+
+    def import_csv(self, path, name=None, **meta):
+        """
+        Import a CSV capture as a new run (streamed: the file is never loaded whole).
+
+        Args:
+        path: CSV capture (ILA export or simulation log).
+        name: name of the run (default: file name without extension, with a _2, _3, ... suffix if a
+              different capture with that name is already stored, e.g. a new 20TAPS.csv export).
+        meta: metadata overriding the inferred one (see META_FIELDS); other keys are kept in "extra".
+
+        Returns the run_id. A capture with the same content as a stored run is not imported again.
+        Raises ValueError if an explicit name is already taken.
+        """
+        digest = content_hash(path)
+        row = self.db.execute("SELECT run_id FROM runs WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            return row["run_id"]
+
+        info = infer_meta(path)
+        extra = {k: v for k, v in meta.items() if k not in META_FIELDS}
+        info.update({k: v for k, v in meta.items() if k in META_FIELDS})
+        if name is None:
+            name = self._free_name(os.path.splitext(os.path.basename(path))[0])
+        elif self.db.execute("SELECT 1 FROM runs WHERE name = ?", (name,)).fetchone() is not None:
+            raise ValueError(f"A run named '{name}' is already stored, choose another name (--name)")
+
+        with self.db:
+            cur = self.db.execute(
+                "INSERT INTO runs (name, source, hash, kind, n_taps, coeff, stimulus, noise, fs, bitstream, rows, "
+                "imported, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (name, os.path.abspath(path), digest, info["kind"], info["n_taps"],
+                 None if info["coeff"] is None else json.dumps(list(info["coeff"])), info["stimulus"],
+                 None if info["noise"] is None else int(info["noise"]), info["fs"], info["bitstream"],
+                 datetime.datetime.now().isoformat(timespec="seconds"), json.dumps(extra) if extra else None))
+            run_id = cur.lastrowid
+
+            data_path = self._data_path(run_id)
+            tmp = data_path + f".{os.getpid()}.tmp"
+            chunks = []
+            rows = 0
+            try:
+                with open(tmp, "wb") as f:
+                    for block in iter_ila_csv(path, chunk_rows=self.chunk_rows):
+                        for col in block.dtype.names:
+                            x = block[col]
+                            if len(x) == 0:
+                                continue
+                            buf = encode_chunk(x)
+                            chunks.append((run_id, col, rows, len(x), f.tell(), len(buf), int(x.min()), int(x.max())))
+                            f.write(buf)
+                        rows += len(block)
+                os.replace(tmp, data_path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+            self.db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", chunks)
+            for i, col in enumerate(block.dtype.names):
+                ch, role = channel_of(col)
+                lo, hi = self.db.execute("SELECT MIN(min), MAX(max) FROM chunks WHERE run_id = ? AND column = ?",
+                                         (run_id, col)).fetchone()
+                self.db.execute("INSERT INTO columns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (run_id, col, i, ch, role, _CODEC, lo, hi))
+            self.db.execute("UPDATE runs SET rows = ? WHERE run_id = ?", (rows, run_id))
+
+        return run_id
+
+    def _free_name(self, base):
+        taken = {r["name"] for r in self.db.execute("SELECT name FROM runs WHERE name = ? OR name LIKE ?",
+                                                     (base, base + "_%"))}
+        name, i = base, 1
+        while name in taken:
+            i += 1
+            name = f"{base}_{i}"
+
+        return name
+
+    def tag(self, run, **meta):
+        """
+        Set metadata fields of a stored run (by name or run_id), e.g. tag("20TAPS", bitstream="fir20_v2").
+        """
+        run_id = self.run_id(run)
+        for k, v in meta.items():
+            if k not in META_FIELDS:
+                raise KeyError(f"Unknown metadata field '{k}', expected one of {META_FIELDS}")
+            if k == "coeff" and v is not None:
+                v = json.dumps(list(v))
+            elif k == "noise" and v is not None:
+                v = int(v)
+            with self.db:
+                self.db.execute(f"UPDATE runs SET {k} = ? WHERE run_id = ?", (v, run_id))
+
+    def run_id(self, run):
+        if isinstance(run, (int, np.integer)):
+            return int(run)
+
+        row = self.db.execute("SELECT run_id FROM runs WHERE name = ?", (run,)).fetchone()
+        if row is None:
+            raise KeyError(f"No run named '{run}'")
+
+        return row["run_id"]
+
+    def find(self, name=None, **meta):
+        """
+        Runs matching the given metadata (name is a glob pattern, e.g. "*TAPS"), as a list of dicts
+        ordered by run_id. Example: find(n_taps=20, noise=True).
+        """
+        where, args = [], []
+        for k, v in meta.items():
+            if k not in META_FIELDS:
+                raise KeyError(f"Unknown metadata field '{k}', expected one of {META_FIELDS}")
+            if v is None:
+                where.append(f"{k} IS NULL")
+            else:
+                where.append(f"{k} = ?")
+                args.append(int(v) if k == "noise" else v)
+
+        sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY run_id"
+
+        return [self._run_dict(row) for row in self.db.execute(sql, args).fetchall()
+                if name is None or fnmatch.fnmatch(row["name"], name)]
+
+    def info(self, run):
+        """
+        Metadata of a run (by name or run_id), as in find().
+        """
+        row = self.db.execute("SELECT * FROM runs WHERE run_id = ?", (self.run_id(run),)).fetchone()
+        if row is None:
+            raise KeyError(f"No run {run}")
+
+        return self._run_dict(row)
+
+    def _run_dict(self, row):
+        run = dict(row)
+        run["coeff"] = None if run["coeff"] is None else json.loads(run["coeff"])
+        run["extra"] = json.loads(run["extra"]) if run["extra"] else {}
+        run["columns"] = [r["name"] for r in self.db.execute(
+            "SELECT name FROM columns WHERE run_id = ? ORDER BY position", (run["run_id"],))]
+
+        return run
+
+    def select_columns(self, run, columns=None, channel=None):
+        """
+        Column names of a run: the given ones, or those of a channel (plus the sample_ok frame flag,
+        needed by io_signals), or all of them.
+        """
+        run_id = self.run_id(run)
+        if columns is not None:
+            return list(columns)
+
+        if channel is None:
+            rows = self.db.execute("SELECT name FROM columns WHERE run_id = ? ORDER BY position", (run_id,))
+        else:
+            rows = self.db.execute("SELECT name FROM columns WHERE run_id = ? AND (channel = ? OR role = 'frame') "
+                                   "ORDER BY position", (run_id, channel.upper()))
+
+        return [r["name"] for r in rows]
+
+    def read(self, run, columns=None, channel=None, start=0, stop=None):
+        """
+        Read a range of rows of some columns of a run. Only the chunks overlapping [start, stop)
+        of the selected columns are read from the data file.
+
+        Args:
+        run: name or run_id.
+        columns: list of column names (default: all, or those of channel).
+        channel: "L" or "R", to select the columns of one channel.
+        start, stop: range of rows (capture samples; an ILA frame is two rows).
+
+        Returns a structured int32 array, like load_ila_csv (so it can be passed to io_signals).
+        """
+        run_id = self.run_id(run)
+        names = self.select_columns(run_id, columns, channel)
+        n_rows = self.db.execute("SELECT rows FROM runs WHERE run_id = ?", (run_id,)).fetchone()["rows"]
+        start = max(0, start)
+        stop = n_rows if stop is None else min(stop, n_rows)
+        stop = max(start, stop)
+
+        out = np.empty(stop - start, dtype=[(n, np.int32) for n in names])
+        self.bytes_read = 0
+
+        with open(self._data_path(run_id), "rb") as f:
+            for col in names:
+                chunks = self.db.execute(
+                    "SELECT first, rows, offset, nbytes FROM chunks WHERE run_id = ? AND column = ? "
+                    "AND first < ? AND first + rows > ? ORDER BY first", (run_id, col, stop, start)).fetchall()
+                if not chunks and stop > start:
+                    raise KeyError(f"Column '{col}' not found in run {run_id}")
+
+                for first, rows, offset, nbytes in chunks:
+                    f.seek(offset)
+                    x = decode_chunk(f.read(nbytes))
+                    self.bytes_read += nbytes
+
+                    lo, hi = max(start, first), min(stop, first + rows)
+                    out[col][lo - start:hi - start] = x[lo - first:hi - first]
+
+        return out
+
+    def query(self, columns=None, channel=None, start=0, stop=None, name=None, **meta):
+        """
+        read() of every run matching find(name, **meta).
+
+        Returns a list of (run, data) with run the dict of find() and data the structured array.
+        """
+        return [(run, self.read(run["run_id"], columns, channel, start, stop)) for run in self.find(name, **meta)]
+
+    def remove(self, run):
+        run_id = self.run_id(run)
+        with self.db:
+            for table in ("runs", "columns", "chunks"):
+                self.db.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+        try:
+            os.remove(self._data_path(run_id))
+        except FileNotFoundError:
+            pass
+
+
+def _bool(s):
+    return s.lower() in ("1", "true", "yes", "y")
+
+
+def _meta_args(args):
+    meta = {k: getattr(args, k) for k in META_FIELDS if k != "coeff" and getattr(args, k, None) is not None}
+    if getattr(args, "coeff", None) is not None:
+        meta["coeff"] = [int(c) for c in args.coeff.split(",")]
+
+    return meta
+
+
+def _add_meta_options(parser):
+    parser.add_argument("--kind", default=None, help="hardware or simulation")
+    parser.add_argument("--n-taps", dest="n_taps", type=int, default=None)
+    parser.add_argument("--coeff", default=None, help="comma separated integer coefficients")
+    parser.add_argument("--stimulus", default=None)
+    parser.add_argument("--noise", type=_bool, default=None, help="1/0")
+    parser.add_argument("--fs", type=float, default=None, help="sample rate in Hz")
+    parser.add_argument("--bitstream", default=None, help="id of the bitstream the capture comes from")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar capture store with a metadata index")
+    parser.add_argument("--store", default=STORE_DIR, help="store directory")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("import", help="import CSV captures")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--name", default=None, help="run name (only with one path)")
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    _add_meta_options(p)
+
+    p = sub.add_parser("list", help="list the runs matching the metadata")
+    p.add_argument("--name", default=None, help="glob pattern of the run names")
+    _add_meta_options(p)
+
+    p = sub.add_parser("read", help="read a range of the runs matching the metadata")
+    p.add_argument("--name", default=None, help="glob pattern of the run names")
+    p.add_argument("--columns", nargs="+", default=None)
+    p.add_argument("--channel", default=None, choices=["L", "R"])
+    p.add_argument("--start", type=int, default=0)
+    p.add_argument("--stop", type=int, default=None)
+    p.add_argument("--out", default=None, help="folder where a CSV per run is written")
+    _add_meta_options(p)
+
+    p = sub.add_parser("tag", help="set metadata of a run")
+    p.add_argument("run")
+    _add_meta_options(p)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "import" and args.name is not None and len(args.paths) > 1:
+        parser.error("--name needs a single path")
+
+    with CaptureStore(args.store, chunk_rows=getattr(args, "chunk_rows", CHUNK_ROWS)) as store:
+        meta = _meta_args(args)
+
+        if args.cmd == "import":
+            for path in args.paths:
+                try:
+                    run_id = store.import_csv(path, name=args.name, **meta)
+                except ValueError as e:
+                    print(f"ERROR: {e}")
+                    return 1
+                run = store.info(run_id)
+                print(f"{run['name']}: run {run_id}, {run['rows']} rows, columns {run['columns']}")
+
+        elif args.cmd == "list":
+            for run in store.find(args.name, **meta):
+                fields = ", ".join(f"{k}={run[k]}" for k in META_FIELDS if k != "coeff" and run[k] is not None)
+                print(f"{run['run_id']:4d} {run['name']:40s} {run['rows']:8d} rows  {fields}")
+
+        elif args.cmd == "read":
+            for run in store.find(args.name, **meta):
+                data = store.read(run["run_id"], args.columns, args.channel, args.start, args.stop)
+                print(f"{run['name']}: {len(data)} rows of {list(data.dtype.names)}, "
+                      f"{store.bytes_read} compressed bytes read")
+                if args.out is not None:
+                    os.makedirs(args.out, exist_ok=True)
+                    path = os.path.join(args.out, f"{run['name']}_{args.start}_{args.start + len(data)}.csv")
+                    np.savetxt(path, data.view((np.int32, len(data.dtype.names))).reshape(len(data), -1),
+                               fmt="%d", delimiter=",", header=",".join(data.dtype.names), comments="")
+
+        elif args.cmd == "tag":
+            store.tag(args.run, **meta)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+#########
+# Out-of-core processing of captures larger than RAM.
+# FrameReader streams a capture in chunks of rows, one sample per frame and aligned across columns;
+# reducers (spectrum, golden-diff, statistics, ...) are fed block by block and keep their own state,
+# so peak memory depends on the chunk size, not on the length of the capture.
+#
+# Usage (from the scripts folder):
+#   python chunked.py ../log_from_hardware/20TAPS.csv --chunk-rows 100000
+##################
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from capture_io import CHUNK_ROWS, ILA_SAMPLES_PER_FRAME, IO_PAIRS, WS_frequency, iter_ila_csv, read_header
+from fir_model import FirStream, ma_coeff
+from golden_diff import CHANNELS, MAX_LAG, n_taps_from_name
+from spectrum import NPERSEG, OVERLAP, WelchStream
+
+
+def capture_columns(path):
+    """
+    Normalized column names of a capture (reads the header only).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        names, _ = read_header(f)
+
+    return names
+
+
+class FrameReader:
+    """
+    Iterate over a capture in blocks of frames.
+
+    Every block is (start, block): start is the frame index of the first sample, block a dict
+    {column: int64 array}, all the arrays with the same length.
+
+    ILA captures (with the sample_ok column) have two rows per frame: as in capture_io.frame_samples,
+    each column keeps the phase where its value changes, detected on the first chunk and then kept
+    fixed, so the blocks are the same as the whole-capture arrays of frame_samples cut in pieces.
+    """
+
+    def __init__(self, path, columns, chunk_rows=CHUNK_ROWS, frames=None, start=0, stop=None):
+        """
+        Args:
+        columns: columns to read.
+        frames: reduce to one sample per frame (default: if the capture has the sample_ok column).
+        start, stop: range of capture rows.
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.start = start
+        self.stop = stop
+
+        if frames is None:
+            frames = "sample_ok" in capture_columns(path)
+        self.step = ILA_SAMPLES_PER_FRAME if frames else 1
+        self.phases = None # phase of each column, set by the first chunk
+
+    def _detect_phases(self, chunk):
+        phases = {}
+        for c in self.columns:
+            col = chunk[c]
+            changed = np.flatnonzero(col[1:] != col[:-1]) + 1
+            counts = np.bincount(changed % self.step, minlength=self.step)
+            phases[c] = int(np.argmax(counts))
+
+        return phases
+
+    def row(self, column, frame):
+        """
+        Capture row of a frame of a column.
+        """
+        return self.start + self.phases[column] + frame * self.step
+
+    def __iter__(self):
+        pending = {c: [] for c in self.columns}
+        n_pending = dict.fromkeys(self.columns, 0)
+        row0 = 0 # row (relative to self.start) of the current chunk
+        frame0 = 0 # frame index of the next block
+
+        for chunk in iter_ila_csv(self.path, self.chunk_rows, self.columns, self.start, self.stop):
+            if self.phases is None:
+                self.phases = self._detect_phases(chunk)
+
+            for c in self.columns:
+                first = (self.phases[c] - row0) % self.step # first row of the chunk in phase
+                col = chunk[c][first::self.step].astype(np.int64)
+                pending[c].append(col)
+                n_pending[c] += len(col)
+            row0 += len(chunk)
+
+            # emit the frames available in every column, keep the rest
+            n = min(n_pending.values())
+            if n == 0:
+                continue
+
+            block = {}
+            for c in self.columns:
+                buf = np.concatenate(pending[c]) if len(pending[c]) > 1 else pending[c][0]
+                block[c] = buf[:n]
+                pending[c] = [buf[n:]]
+                n_pending[c] = len(buf) - n
+
+            yield frame0, block
+            frame0 += n
+
+
+def overlap_blocks(blocks, overlap):
+    """
+    Prepend the last overlap samples of the previous block to every block (fewer at the start),
+    e.g. for window-based stages that need context across block edges.
+
+    Yields (start, block, n_overlap): start is the frame index of block[...][0].
+    """
+    tail = None
+    for start, block in blocks:
+        if tail is None:
+            joined, n_ov = block, 0
+        else:
+            joined = {c: np.concatenate([tail[c], block[c]]) for c in block}
+            n_ov = len(next(iter(tail.values())))
+
+        yield start - n_ov, joined, n_ov
+        tail = {c: v[len(v) - min(overlap, len(v)):] for c, v in joined.items()}
+
+
+def filter_blocks(blocks, column, fir):
+    """
+    Output of a FirStream for a column of the blocks, block by block (same result as filtering the
+    whole column). Yields (start, y).
+    """
+    for start, block in blocks:
+        yield start, fir.process(block[column])
+
+
+# ----------------------------------------------------------------------------------------------
+# Reducers: update(start, block) for every block, then result().
+
+class StatsReducer:
+    """
+    Count, mean, standard deviation, min, max and full-scale hits of columns (merged per block
+    with Chan's parallel formulas, so there is no cancellation on long captures).
+    """
+
+    def __init__(self, columns, data_w=24):
+        self.columns = list(columns)
+        self.full_scale = (-(1 << (data_w - 1)), (1 << (data_w - 1)) - 1)
+        self.stats = {c: {"count": 0, "mean": 0.0, "m2": 0.0, "min": None, "max": None, "clipped": 0}
+                      for c in self.columns}
+
+    def update(self, start, block):
+        lo, hi = self.full_scale
+        for c in self.columns:
+            x = block[c]
+            if len(x) == 0:
+                continue
+
+            s = self.stats[c]
+            n_b = len(x)
+            mean_b = float(np.mean(x))
+            m2_b = float(np.sum((x - mean_b)**2))
+
+            n = s["count"] + n_b
+            delta = mean_b - s["mean"]
+            s["mean"] += delta * n_b / n
+            s["m2"] += m2_b + delta**2 * s["count"] * n_b / n
+            s["count"] = n
+
+            s["min"] = int(x.min()) if s["min"] is None else min(s["min"], int(x.min()))
+            s["max"] = int(x.max()) if s["max"] is None else max(s["max"], int(x.max()))
+            s["clipped"] += int(np.count_nonzero((x <= lo) | (x >= hi)))
+
+    def result(self):
+        out = {}
+        for c, s in self.stats.items():
+            std = float(np.sqrt(s["m2"] / s["count"])) if s["count"] else float("nan")
+            out[c] = {"count": s["count"], "mean": s["mean"], "std": std,
+                      "min": s["min"], "max": s["max"], "clipped": s["clipped"]}
+
+        return out
+
+
+class SpectrumReducer:
+    """
+    Welch PSD of columns (spectrum.WelchStream, all the columns together).
+    """
+
+    def __init__(self, columns, fs=WS_frequency, nperseg=NPERSEG, overlap=OVERLAP, window="hann"):
+        self.columns = list(columns)
+        self.ws = WelchStream(fs, nperseg, overlap, window)
+
+    def update(self, start, block):
+        self.ws.update(np.stack([block[c] for c in self.columns]))
+
+    def result(self):
+        """
+        Returns f and {column: PSD}, or None if the capture is shorter than one segment.
+        """
+        if self.ws.n_seg == 0:
+            return None
+        f, P = self.ws.result()
+
+        return f, dict(zip(self.columns, P))
+
+
+class GoldenDiffReducer:
+    """
+    Streaming version of golden_diff.golden_diff: the model runs on the blocks with a FirStream
+    and the logged output is compared at every lag in [0, max_lag] at once; the last max_lag model
+    samples are kept to compare across block edges. The result is the same as golden_diff on the
+    whole capture (first_mismatch in frames).
+    """
+
+    def __init__(self, in_col, out_col, coeff, data_w=24, coeff_w=12, acc_w=44, max_lag=MAX_LAG):
+        self.in_col = in_col
+        self.out_col = out_col
+        self.fir = FirStream(coeff, data_w=data_w, coeff_w=coeff_w, acc_w=acc_w, latency=0)
+        self.skip = len(coeff)
+        self.max_lag = max_lag
+
+        self.model_tail = np.zeros(0, dtype=np.int64)
+        self.compared = np.zeros(max_lag + 1, dtype=np.int64)
+        self.mismatches = np.zeros(max_lag + 1, dtype=np.int64)
+        self.first = np.full(max_lag + 1, -1, dtype=np.int64)
+        self.max_error = np.zeros(max_lag + 1, dtype=np.int64)
+
+    def update(self, start, block):
+        y = block[self.out_col]
+        model = np.concatenate([self.model_tail, self.fir.process(block[self.in_col])])
+        base = start - len(self.model_tail) # frame index of model[0]
+        end = start + len(y)
+
+        for lag in range(self.max_lag + 1):
+            # y[j] is compared with model[j - lag], for j - lag >= skip
+            j0 = max(start, self.skip + lag, base + lag)
+            if end <= j0:
+                continue
+
+            err = y[j0 - start:] - model[j0 - lag - base:end - lag - base]
+            bad = np.flatnonzero(err)
+
+            self.compared[lag] += len(err)
+            self.mismatches[lag] += len(bad)
+            if len(bad) and self.first[lag] < 0:
+                self.first[lag] = j0 + bad[0]
+            self.max_error[lag] = max(self.max_error[lag], int(np.max(np.abs(err))))
+
+        self.model_tail = model[max(0, len(model) - self.max_lag):] if self.max_lag else model[:0]
+
+    def result(self):
+        lags = np.flatnonzero(self.compared)
+        if len(lags) == 0:
+            raise ValueError("Capture too short for the golden-model comparison")
+
+        rates = self.mismatches[lags] / self.compared[lags]
+        lag = int(lags[np.argmin(rates)]) # first lowest rate, as golden_diff
+
+        return {
+            "latency": lag,
+            "compared": int(self.compared[lag]),
+            "mismatches": int(self.mismatches[lag]),
+            "first_mismatch": int(self.first[lag]),
+            "max_error": int(self.max_error[lag]),
+        }
+
+
+def run(blocks, reducers):
+    """
+    Feed every block to every reducer (one pass over the capture).
+    reducers: dict {name: reducer}. Returns {name: reducer.result()}.
+    """
+    for start, block in blocks:
+        for r in reducers.values():
+            r.update(start, block)
+
+    return {name: r.result() for name, r in reducers.items()}
+
+
+def summarize(path, chunk_rows=CHUNK_ROWS, n_taps=None, fs=WS_frequency, nperseg=NPERSEG):
+    """
+    Statistics, PSD and (for fir_MA captures) golden-model check of every input/output pair of a
+    capture, in one streaming pass.
+
+    Returns a dict with stats, golden_diff {channel: result, first_mismatch as a capture row}
+    and psd (f, {column: PSD}, None if the capture is shorter than nperseg frames).
+    """
+    names = capture_columns(path)
+    pairs = [(ch, a, b) for ch, a, b in IO_PAIRS if {a, b}.issubset(names)]
+    if not pairs:
+        raise KeyError(f"No input/output columns found; fields found: {names}")
+    columns = [c for _, a, b in pairs for c in (a, b)]
+
+    reader = FrameReader(path, columns, chunk_rows)
+    reducers = {"stats": StatsReducer(columns), "psd": SpectrumReducer(columns, fs, nperseg)}
+
+    n_taps = n_taps or n_taps_from_name(path)
+    golden = {ch: (a, b) for ch, (a, b) in CHANNELS.items() if {a, b}.issubset(names)}
+    if n_taps:
+        for ch, (a, b) in golden.items():
+            reducers[f"golden_diff_{ch}"] = GoldenDiffReducer(a, b, ma_coeff(n_taps))
+
+    results = run(reader, reducers)
+
+    out = {"stats": results["stats"], "psd": results["psd"], "golden_diff": {}}
+    for ch, (_, b) in golden.items():
+        res = results.get(f"golden_diff_{ch}")
+        if res is None:
+            continue
+        if res["first_mismatch"] >= 0:
+            res["first_mismatch"] = reader.row(b, res["first_mismatch"])
+        out["golden_diff"][ch] = res
+
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One-pass statistics and golden-model check of large captures.")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--n-taps", type=int, default=None, help="fir_MA N_TAPS (default: from file name)")
+    parser.add_argument("--fs", type=float, default=WS_frequency)
+    parser.add_argument("--nperseg", type=int, default=NPERSEG)
+    args = parser.parse_args(argv)
+
+    out = summarize(args.path, args.chunk_rows, args.n_taps, args.fs, args.nperseg)
+    psd = out.pop("psd")
+    if psd is not None:
+        f, P = psd
+        out["psd_peak_hz"] = {c: float(f[1 + np.argmax(p[1:])]) for c, p in P.items()}
+    print(json.dumps(out, indent=1))
+
+    failed = any(r["mismatches"] for r in out["golden_diff"].values())
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
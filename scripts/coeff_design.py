@@ -0,0 +1,183 @@
+#########
+# Fixed-point FIR coefficient designer and tap-count explorer.
+# For every N_TAPS in a range, a low-pass filter is designed (windowed sinc, or moving average),
+# quantized to COEFF_W-bit Q0.FRAC integers and evaluated, all candidates together with one
+# batched FFT over the 2-D coefficient matrix. The smallest N_TAPS that meets the spec wins.
+#
+# Usage (from the scripts folder):
+#   python coeff_design.py --fpass 2000 --fstop 8000 --atten 40
+##################
+
+import argparse
+import sys
+
+import numpy as np
+
+from capture_io import WS_frequency, db
+from fir_model import FRAC, acc_width
+
+NFFT = 8192
+
+
+def design_matrix(taps, cutoff, fs, family="sinc", window="hamming"):
+    """
+    Float coefficients of one low-pass filter per tap count, as the rows of a matrix
+    (zero padded to the largest tap count). Every row has unity DC gain.
+
+    family: "sinc" (windowed sinc with the given cutoff in Hz) or "ma" (moving average, as fir_MA).
+    """
+    taps = np.asarray(taps)
+    n_max = taps.max()
+    k = np.arange(n_max)[None, :]
+    n = taps[:, None]
+    valid = k < n
+
+    if family == "ma":
+        h = valid.astype(float)
+    elif family == "sinc":
+        m = k - (n - 1) / 2 # distance from the center of each filter
+        h = np.sinc(2 * cutoff / fs * m)
+
+        windows = {"hamming": (0.54, 0.46), "hann": (0.5, 0.5)}
+        if window not in windows:
+            raise ValueError(f"Unknown window '{window}'")
+        a0, a1 = windows[window]
+        denom = np.maximum(n - 1, 1)
+        h = h * (a0 - a1 * np.cos(2*np.pi*k/denom))
+        h = np.where(valid, h, 0.0)
+    else:
+        raise ValueError(f"Unknown family '{family}'")
+
+    return h / h.sum(axis=1, keepdims=True)
+
+
+def quantize(h, coeff_w=12, frac=FRAC, unity_gain=True, n_taps=None):
+    """
+    Round float coefficients to COEFF_W-bit signed integers in Q0.FRAC.
+
+    With unity_gain=True the rounding error of the sum is moved so that sum(q) == 2**FRAC exactly
+    (plain truncation, as in fir_MA, loses gain: e.g. 20 * (4096 // 20) = 4080). On symmetric rows it
+    goes to the center tap, or is split evenly over the two central taps, so the filter keeps its
+    linear phase (a symmetric row of even length has an even sum, so the split is exact); on the
+    other rows it goes to the largest tap.
+
+    n_taps: length of each row (the rows of design_matrix are zero padded), default the full width.
+
+    Returns the integer matrix and a boolean per row telling whether every tap fits in COEFF_W bits.
+    """
+    q = np.rint(h * 2**frac).astype(np.int64)
+
+    if unity_gain:
+        rows = np.arange(len(q))
+        n = np.full(len(q), q.shape[1]) if n_taps is None else np.asarray(n_taps)
+        err = 2**frac - q.sum(axis=1)
+
+        k = np.arange(q.shape[1])[None, :]
+        mirror = np.clip(n[:, None] - 1 - k, 0, q.shape[1] - 1)
+        symmetric = np.all((q == q[rows[:, None], mirror]) | (k >= n[:, None]), axis=1)
+
+        lo, hi = (n - 1) // 2, n // 2 # the same tap for odd lengths
+        peak = np.argmax(np.abs(q), axis=1)
+        q[rows, np.where(symmetric, lo, peak)] += np.where(symmetric & (lo != hi), err // 2, err)
+        q[rows, hi] += np.where(symmetric & (lo != hi), err - err // 2, 0)
+
+    lo, hi = -(1 << (coeff_w - 1)), (1 << (coeff_w - 1)) - 1
+    fits = np.all((q >= lo) & (q <= hi), axis=1)
+
+    return np.clip(q, lo, hi), fits
+
+
+def evaluate(q, fpass, fstop, fs=WS_frequency, frac=FRAC, nfft=NFFT):
+    """
+    Frequency-domain metrics of every row of the integer coefficient matrix q (batched rfft).
+
+    Returns a dict of arrays (one value per row):
+    passband_dev_db: max |gain in dB| up to fpass (relative to 0 dB).
+    stopband_atten_db: minimum attenuation from fstop to fs/2.
+    gain_error: DC gain - 1.
+    """
+    H = db(np.fft.rfft(q / 2**frac, n=nfft, axis=1))
+    f = np.fft.rfftfreq(nfft, d=1/fs)
+
+    return {
+        "passband_dev_db": np.max(np.abs(H[:, f <= fpass]), axis=1),
+        "stopband_atten_db": -np.max(H[:, f >= fstop], axis=1),
+        "gain_error": q.sum(axis=1) / 2**frac - 1,
+    }
+
+
+def explore(fpass, fstop, atten_db, ripple_db=1.0, fs=WS_frequency, n_min=2, n_max=128,
+            coeff_w=12, frac=FRAC, data_w=24, family="sinc", window="hamming", unity_gain=True, nfft=NFFT):
+    """
+    Design, quantize and evaluate a filter for every N_TAPS in [n_min, n_max].
+
+    A design meets the spec if the stopband attenuation is at least atten_db, the passband
+    deviation at most ripple_db and all the taps fit in COEFF_W bits.
+
+    Returns:
+    table: dict of arrays, one entry per N_TAPS (n_taps, metrics, acc_w, fits, ok).
+    best: dict with the smallest N_TAPS design meeting the spec (n_taps, coeff, acc_w, metrics), or None.
+
+    Raises ValueError unless 0 < fpass < fstop < fs/2 (the bands must be inside the Nyquist range).
+    """
+    if not 0 < fpass < fstop < fs / 2:
+        raise ValueError(f"Need 0 < fpass < fstop < fs/2 = {fs / 2:g} Hz, got fpass={fpass:g}, fstop={fstop:g}")
+
+    taps = np.arange(n_min, n_max + 1)
+    cutoff = (fpass + fstop) / 2
+
+    h = design_matrix(taps, cutoff, fs, family, window)
+    q, fits = quantize(h, coeff_w, frac, unity_gain, n_taps=taps)
+    table = evaluate(q, fpass, fstop, fs, frac, nfft)
+    table["n_taps"] = taps
+    table["acc_w"] = acc_width(q, data_w)
+    table["fits"] = fits
+    table["ok"] = fits & (table["stopband_atten_db"] >= atten_db) & (table["passband_dev_db"] <= ripple_db)
+
+    best = None
+    hits = np.flatnonzero(table["ok"])
+    if len(hits):
+        i = hits[0]
+        best = {k: (v[i].item() if hasattr(v[i], "item") else v[i]) for k, v in table.items()}
+        best["coeff"] = q[i, :taps[i]].tolist()
+        best["frac"] = frac
+        best["coeff_w"] = coeff_w
+
+    return table, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Smallest quantized FIR meeting a low-pass spec.")
+    parser.add_argument("--fpass", type=float, required=True, help="passband edge (Hz)")
+    parser.add_argument("--fstop", type=float, required=True, help="stopband edge (Hz)")
+    parser.add_argument("--atten", type=float, default=40.0, help="min stopband attenuation (dB)")
+    parser.add_argument("--ripple", type=float, default=1.0, help="max passband deviation (dB)")
+    parser.add_argument("--fs", type=float, default=WS_frequency)
+    parser.add_argument("--coeff-w", type=int, default=12)
+    parser.add_argument("--data-w", type=int, default=24)
+    parser.add_argument("--n-max", type=int, default=128)
+    parser.add_argument("--family", choices=("sinc", "ma"), default="sinc")
+    args = parser.parse_args(argv)
+
+    try:
+        table, best = explore(args.fpass, args.fstop, args.atten, args.ripple, fs=args.fs, n_max=args.n_max,
+                              coeff_w=args.coeff_w, data_w=args.data_w, family=args.family)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 2
+
+    if best is None:
+        i = int(np.argmax(table["stopband_atten_db"]))
+        print(f"No design meets the spec; best attenuation {table['stopband_atten_db'][i]:.1f} dB "
+              f"with N_TAPS={table['n_taps'][i]}")
+        return 1
+
+    print(f"N_TAPS={best['n_taps']} ACC_W={best['acc_w']} attenuation={best['stopband_atten_db']:.1f} dB "
+          f"passband dev={best['passband_dev_db']:.2f} dB gain error={best['gain_error']:.2e}")
+    print("COEFF =", best["coeff"])
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import numpy as np
+
+# Bit-exact software model of the FIR filters implemented in VHDL
+# (sources_1/new/fir_MA.vhd and sources_1/new/fir_filter_4_24bit.vhd).
+# All the arithmetic is done on int64 arrays, one vectorized pass per tap (no loop over the samples).
+
+FRAC = 12 # fractional bits of the Q0.12 coefficients (constant FRAC in the VHDL)
+
+# Register stages between i_data and o_data, in clock (word select) periods:
+# fir_MA accumulates the shift register (1 stage), fir_filter_4_24bit registers x, the products,
+# the accumulator and the scaled accumulator (3 stages after the shift register input).
+FIR_MA_LATENCY = 1
+FIR_4_24BIT_LATENCY = 3
+
+# Generics of fir_filter_4_24bit (filter [1,1,1,1]/4 in Q0.12)
+COEFF_4_24BIT = np.array([1024, 1024, 1024, 1024], dtype=np.int64)
+ACC_W_4_24BIT = 41
+
+
+def wrap_signed(x, width):
+    """
+    Two's complement wrap-around of x to width bits (what resize() does on signed values).
+    """
+    x = np.asarray(x, dtype=np.int64)
+    if width >= 64:
+        return x
+
+    offset = np.int64(1) << (width - 1)
+
+    return ((x + offset) & ((offset << 1) - 1)) - offset
+
+
+def saturate_signed(x, width):
+    """
+    Clip x to the range of a width-bit signed number (saturation_signed in the VHDL).
+    """
+    return np.clip(x, -(1 << (width - 1)), (1 << (width - 1)) - 1)
+
+
+def signed_bits(v):
+    """
+    Minimum two's complement width of every element of v (1 for 0 and -1).
+    Exact for |v| < 2**53.
+    """
+    v = np.asarray(v, dtype=np.int64)
+    u = np.where(v < 0, ~v, v)
+
+    return np.frexp(u.astype(np.float64))[1].astype(np.int64) + 1
+
+
+def acc_width(coeff, data_w=24):
+    """
+    Accumulator width (bits, signed) needed by the worst DATA_W-bit input: every sample at the
+    extreme that maximizes |acc| for the sign of its coefficient. Exact: the width of the two
+    extreme sums (e.g. 36 for 2**12 in Q0.12 at 24 bits, since -2**35 fits in 36 bits).
+    coeff may be a matrix (one width per row, along the last axis).
+    """
+    q = np.asarray(coeff, dtype=np.int64)
+    lo, hi = -(1 << (data_w - 1)), (1 << (data_w - 1)) - 1
+    pos = np.where(q > 0, q, 0).sum(axis=-1)
+    neg = np.where(q < 0, q, 0).sum(axis=-1)
+
+    return np.maximum(signed_bits(pos * hi + neg * lo), signed_bits(pos * lo + neg * hi))
+
+
+def ma_coeff(n_taps, coeff_w=12, frac=FRAC):
+    """
+    Coefficients of fir_MA: every tap is COEFF_VALUE = 2**FRAC / N_TAPS (integer division),
+    converted with to_signed(COEFF_VALUE, COEFF_W).
+    """
+    value = wrap_signed((1 << frac) // n_taps, coeff_w)
+
+    return np.full(n_taps, value, dtype=np.int64)
+
+
+def fir_accumulator(x, coeff, data_w=24, coeff_w=12, latency=FIR_MA_LATENCY, zi=None):
+    """
+    Exact (unbounded) accumulator sum_i x[k-i] * coeff[i] of the fixed-point datapath, aligned with
+    the output of fir_fixed_point (same arguments). The hardware keeps it on ACC_W bits.
+    """
+    x = wrap_signed(x, data_w)
+    coeff = wrap_signed(coeff, coeff_w)
+    n_taps = len(coeff)
+    n_hist = n_taps - 1 + latency
+
+    if zi is None:
+        zi = np.zeros(n_hist, dtype=np.int64)
+    elif len(zi) != n_hist:
+        raise ValueError(f"zi must contain {n_hist} samples, got {len(zi)}")
+
+    xp = np.concatenate([wrap_signed(zi, data_w), x]) # x padded with the register history
+    n = len(x)
+
+    if np.all(coeff == coeff[0]):
+        # moving average: one multiplication on the running sum of the last n_taps samples
+        cs = np.concatenate([[0], np.cumsum(xp)])
+        return coeff[0] * (cs[n_taps:n_taps + n] - cs[:n])
+
+    acc = np.zeros(n, dtype=np.int64)
+    for i, c in enumerate(coeff):
+        start = n_taps - 1 - i
+        acc += c * xp[start:start + n]
+
+    return acc
+
+
+def fir_fixed_point(x, coeff, data_w=24, coeff_w=12, acc_w=44, frac=FRAC, latency=FIR_MA_LATENCY, zi=None):
+    """
+    Filter x exactly as the fixed-point datapath does:
+        acc    = sum_i resize(x[k-i] * coeff[i], ACC_W)     (wraps on ACC_W bits)
+        y[k+latency] = saturation_signed(shift_right(acc, FRAC)) to DATA_W bits
+
+    Args:
+    x: input samples (integers, DATA_W-bit signed).
+    coeff: integer coefficients (COEFF_W-bit signed, Q0.FRAC).
+    latency: register stages between input and output (see FIR_MA_LATENCY, FIR_4_24BIT_LATENCY).
+    zi: the last len(coeff)-1+latency input samples before x (state of the registers).
+        Default: zeros, as after a reset.
+
+    Returns:
+    y: int64 array with the same length as x.
+    """
+    acc = wrap_signed(fir_accumulator(x, coeff, data_w, coeff_w, latency, zi), acc_w)
+
+    return saturate_signed(acc >> frac, data_w) # >> on int64 is an arithmetic shift, as shift_right on signed
+
+
+def fir_ma(x, data_w=24, coeff_w=12, acc_w=44, n_taps=4, frac=FRAC, zi=None):
+    """
+    Model of the fir_MA entity, with the same generics.
+    """
+    return fir_fixed_point(x, ma_coeff(n_taps, coeff_w, frac), data_w=data_w, coeff_w=coeff_w,
+                           acc_w=acc_w, frac=frac, latency=FIR_MA_LATENCY, zi=zi)
+
+
+def fir_filter_4_24bit(x, data_w=24, coeff_w=12, acc_w=ACC_W_4_24BIT, coeff=COEFF_4_24BIT, zi=None):
+    """
+    Model of the fir_filter_4_24bit entity (fixed coefficients C0..C3).
+    """
+    return fir_fixed_point(x, coeff, data_w=data_w, coeff_w=coeff_w, acc_w=acc_w,
+                           frac=FRAC, latency=FIR_4_24BIT_LATENCY, zi=zi)
+
+
+class FirStream:
+    """
+    fir_fixed_point applied block by block: the register history (zi) is carried from one block
+    to the next, so the concatenated outputs are exactly the output for the whole signal.
+
+    Example:
+        fir = FirStream(ma_coeff(20))
+        y = np.concatenate([fir.process(block) for block in blocks])
+    """
+
+    def __init__(self, coeff, data_w=24, coeff_w=12, acc_w=44, frac=FRAC, latency=FIR_MA_LATENCY, zi=None):
+        self.coeff = wrap_signed(coeff, coeff_w)
+        self.data_w = data_w
+        self.coeff_w = coeff_w
+        self.acc_w = acc_w
+        self.frac = frac
+        self.latency = latency
+
+        n_hist = len(self.coeff) - 1 + latency
+        self.zi = np.zeros(n_hist, dtype=np.int64) if zi is None else wrap_signed(zi, data_w)
+
+    def process(self, x):
+        x = wrap_signed(x, self.data_w)
+        y = fir_fixed_point(x, self.coeff, data_w=self.data_w, coeff_w=self.coeff_w, acc_w=self.acc_w,
+                            frac=self.frac, latency=self.latency, zi=self.zi)
+
+        # new history: the last n_hist samples of (zi, x)
+        n_hist = len(self.zi)
+        if len(x) >= n_hist:
+            self.zi = x[len(x) - n_hist:].copy()
+        else:
+            self.zi = np.concatenate([self.zi[len(x):], x])
+
+        return y
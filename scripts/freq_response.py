@@ -0,0 +1,182 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Theoretical frequency response of FIR coefficients, memoized.
+# The batch, sweep and plot scripts ask for the response of the same few coefficient sets over and
+# over: the results are kept in an LRU cache keyed on (coefficients, nfft, fs, grid), and returned
+# as read-only arrays. Besides the uniform rfft grid, any frequency grid can be evaluated: a short
+# one (a few hundred points, e.g. log spaced) directly as a DTFT, like a bank of Goertzel filters,
+# and a long uniformly spaced one (a zoom on the audio band) with the chirp-z transform.
+# Magnitude, phase and group delay come out together: the group delay is Re(DTFT(n*h) / DTFT(h)),
+# so both transforms are computed in the same pass.
+
+NFFT = 4096 # points of the default rfft grid (as in plot_freqz and freq_response_filters)
+MAX_ENTRIES = 128 # bound of the LRU cache
+DIRECT_MAX_OPS = 1 << 22 # a grid of points*taps up to this is evaluated directly (not with the chirp-z)
+BLOCK_OPS = 1 << 20 # size bound of the DTFT matrix computed at once
+EPS = 1e-12
+
+_cache = OrderedDict()
+_lock = threading.Lock() # the monitor calls from its worker thread
+_stats = {"hits": 0, "misses": 0}
+
+
+def _is_uniform(f):
+    if len(f) < 3:
+        return False
+    step = np.diff(f)
+
+    return step[0] > 0 and np.allclose(step, step[0], rtol=1e-9, atol=0)
+
+
+def _rfft_grid(h, fs, nfft):
+    """
+    Response at the nfft/2+1 frequencies of np.fft.rfftfreq(nfft, 1/fs). Longer filters are folded
+    (time aliased) to nfft samples, so the samples of the DTFT stay exact.
+    """
+    n = h.shape[-1]
+    if n > nfft:
+        pad = np.zeros(h.shape[:-1] + (-n % nfft,))
+        h = np.concatenate([h, pad], axis=-1).reshape(h.shape[:-1] + (-1, nfft)).sum(axis=-2)
+
+    return np.fft.rfftfreq(nfft, d=1/fs), np.fft.rfft(h, n=nfft, axis=-1)
+
+
+def dtft(h, f, fs):
+    """
+    Direct DTFT of the rows of h at the frequencies f (Hz), in blocks of frequencies.
+    """
+    h = np.atleast_2d(h)
+    k = np.arange(h.shape[-1])
+    block = max(1, BLOCK_OPS // h.shape[-1])
+
+    H = np.empty((h.shape[0], len(f)), dtype=complex)
+    for i in range(0, len(f), block):
+        E = np.exp(-2j*np.pi*np.outer(k, f[i:i + block]) / fs) # (taps, block)
+        H[:, i:i + block] = h @ E
+
+    return H
+
+
+def czt(h, f0, df, m, fs):
+    """
+    Chirp-z transform (Bluestein) of the rows of h on the m uniformly spaced frequencies f0 + k*df (Hz):
+    the DTFT on the grid is rewritten as a convolution with a chirp, computed with FFTs of a power of
+    two length, in O((taps + m) log(taps + m)) instead of O(taps * m).
+    """
+    h = np.atleast_2d(h)
+    n = h.shape[-1]
+    L = 1 << int(np.ceil(np.log2(n + m - 1)))
+    a = df / fs
+
+    t = np.arange(n)
+    y = h * np.exp(-1j*np.pi*(2*f0/fs*t + a*t*t)) # h[n] A^-n W^(n^2/2)
+
+    v = np.zeros(L, dtype=complex) # chirp W^(-j^2/2), j = -(n-1) .. m-1, circularly placed
+    j = np.arange(m)
+    v[:m] = np.exp(1j*np.pi*a*j*j)
+    j = np.arange(1, n)
+    v[L - n + 1:] = np.exp(1j*np.pi*a*j*j)[::-1]
+
+    X = np.fft.ifft(np.fft.fft(y, L, axis=-1) * np.fft.fft(v), axis=-1)[:, :m]
+    k = np.arange(m)
+
+    return X * np.exp(-1j*np.pi*a*k*k)
+
+
+def _compute(h, fs, nfft, f):
+    hn = np.stack([h, h * np.arange(len(h))]) # h and n*h: response and its derivative
+
+    if f is None:
+        f, H = _rfft_grid(hn, fs, nfft)
+        method = "rfft"
+    elif len(f) * len(h) > DIRECT_MAX_OPS and _is_uniform(f):
+        H = czt(hn, f[0], (f[-1] - f[0]) / (len(f) - 1), len(f), fs)
+        method = "czt"
+    else:
+        H = dtft(hn, f, fs)
+        method = "dtft"
+
+    H, Hn = H
+    mag = np.abs(H)
+    small = mag <= EPS * max(mag.max(initial=0), EPS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gd = np.where(small, np.nan, np.real(Hn / np.where(small, 1, H)))
+
+    result = {
+        "f": np.asarray(f, dtype=float),
+        "H": H,
+        "mag": mag,
+        "mag_db": 20*np.log10(np.maximum(mag, EPS)),
+        "phase": np.unwrap(np.angle(H)),
+        "group_delay": gd,
+        "method": method,
+    }
+    for v in result.values():
+        if isinstance(v, np.ndarray):
+            v.setflags(write=False) # shared by every caller through the cache
+
+    return result
+
+
+def freq_response(coeff, fs, nfft=NFFT, f=None):
+    """
+    Frequency response of the FIR coefficients, memoized.
+
+    Args:
+    coeff: FIR coefficients (the impulse response).
+    fs: sample rate in Hz.
+    nfft: points of the uniform grid np.fft.rfftfreq(nfft, 1/fs), used when f is None.
+    f: optional frequencies in Hz (any grid, e.g. np.geomspace(20, 20000, 300) or np.linspace(100, 2000, 5000)).
+
+    Returns a dict with (read-only arrays):
+    f: frequencies in Hz.
+    H: complex response.
+    mag, mag_db: magnitude, linear and in dB.
+    phase: unwrapped phase in radians.
+    group_delay: group delay in samples (nan where |H| is 0).
+    method: "rfft", "dtft" or "czt".
+    """
+    h = np.asarray(coeff, dtype=float).ravel()
+    if f is not None:
+        f = np.array(f, dtype=float).ravel() # a copy: the cached result must not share the caller's array
+        grid = hashlib.sha1(f.tobytes()).hexdigest()
+        nfft = None
+    else:
+        grid = None
+    key = (h.tobytes(), float(fs), nfft, grid)
+
+    with _lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return result
+        _stats["misses"] += 1
+
+    result = _compute(h, fs, nfft, f)
+
+    with _lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+    return result
+
+
+def cache_info():
+    """
+    Hits, misses and current size of the response cache.
+    """
+    with _lock:
+        return dict(_stats, size=len(_cache), max_entries=MAX_ENTRIES)
+
+
+def cache_clear():
+    with _lock:
+        _cache.clear()
+        _stats["hits"] = _stats["misses"] = 0
@@ -0,0 +1,143 @@
+#########
+# Golden-model check of the hardware captures: the FIR input logged by the ILA is run through the
+# bit-exact fixed-point model (fir_model.py) and compared sample by sample with the logged output.
+#
+# Usage (from the scripts folder):
+#   python golden_diff.py                          -> all log_from_hardware/*TAPS.csv
+#   python golden_diff.py ../log_from_hardware/20TAPS.csv --n-taps 20
+##################
+
+import argparse
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+
+from capture_cache import load_cached
+from capture_io import frame_samples
+from fir_model import fir_fixed_point, ma_coeff
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "log_from_hardware")
+DEFAULT_GLOB = os.path.join(LOG_DIR, "*TAPS.csv")
+
+CHANNELS = {"L": ("l_in230", "l_data_tx230"), "R": ("r_in230", "r_data_tx230")}
+MAX_LAG = 8 # maximum pipeline latency searched, in frames
+
+
+def n_taps_from_name(path):
+    """
+    Tap count encoded in the capture file name, e.g. 20TAPS.csv -> 20.
+    """
+    m = re.search(r"(\d+)TAPS", os.path.basename(path), re.IGNORECASE)
+
+    return int(m.group(1)) if m else None
+
+
+def golden_diff(x, y, coeff, data_w=24, coeff_w=12, acc_w=44, max_lag=MAX_LAG):
+    """
+    Compare the logged output y with the model output for the logged input x (both one sample per frame).
+
+    The capture starts in the middle of the stream, so the first len(coeff) outputs of the model
+    (whose registers start from zero) are skipped. The latency is the lag in [0, max_lag] with the
+    lowest mismatch rate.
+
+    Returns a dict with latency, compared samples, mismatches, index of the first mismatch
+    (in frames, -1 if none) and max absolute error.
+    """
+    model = fir_fixed_point(x, coeff, data_w=data_w, coeff_w=coeff_w, acc_w=acc_w, latency=0)
+    y = np.asarray(y, dtype=np.int64)
+    skip = len(coeff)
+
+    best = None
+    for lag in range(max_lag + 1):
+        n = min(len(model), len(y) - lag) - skip
+        if n <= 0:
+            break
+
+        err = y[skip + lag:skip + lag + n] - model[skip:skip + n]
+        mismatches = int(np.count_nonzero(err))
+
+        # compare rates, the number of compared samples decreases with the lag
+        if best is None or mismatches * len(best[2]) < best[1] * len(err):
+            best = (lag, mismatches, err)
+
+    if best is None:
+        raise ValueError("Capture too short for the golden-model comparison")
+
+    lag, mismatches, err = best
+    bad = np.flatnonzero(err)
+
+    return {
+        "latency": lag,
+        "compared": len(err),
+        "mismatches": mismatches,
+        "first_mismatch": int(bad[0]) + skip + lag if len(bad) else -1,
+        "max_error": int(np.max(np.abs(err))) if len(err) else 0,
+    }
+
+
+def diff_capture(path, n_taps=None, coeff=None, data_w=24, coeff_w=12, acc_w=44, data=None):
+    """
+    Golden-model check of every channel of a capture.
+
+    Args:
+    n_taps: tap count of fir_MA (default: from the file name). Ignored if coeff is given.
+    coeff: explicit integer coefficients (Q0.12) of the filter.
+    data: already loaded capture (default: loaded from path).
+
+    Returns a dict {channel: result of golden_diff}; first_mismatch is converted to a capture row.
+    """
+    if coeff is None:
+        n_taps = n_taps or n_taps_from_name(path)
+        if n_taps is None:
+            raise ValueError(f"Cannot infer N_TAPS from '{path}', pass it explicitly")
+        coeff = ma_coeff(n_taps, coeff_w)
+
+    if data is None:
+        data = load_cached(path)
+
+    results = {}
+    for ch, (in_name, out_name) in CHANNELS.items():
+        if not {in_name, out_name}.issubset(data.dtype.names):
+            continue
+
+        x, _ = frame_samples(np.asarray(data[in_name]))
+        y, rows = frame_samples(np.asarray(data[out_name]))
+        res = golden_diff(x, y, coeff, data_w=data_w, coeff_w=coeff_w, acc_w=acc_w)
+
+        if res["first_mismatch"] >= 0:
+            res["first_mismatch"] = int(rows[res["first_mismatch"]])
+        results[ch] = res
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare hardware captures with the bit-exact FIR model.")
+    parser.add_argument("paths", nargs="*", help=f"capture files or globs (default: {DEFAULT_GLOB})")
+    parser.add_argument("--n-taps", type=int, default=None, help="fir_MA N_TAPS (default: from file name)")
+    parser.add_argument("--coeff-w", type=int, default=12)
+    parser.add_argument("--acc-w", type=int, default=44)
+    args = parser.parse_args(argv)
+
+    paths = sorted(p for g in (args.paths or [DEFAULT_GLOB]) for p in glob.glob(g))
+    if not paths:
+        print("ERROR: None captures were found!")
+        return 2
+
+    failed = False
+    print(f"{'capture':<28} {'ch':<3} {'latency':>7} {'compared':>9} {'mismatch':>9} {'first':>7} {'max_err':>8}")
+    for path in paths:
+        results = diff_capture(path, n_taps=args.n_taps, coeff_w=args.coeff_w, acc_w=args.acc_w)
+        for ch, r in results.items():
+            failed |= r["mismatches"] > 0
+            print(f"{os.path.basename(path):<28} {ch:<3} {r['latency']:>7} {r['compared']:>9} "
+                  f"{r['mismatches']:>9} {r['first_mismatch']:>7} {r['max_error']:>8}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#########
+# Headroom profiler of the fixed-point FIR datapath (fir_MA.vhd and the fir_model.py model).
+# The exact accumulator is computed for every sample of a capture or of a stimulus set and compared
+# with the configured widths: histogram of the accumulator width actually used, wrap-arounds and
+# near-overflows of ACC_W, output saturations (saturation_signed), where they happen (per-second
+# counts and first positions) and the minimum ACC_W / COEFF_W that keep the output bit-exact for the
+# observed data, next to the worst-case bound of any DATA_W-bit input.
+#
+# Usage (from the scripts folder):
+#   python headroom.py ../log_from_hardware/20TAPS.csv
+#   python headroom.py --stimuli --n-taps 4 10 20 --amp 0.99 --duration 10
+##################
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from capture_io import WS_frequency
+from fir_model import (FIR_MA_LATENCY, FRAC, acc_width, fir_accumulator, ma_coeff, saturate_signed, signed_bits,
+                       wrap_signed)
+
+NEAR_BITS = 1 # an accumulator value within NEAR_BITS bits of ACC_W counts as a near-overflow
+POSITIONS = 16 # first sample indices kept for every kind of event
+
+
+class HeadroomProfiler:
+    """
+    Headroom statistics of the datapath, updated block by block (the register history is carried
+    between blocks, as in fir_model.FirStream).
+
+    Example:
+        prof = HeadroomProfiler(ma_coeff(20, coeff_w=64))   # intended coefficients, before COEFF_W
+        for block in blocks:
+            prof.update(block)
+        report = prof.result()
+    """
+
+    def __init__(self, coeff, data_w=24, coeff_w=12, acc_w=44, frac=FRAC, latency=FIR_MA_LATENCY,
+                 near_bits=NEAR_BITS, bucket=int(WS_frequency)):
+        """
+        Args:
+        coeff: intended integer coefficients; they are wrapped to COEFF_W as the hardware does.
+        bucket: samples per bucket of the event counts over time (default: one second).
+        """
+        self.intended = np.asarray(coeff, dtype=np.int64)
+        self.coeff = wrap_signed(self.intended, coeff_w)
+        self.data_w = data_w
+        self.coeff_w = coeff_w
+        self.acc_w = acc_w
+        self.frac = frac
+        self.latency = latency
+        self.near_bits = near_bits
+        self.bucket = bucket
+
+        self.zi = np.zeros(len(self.coeff) - 1 + latency, dtype=np.int64)
+        self.n = 0
+        self.acc_hist = np.zeros(65, dtype=np.int64) # count of samples per accumulator width
+        self.in_hist = np.zeros(65, dtype=np.int64) # count of samples per input width
+        self.out_max_bits = 0 # width of the exact acc >> FRAC
+        self.acc_min = self.acc_max = 0
+        self.counts = {k: 0 for k in ("overflow", "near_overflow", "saturated_high", "saturated_low", "saturated_exact")}
+        self.positions = {k: [] for k in ("overflow", "saturated")}
+        self.per_bucket = {k: np.zeros(0, dtype=np.int64) for k in ("overflow", "near_overflow", "saturated")}
+
+    def _where(self, kind, mask, offset):
+        if len(self.positions[kind]) < POSITIONS:
+            idx = np.flatnonzero(mask)[:POSITIONS - len(self.positions[kind])]
+            self.positions[kind].extend(int(i) + offset for i in idx)
+
+    def _bucket(self, kind, mask, offset):
+        idx = np.flatnonzero(mask) + offset
+        if len(idx) == 0:
+            return
+        counts = np.bincount(idx // self.bucket)
+        acc = self.per_bucket[kind]
+        if len(counts) > len(acc):
+            acc = np.concatenate([acc, np.zeros(len(counts) - len(acc), dtype=np.int64)])
+        acc[:len(counts)] += counts
+        self.per_bucket[kind] = acc
+
+    def update(self, x):
+        x = wrap_signed(x, self.data_w)
+        n = len(x)
+        if n == 0:
+            return self
+
+        acc = fir_accumulator(x, self.coeff, self.data_w, self.coeff_w, self.latency, self.zi)
+        n_hist = len(self.zi)
+        self.zi = x[n - n_hist:].copy() if n >= n_hist else np.concatenate([self.zi[n:], x])
+
+        bits = signed_bits(acc)
+        self.acc_hist += np.bincount(bits, minlength=65)
+        self.in_hist += np.bincount(signed_bits(x), minlength=65)
+        self.acc_min = min(self.acc_min, int(acc.min()))
+        self.acc_max = max(self.acc_max, int(acc.max()))
+        self.out_max_bits = max(self.out_max_bits, int(signed_bits(acc >> self.frac).max()))
+
+        overflow = bits > self.acc_w
+        near = (bits > self.acc_w - self.near_bits) & ~overflow
+
+        # output as the hardware computes it (wrapped accumulator), and as an exact accumulator would
+        q = wrap_signed(acc, self.acc_w) >> self.frac
+        y = saturate_signed(q, self.data_w)
+        high, low = q > y, q < y
+        exact = acc >> self.frac
+        self.counts["saturated_exact"] += int(np.count_nonzero(exact != saturate_signed(exact, self.data_w)))
+
+        offset = self.n
+        for kind, mask in (("overflow", overflow), ("near_overflow", near), ("saturated_high", high),
+                           ("saturated_low", low)):
+            self.counts[kind] += int(np.count_nonzero(mask))
+        self._where("overflow", overflow, offset)
+        self._where("saturated", high | low, offset)
+        self._bucket("overflow", overflow, offset)
+        self._bucket("near_overflow", near, offset)
+        self._bucket("saturated", high | low, offset)
+
+        self.n += n
+
+        return self
+
+    def result(self):
+        """
+        Returns a dict (JSON serializable):
+        samples, configured widths, histograms {width: count} of the accumulator and of the input,
+        event counts, first positions and counts per bucket, and the minimum widths:
+          acc_w_observed: ACC_W with no wrap-around on these data (output bit-exact with any wider ACC_W);
+          acc_w_worst_case: ACC_W with no wrap-around for any input;
+          coeff_w_min: COEFF_W that holds the intended coefficients (with FRAC fractional bits).
+        """
+        acc_bits = int(np.flatnonzero(self.acc_hist).max()) if self.n else 0
+        coeff_w_min = int(signed_bits(self.intended).max())
+        n_buckets = max((len(v) for v in self.per_bucket.values()), default=0)
+
+        return {
+            "samples": self.n,
+            "data_w": self.data_w,
+            "coeff_w": self.coeff_w,
+            "acc_w": self.acc_w,
+            "frac": self.frac,
+            "acc_range": [self.acc_min, self.acc_max],
+            "acc_hist": {int(w): int(c) for w, c in enumerate(self.acc_hist) if c},
+            "in_hist": {int(w): int(c) for w, c in enumerate(self.in_hist) if c},
+            "in_bits_max": int(np.flatnonzero(self.in_hist).max()) if self.n else 0,
+            "out_bits_max": self.out_max_bits,
+            **self.counts,
+            "positions": self.positions,
+            "bucket_samples": self.bucket,
+            "per_bucket": {k: np.pad(v, (0, n_buckets - len(v))).tolist() for k, v in self.per_bucket.items()},
+            "coeff_wraps": bool(np.any(self.coeff != self.intended)),
+            "acc_w_observed": acc_bits,
+            "acc_w_worst_case": int(acc_width(self.intended, self.data_w)),
+            "coeff_w_min": coeff_w_min,
+            "product_w_min": self.data_w + coeff_w_min,
+            "acc_headroom_bits": self.acc_w - acc_bits,
+        }
+
+
+class HeadroomReducer:
+    """
+    HeadroomProfiler of an input column, fed by chunked.FrameReader blocks (chunked.run).
+    """
+
+    def __init__(self, in_col, coeff, **kwargs):
+        self.in_col = in_col
+        self.profiler = HeadroomProfiler(coeff, **kwargs)
+
+    def update(self, start, block):
+        self.profiler.update(block[self.in_col])
+
+    def result(self):
+        return self.profiler.result()
+
+
+def profile_capture(path, n_taps=None, coeff=None, chunk_rows=None, data_w=24, coeff_w=12, acc_w=44, near_bits=NEAR_BITS):
+    """
+    Headroom of the datapath on the inputs of every channel of a capture, in one streaming pass.
+    The full-scale hits of the logged outputs are counted too, to compare with the modeled saturations.
+
+    Returns {channel: result} (see HeadroomProfiler.result, plus out_full_scale).
+    """
+    from capture_io import CHUNK_ROWS
+    from chunked import FrameReader, StatsReducer, capture_columns, run
+    from golden_diff import CHANNELS, n_taps_from_name
+
+    if coeff is None:
+        n_taps = n_taps or n_taps_from_name(path)
+        if n_taps is None:
+            raise ValueError(f"Cannot infer N_TAPS from '{path}'")
+        coeff = ma_coeff(n_taps, coeff_w=64)
+
+    names = capture_columns(path)
+    channels = {ch: (a, b) for ch, (a, b) in CHANNELS.items() if {a, b}.issubset(names)}
+    if not channels:
+        raise KeyError(f"No input/output columns found; fields found: {names}")
+
+    reducers = {ch: HeadroomReducer(a, coeff, data_w=data_w, coeff_w=coeff_w, acc_w=acc_w, near_bits=near_bits)
+                for ch, (a, _) in channels.items()}
+    reducers["stats"] = StatsReducer([b for _, b in channels.values()], data_w)
+    columns = [c for pair in channels.values() for c in pair]
+
+    results = run(FrameReader(path, columns, chunk_rows or CHUNK_ROWS), reducers)
+    stats = results.pop("stats")
+    for ch, (_, b) in channels.items():
+        results[ch]["out_full_scale"] = stats[b]["clipped"]
+
+    return results
+
+
+def profile_stimuli(n_taps, signals=None, duration=10.0, amp=0.99, fs=WS_frequency, seed=0, data_w=24,
+                    coeff_w=12, acc_w=44, near_bits=NEAR_BITS):
+    """
+    Headroom of fir_MA with n_taps taps on the stimulus set of vectors.SIGNALS (amplitude relative
+    to full scale). Returns {signal: result}.
+    """
+    from vectors import SIGNALS, to_fixed
+    from stimulus import rechunk
+
+    out = {}
+    for name in signals or SIGNALS:
+        prof = HeadroomProfiler(ma_coeff(n_taps, coeff_w=64), data_w=data_w, coeff_w=coeff_w, acc_w=acc_w,
+                                near_bits=near_bits, bucket=int(fs))
+        for block in rechunk(SIGNALS[name](fs, duration, amp, seed), 1 << 16):
+            prof.update(to_fixed(block, data_w))
+        out[name] = prof.result()
+
+    return out
+
+
+def plot_histogram(result, title, path=None):
+    """
+    Bar chart of the accumulator widths used, with the configured ACC_W and the worst-case bound.
+    """
+    import render
+
+    fig, ax = render.new_axes("headroom")
+    hist = result["acc_hist"]
+    widths = np.array(sorted(hist))
+    counts = np.array([hist[w] for w in widths])
+
+    ax.bar(widths, counts / max(1, result["samples"]), color="navy", alpha=0.7, label="Observed")
+    ax.axvline(result["acc_w"], color="red", linestyle="--", label=f"ACC_W = {result['acc_w']}")
+    ax.axvline(result["acc_w_worst_case"], color="green", linestyle=":", label=f"Worst case = {result['acc_w_worst_case']}")
+    ax.set_yscale("log")
+    ax.set_title(f"{title} - accumulator width")
+    ax.set_xlabel("Signed bits")
+    ax.set_ylabel("Fraction of samples")
+    ax.grid(True)
+    ax.legend()
+
+    return render.finish(fig, path)
+
+
+def _summary_line(name, r):
+    return (f"{name:<24} ACC_W {r['acc_w']} -> {r['acc_w_observed']} observed / {r['acc_w_worst_case']} worst case, "
+            f"COEFF_W {r['coeff_w']} -> {r['coeff_w_min']}{' (WRAPS)' if r['coeff_wraps'] else ''}, "
+            f"overflow {r['overflow']}, near {r['near_overflow']}, "
+            f"saturated {r['saturated_high'] + r['saturated_low']}/{r['samples']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accumulator/output headroom of the fixed-point FIR datapath.")
+    parser.add_argument("paths", nargs="*", help="capture files")
+    parser.add_argument("--stimuli", action="store_true", help="profile the stimulus set of vectors.py")
+    parser.add_argument("--n-taps", type=int, nargs="+", default=None, help="fir_MA N_TAPS (default: from file name)")
+    parser.add_argument("--amp", type=float, default=0.99, help="stimulus amplitude relative to full scale")
+    parser.add_argument("--duration", type=float, default=10.0, help="stimulus duration (s)")
+    parser.add_argument("--data-w", type=int, default=24)
+    parser.add_argument("--coeff-w", type=int, default=12)
+    parser.add_argument("--acc-w", type=int, default=44)
+    parser.add_argument("--near-bits", type=int, default=NEAR_BITS)
+    parser.add_argument("--plot", default=None, help="folder for the histogram plots")
+    parser.add_argument("--json", default=None, help="write the full report to this file")
+    args = parser.parse_args(argv)
+
+    widths = {"data_w": args.data_w, "coeff_w": args.coeff_w, "acc_w": args.acc_w, "near_bits": args.near_bits}
+    report = {}
+    if args.stimuli:
+        for n_taps in args.n_taps or [4, 10, 20]:
+            for name, r in profile_stimuli(n_taps, duration=args.duration, amp=args.amp, **widths).items():
+                report[f"{n_taps}TAPS/{name}"] = r
+    for path in args.paths:
+        n_taps = args.n_taps[0] if args.n_taps else None
+        for ch, r in profile_capture(path, n_taps, **widths).items():
+            report[f"{os.path.basename(path)}/{ch}"] = r
+
+    if not report:
+        parser.error("give capture files and/or --stimuli")
+
+    for name, r in report.items():
+        print(_summary_line(name, r))
+        if args.plot:
+            os.makedirs(args.plot, exist_ok=True)
+            plot_histogram(r, name, os.path.join(args.plot, name.replace("/", "_").replace(".csv", "") + "_headroom.png"))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+
+    return 1 if any(r["overflow"] for r in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,23 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from utils_hw import load_csv, db
+from spectrum import welch
+from reference_filter import convolve
+from freq_response import freq_response
 
-def db(x):
-    """
-    Converte amplitude segnali FFT in dB (scala log). eps evita log(0).
-    """
-    eps = 1e-12
-    return 20*np.log10(np.maximum(np.abs(x),  eps))
-
-    
 def freq_response_filters(Fs, coeff_moving_avg, coeff_1221, coeff_big):
     # Plot risposte in frequenza dei filtri
     # Se fai la FFT dei coefficienti, ottieni la risposta in frequenza del filtro.
     # ( i coefficienti dei due filtri FIR sono le risposte impulsive)
-    H1 = np.fft.rfft(coeff_moving_avg,  n=4096) # n sono i punti di FFT da calcolare
-    H2 = np.fft.rfft(coeff_1221, n=4096)
-    H3 = np.fft.rfft(coeff_big, n=4096)
-    fH = np.fft.rfftfreq(4096, d=1/Fs)
+    # (risposte memoizzate da freq_response.py, griglia rfft di 4096 punti)
+    H1 = freq_response(coeff_moving_avg, Fs, nfft=4096) # nfft sono i punti di FFT da calcolare
+    H2 = freq_response(coeff_1221, Fs, nfft=4096)
+    H3 = freq_response(coeff_big, Fs, nfft=4096)
+    fH = H1["f"]
 
-    H1dB = db(H1)
-    H2dB = db(H2)
-    H3dB = db(H3)
+    H1dB = H1["mag_db"]
+    H2dB = H2["mag_db"]
+    H3dB = H3["mag_db"]
 
     plt.figure()
     plt.plot(fH, H1dB, label="MA [1,1,1,1]/4", color="navy", alpha=0.4)
@@ -51,8 +47,8 @@ def run_simulation(Fs,N,f_sig,A_sig, noise_mode, f_noise10k,A_noise, coeff_movin
     x = x_sig + x_noise
 
     # Genero segnale filtrato filtro  FIR al segnale (linear convolution) 
-    y_moving_avg   = np.convolve(x, coeff_moving_avg,  mode='same')
-    y_1221  = np.convolve(x, coeff_1221, mode='same')
+    y_moving_avg   = convolve(x, coeff_moving_avg,  mode='same')
+    y_1221  = convolve(x, coeff_1221, mode='same')
 
 
     ### Calcolo spettri (la composizione in frequenze) dei segnali: intensità vs frequenze
@@ -154,8 +150,8 @@ def fpga_signal_analysis(filter_type):
 
         # Retrieve output signals for left and right channel
 
-        input_L = data["l_in230"][1:] # escludo il primo, che è una parola ('signed')
-        output_L = data["l_data_tx230"][1:] # escludo il primo, che è una parola ('signed')
+        input_L = data["l_in230"]
+        output_L = data["l_data_tx230"]
 
 
     else:
@@ -164,16 +160,12 @@ def fpga_signal_analysis(filter_type):
     input_L = input_L.astype(np.float64) / (2**23 - 1) # converto al range [-1,1]
     output_L = output_L.astype(np.float64) / (2**23 - 1) # converto al range [-1,1]
 
-    w = np.hanning(len(input_L))
+    # Welch PSD over the whole capture (segments of N samples, Hann window, 50% overlap)
+    f, P = welch(np.stack([input_L, output_L]), Fs, nperseg=N)
 
-    X = np.fft.rfft(input_L * w, n=N)
-    Y = np.fft.rfft(output_L * w, n=N)
-
-    f = np.fft.rfftfreq(N, d=1/Fs)
-
-    # retrieve the amplitude for each frequecy (it is the real abs value of the fft output )
-    magX  = np.abs(X)
-    magY = np.abs(Y)
+    # retrieve the amplitude for each frequecy (square root of the power)
+    magX  = np.sqrt(P[0])
+    magY = np.sqrt(P[1])
     # retrieve the peak of input signal
     peak = np.max(magX) 
 
@@ -3,11 +3,10 @@
 ##################
 
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
-from utils_hw import load_csv, db
+from utils_hw import load_csv
 from plot_hw import plot_time, input_vs_output_time
+from golden_diff import diff_capture
 
 
 # LOAD DATA
@@ -24,19 +23,17 @@ if data is not None:
     fields = data.dtype.names 
     print(fields)
 
+    # Check the whole capture against the bit-exact model of the filter (not only the plotted window)
+    for ch, r in diff_capture(CSV_PATH, data=data).items():
+        print(f"Golden model, channel {ch}: {r['mismatches']} mismatches over {r['compared']} samples (latency {r['latency']}, max error {r['max_error']})")
+
     # Retrieve output signals for left and right channel
     #if not {"r_data_rx230", "l_data_rx230", "l_data_tx230", "r_data_tx230"}.issubset(fields):
     #    raise Exception("[WARN] CSV missing required columns; fields found:", fields)
-    in_signal_left = data["l_in230"][4600:7600] # escludo il primo, che è una parola ('signed')
-    #in_signal_right = data["r_data_tx230"][1:] # escludo il primo, che è una parola ('signed')
-    out_signal_left = data["l_data_tx230"][4600:7600] # escludo il primo, che è una parola ('signed')
-    #out_signal_right = data["r_data_rx230"][1:] # escludo il primo, che è una parola ('signed')
-
-    # Convert str -> int
-    #in_signal_right = in_signal_right.astype(np.int32) 
-    in_signal_left = in_signal_left.astype(np.int32) 
-    #out_signal_right = out_signal_right.astype(np.int32) 
-    out_signal_left = out_signal_left.astype(np.int32) 
+    in_signal_left = data["l_in230"][4600:7600]
+    #in_signal_right = data["r_in230"][4600:7600]
+    out_signal_left = data["l_data_tx230"][4600:7600]
+    #out_signal_right = data["r_data_tx230"][4600:7600]
 
     plot_time(in_signal_left, "Input (channel L) ", filename="input_L.svg", test_type=test_type)
     plot_time(out_signal_left, "Output order 19 moving average FIR (channel L)", filename="output_L.svg", test_type=test_type, color='red')
@@ -3,10 +3,8 @@
 ##################
 
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
-from utils_hw import load_csv, db
+from utils_hw import load_csv
 from plot_hw import plot_time, input_vs_output_time
 
 
@@ -31,16 +29,10 @@ if data is not None:
     # Retrieve output signals for left and right channel
     #if not {"r_data_rx230", "l_data_rx230", "l_data_tx230", "r_data_tx230"}.issubset(fields):
     #    raise Exception("[WARN] CSV missing required columns; fields found:", fields)
-    in_signal_left = data["input_L230"][1:1000] # escludo il primo, che è una parola ('signed')
-    #in_signal_right = data["r_data_tx230"][1:] # escludo il primo, che è una parola ('signed')
-    out_signal_left = data["output_L230"][1:1000] # escludo il primo, che è una parola ('signed')
-    #out_signal_right = data["r_data_rx230"][1:] # escludo il primo, che è una parola ('signed')
-
-    # Convert str -> int
-    #in_signal_right = in_signal_right.astype(np.int32) 
-    in_signal_left = in_signal_left.astype(np.int32) 
-    #out_signal_right = out_signal_right.astype(np.int32) 
-    out_signal_left = out_signal_left.astype(np.int32) 
+    in_signal_left = data["input_L230"][:999]
+    #in_signal_right = data["r_data_rx230"][:999]
+    out_signal_left = data["output_L230"][:999]
+    #out_signal_right = data["r_data_filt230"][:999]
 
     plot_time(in_signal_left, "Input channel L (24-bit)", filename="input_L.svg", test_type=test_type)
     plot_time(out_signal_left, "Output from filter, channel L (24-bit)", filename="output_L.svg", test_type=test_type)
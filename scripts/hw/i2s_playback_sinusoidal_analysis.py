@@ -3,10 +3,8 @@
 ##################
 
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
-from utils_hw import load_csv, db
+from utils_hw import load_csv
 from plot_hw import plot_time
 
 
@@ -24,12 +22,8 @@ if data is not None:
     # Retrieve output signals for left and right channel
     if not {"r_data_rx230", "l_data_rx230"}.issubset(fields):
         raise Exception("[WARN] CSV missing required columns; fields found:", fields)
-    out_signal_right = data["r_data_rx230"][1:1000] # escludo il primo, che è una parola ('signed')
-    out_signal_left = data["l_data_rx230"][1:1000] # escludo il primo, che è una parola ('signed')
-
-    # Convert str -> int
-    out_signal_right = out_signal_right.astype(np.int32) 
-    out_signal_left = out_signal_left.astype(np.int32) 
+    out_signal_right = data["r_data_rx230"][:999]
+    out_signal_left = data["l_data_rx230"][:999]
 
     plot_time(out_signal_right, "Output playback channel R (24-bit)", test_type='playback')
     plot_time(out_signal_left, "Output playback channel L (24-bit)", test_type='playback')
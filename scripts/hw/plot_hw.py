@@ -1,6 +1,6 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from utils_hw import db
+from render import new_axes, plot_decimated, finish
 
 def plot_time(sig, title, test_type=None, ylabel="Amplitude", filename=None, color='blue'):
     """
@@ -8,17 +8,16 @@ def plot_time(sig, title, test_type=None, ylabel="Amplitude", filename=None, col
 
     test_type: either "playback" or "filtered".
     """
-    plt.figure()
+    fig, ax = new_axes("time")
 
-    plt.plot(sig, color=color)
+    plot_decimated(ax, sig, color=color)
 
-    plt.title(title)
-    plt.xlabel("Samples")
-    plt.ylabel(ylabel)
-    plt.grid(True)
+    ax.set_title(title)
+    ax.set_xlabel("Samples")
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
 
-    plt.savefig("../../plots_hw/plots_"+ test_type + "/"+filename) if (filename and test_type) else None
-    plt.show()
+    finish(fig, "../../plots_hw/plots_"+ test_type + "/"+filename if (filename and test_type) else None)
 
 
 # def plot_freqz(coeff, fs, signal_type, filename=None):
@@ -53,14 +52,13 @@ def input_vs_output_time(in_signal, out_signal, test_type, channel, title=None):
     test_type: either "filter" or "playback".
     """
     if title is None: title = f"{test_type} - Input vs Output signals (Channel "+channel +")"
-    plt.figure()
-    plt.plot(in_signal, label="Input", color="blue", alpha=0.5)
-    plt.plot(out_signal, label="Output", color="red", alpha=0.5)
-    plt.title(title)
-    plt.xlabel("Samples")
-    plt.ylabel("Amplitude")
-    plt.grid(True)
-    plt.legend()
-    plt.savefig("../../plots_hw/plots_" +test_type+ '/input_output_'+channel+'.svg', format='svg')
-    plt.show()
+    fig, ax = new_axes("input_output")
+    plot_decimated(ax, in_signal, label="Input", color="blue", alpha=0.5)
+    plot_decimated(ax, out_signal, label="Output", color="red", alpha=0.5)
+    ax.set_title(title)
+    ax.set_xlabel("Samples")
+    ax.set_ylabel("Amplitude")
+    ax.grid(True)
+    ax.legend()
+    finish(fig, "../../plots_hw/plots_" +test_type+ '/input_output_'+channel+'.svg')
 
@@ -0,0 +1,212 @@
+#########
+# Bit-level model of i2s_transceiver.vhd (sources_1/imports/Downloads), vectorized over the frames.
+#
+# Timing of the VHDL, in sclk toggles (events every mclk_sclk_ratio/2 mclk periods), with
+# c = ws_cnt before the event (0 .. sclk_ws_ratio-1) in every word select half period:
+#   c = sclk_ws_ratio-1: ws toggles (on a sclk falling edge), l/r_data_rx are output and
+#                        l/r_data_tx are latched for the next half periods;
+#   c odd  (falling edges), c+1 < 2*d_width+3: sd_tx <= MSB of the tx buffer, buffer shifted left;
+#   c even (rising edges), 1 < c+1 < 2*d_width+2: sd_rx shifted into the rx buffer of the channel.
+# So the MSB leaves one sclk period after the ws edge (the I2S one-bit delay), ws = 0 is the left
+# channel, and after the d_width bits the line is '0' until the next word.
+#
+# Streams are arrays with one value per sclk toggle (the value after the event); to_mclk() expands
+# them to mclk resolution.
+##################
+
+import numpy as np
+
+MCLK_SCLK_RATIO = 4 # master clock periods per serial clock period
+SCLK_WS_RATIO = 64 # serial clock toggles per word select half period (serial periods per ws period)
+D_WIDTH = 24
+
+
+def _slots(d_width, sclk_ws_ratio):
+    """
+    Positions c (0 .. sclk_ws_ratio-1) of the tx and rx events in a half period.
+    """
+    c = np.arange(sclk_ws_ratio)
+    n = c + 1 # ws_cnt after the increment, as tested by the VHDL
+    counting = c < sclk_ws_ratio - 1 # the last event toggles ws instead
+
+    tx = counting & (c % 2 == 1) & (n < 2 * d_width + 3)
+    rx = counting & (c % 2 == 0) & (n > 1) & (n < 2 * d_width + 2)
+
+    return tx, rx
+
+
+def _to_unsigned(words, d_width):
+    return np.asarray(words, dtype=np.int64) & ((1 << d_width) - 1)
+
+
+def _to_signed(words, d_width):
+    words = np.asarray(words, dtype=np.int64)
+    sign = np.int64(1) << (d_width - 1)
+
+    return (words ^ sign) - sign
+
+
+def _word_bits(words, d_width):
+    """
+    (n, d_width) uint8 bits of unsigned words, MSB first.
+    """
+    b = np.unpackbits(words.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1)
+
+    return b[:, 64 - d_width:]
+
+
+def _bits_to_words(bits, d_width):
+    """
+    (..., d_width) bits, MSB first, to signed words.
+    """
+    weights = np.int64(1) << np.arange(d_width - 1, -1, -1, dtype=np.int64)
+
+    return _to_signed(bits.astype(np.int64) @ weights, d_width)
+
+
+def half_words(left, right, r_init=0):
+    """
+    Word transmitted in every ws half period after a reset.
+
+    Half 0 (left) sends the reset value of the tx buffers (0); at its end r_data_tx is latched for
+    half 1 (right), which sends r_init (the r_data_tx value present at the first toggle). Then frame i
+    sends left[i] in half 2+2i and right[i] in half 3+2i: one frame of warm-up.
+    """
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    if left.shape != right.shape:
+        raise ValueError(f"left and right must have the same length, got {left.shape} and {right.shape}")
+
+    words = np.empty(2 * (len(left) + 1), dtype=np.int64)
+    words[0], words[1] = 0, r_init
+    words[2::2] = left
+    words[3::2] = right
+
+    return words
+
+
+def serialize(left, right, d_width=D_WIDTH, sclk_ws_ratio=SCLK_WS_RATIO, r_init=0):
+    """
+    sclk, ws and sd_tx streams produced by i2s_transceiver for the given samples, from the reset on.
+
+    Returns a dict of uint8 arrays with one value per sclk toggle, (len(left) + 1) frames of
+    2 * sclk_ws_ratio toggles (the first frame is the warm-up, see half_words).
+    """
+    tx, _ = _slots(d_width, sclk_ws_ratio)
+    words = _to_unsigned(half_words(left, right, r_init), d_width)
+    n_half = len(words)
+
+    # values put on sd_tx by the tx events of a half: the d_width bits MSB first, then the zeros
+    # shifted in. Column 0 is the value held from the previous half (its last tx value).
+    n_tx = int(tx.sum())
+    table = np.zeros((n_half, n_tx + 1), dtype=np.uint8)
+    table[:, 1:1 + min(d_width, n_tx)] = _word_bits(words, d_width)[:, :n_tx]
+    table[1:, 0] = table[:-1, -1]
+
+    # sd_tx after every event: index in the table of the last tx event of the half so far
+    last = np.cumsum(tx)
+    sd = table[:, last].reshape(-1)
+
+    # sclk toggles at every event (from 0 after reset); ws toggles at the last event of every half
+    sclk = np.tile(np.array([1, 0], dtype=np.uint8), n_half * sclk_ws_ratio // 2)
+    toggle = (np.arange(sclk_ws_ratio) == sclk_ws_ratio - 1).astype(np.uint8)
+    ws = ((np.arange(n_half, dtype=np.uint8)[:, None] & 1) ^ toggle).reshape(-1)
+
+    return {"sclk": sclk, "ws": ws, "sd": sd}
+
+
+def receive(sd_rx, d_width=D_WIDTH, sclk_ws_ratio=SCLK_WS_RATIO):
+    """
+    l_data_rx / r_data_rx of i2s_transceiver for an sd_rx stream aligned with the transceiver from
+    the reset on (e.g. sd_tx of serialize in loopback), exactly as the counters of the VHDL sample it.
+
+    The words received in a half period are output at the ws toggle that ends it. The warm-up frame
+    is dropped, so a loopback returns the left and right arrays given to serialize.
+    """
+    _, rx = _slots(d_width, sclk_ws_ratio)
+    sd_rx = np.asarray(sd_rx, dtype=np.uint8)
+    n_half = len(sd_rx) // sclk_ws_ratio
+    halves = sd_rx[:n_half * sclk_ws_ratio].reshape(n_half, sclk_ws_ratio)
+
+    # a rising edge event samples the line as it was before the event (the previous toggle)
+    c_rx = np.flatnonzero(rx)
+    bits = halves[:, c_rx - 1]
+    k = len(c_rx)
+
+    # the rx buffer of a channel is never cleared: after its i-th half it holds the last d_width
+    # bits sampled on that channel (fewer than d_width slots per half leave older bits in it)
+    words = np.empty(n_half, dtype=np.int64)
+    for ch in (0, 1):
+        seq = np.concatenate([np.zeros(d_width, dtype=np.uint8), bits[ch::2].reshape(-1)])
+        ends = d_width + k * np.arange(1, len(bits[ch::2]) + 1)
+        words[ch::2] = _bits_to_words(seq[ends[:, None] - d_width + np.arange(d_width)], d_width)
+
+    n_frames = n_half // 2 - 1
+
+    return words[2:2 + 2 * n_frames:2], words[3:3 + 2 * n_frames:2]
+
+
+def decode(sclk, ws, sd, d_width=D_WIDTH, from_reset=True):
+    """
+    Standard I2S decoder, independent of the transceiver counters: for every ws half period the
+    bits are sampled on the rising edges of sclk, skipping the first one after the ws edge (one-bit
+    delay), MSB first. Useful on streams from other sources (simulation dumps, logic analyzer).
+
+    Args:
+    from_reset: the stream starts at a half period boundary (index 0 counts as a ws edge).
+
+    Returns:
+    words: signed words, one per complete half period.
+    channel: 0 (left, ws = 0) or 1 (right) for every word.
+    start: stream index of the ws edge of every word.
+    """
+    sclk = np.asarray(sclk, dtype=np.uint8)
+    ws = np.asarray(ws, dtype=np.uint8)
+    sd = np.asarray(sd, dtype=np.uint8)
+
+    edges = np.flatnonzero(ws[1:] != ws[:-1]) + 1
+    if from_reset:
+        edges = np.concatenate([[0], edges])
+
+    # rising edges, stream indices where sclk has just become 1; sd is sampled before the edge
+    rising = np.flatnonzero(sclk[1:] > sclk[:-1]) + 1
+
+    first = np.searchsorted(rising, edges) + 1 # skip the one-bit delay
+    end = np.searchsorted(rising, np.concatenate([edges[1:], [len(sclk)]]))
+    complete = first + d_width <= end
+    first, start = first[complete], edges[complete]
+
+    idx = rising[first[:, None] + np.arange(d_width)]
+    words = _bits_to_words(sd[idx - 1], d_width)
+
+    return words, ws[start], start
+
+
+def to_mclk(stream, mclk_sclk_ratio=MCLK_SCLK_RATIO):
+    """
+    Expand a stream from one value per sclk toggle to one value per mclk period.
+    """
+    return np.repeat(np.asarray(stream), mclk_sclk_ratio // 2)
+
+
+def frame_lag(sent, received, max_lag=4):
+    """
+    Lag in frames (0 .. max_lag) with the fewest mismatches between sent and received words, to
+    spot latency or framing errors. Returns (lag, mismatches at that lag, compared words).
+    """
+    sent = np.asarray(sent, dtype=np.int64)
+    received = np.asarray(received, dtype=np.int64)
+
+    best = None
+    for lag in range(max_lag + 1):
+        n = min(len(sent), len(received) - lag)
+        if n <= 0:
+            break
+        bad = int(np.count_nonzero(received[lag:lag + n] != sent[:n]))
+        if best is None or bad * best[2] < best[1] * n:
+            best = (lag, bad, n)
+
+    if best is None:
+        raise ValueError("Not enough words to compare")
+
+    return best
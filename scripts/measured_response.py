@@ -0,0 +1,156 @@
+#########
+# Measured frequency response of the FPGA filter, H(f) = Y/X, from paired input/output captures.
+# The H1 estimator (cross spectral density / input PSD) and the coherence are computed for all
+# the captures of a tap sweep in one batched Welch computation, then compared with the
+# theoretical response of the fir_MA coefficients.
+#
+# Usage (from the scripts folder):
+#   python measured_response.py                                  -> all log_from_hardware/*TAPS.csv
+#   python measured_response.py "../log_from_hardware/*TAPS.csv" --channel R --out ../plots_hw/response.png
+##################
+
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from capture_cache import load_cached
+from capture_io import WS_frequency, db, io_signals
+from fir_model import ma_coeff, FRAC
+from freq_response import freq_response
+from golden_diff import DEFAULT_GLOB, n_taps_from_name
+from spectrum import cross_welch
+
+NPERSEG = 1024
+MIN_COHERENCE = 0.9 # bins below this coherence are not trusted
+
+
+def h1_estimate(x, y, fs, nperseg=NPERSEG):
+    """
+    H1 transfer function estimate and magnitude squared coherence between input x and output y.
+    x and y have shape (n,) or (captures, n).
+
+    Returns f, H1 = Pxy/Pxx, coherence = |Pxy|^2 / (Pxx Pyy).
+    """
+    f, Pxx, Pyy, Pxy = cross_welch(x, y, fs, nperseg=nperseg)
+    eps = 1e-30
+
+    H1 = Pxy / np.maximum(Pxx, eps)
+    coh = np.abs(Pxy)**2 / np.maximum(Pxx * Pyy, eps)
+
+    return f, H1, coh
+
+
+def theoretical_response(coeff, f, fs):
+    """
+    Frequency response of the FIR coefficients at the frequencies f (Hz), as in freq_response_filters.
+    """
+    return freq_response(coeff, fs, f=f)["H"]
+
+
+def sweep_response(paths, channel="L", fs=WS_frequency, nperseg=NPERSEG, n_taps=None):
+    """
+    Measured response of every capture of a sweep, in one batched computation.
+
+    The captures are cut to the length of the shortest one and stacked, so the cross spectra of
+    all of them come out of the same 2-D FFTs.
+
+    Returns a dict with f, H1 and coherence (one row per capture), the theoretical responses and
+    a summary per capture (deviation in dB from the theoretical response over the coherent bins).
+    """
+    xs, ys, taps = [], [], []
+    for path in paths:
+        pairs = {ch: (x, y) for ch, x, y in io_signals(load_cached(path))}
+        if channel not in pairs:
+            raise KeyError(f"Channel {channel} not found in '{path}'")
+
+        x, y = pairs[channel]
+        xs.append(x)
+        ys.append(y)
+        taps.append(n_taps or n_taps_from_name(path))
+
+    n = min(len(x) for x in xs)
+    X = np.stack([x[:n] for x in xs])
+    Y = np.stack([y[:n] for y in ys])
+
+    f, H1, coh = h1_estimate(X, Y, fs, nperseg)
+
+    H_th = np.stack([
+        theoretical_response(ma_coeff(t) / 2**FRAC, f, fs) if t else np.full(len(f), np.nan)
+        for t in taps
+    ])
+
+    summary = []
+    for i, path in enumerate(paths):
+        mask = coh[i] >= MIN_COHERENCE
+        dev = db(H1[i][mask]) - db(H_th[i][mask])
+        summary.append({
+            "capture": os.path.basename(path),
+            "n_taps": taps[i],
+            "coherent_bins": int(mask.sum()),
+            "mean_dev_db": float(np.mean(dev)) if mask.any() else None,
+            "max_abs_dev_db": float(np.max(np.abs(dev))) if mask.any() else None,
+        })
+
+    return {"f": f, "H1": H1, "coherence": coh, "H_theoretical": H_th, "summary": summary}
+
+
+def plot_sweep(result, filename=None):
+    """
+    Overlay the measured |H1| (coherent bins only) on the theoretical response of each capture.
+    """
+    import matplotlib.pyplot as plt
+    from render import new_axes, finish
+
+    f = result["f"]
+    fig, ax = new_axes("measured_response")
+    colors = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+
+    for i, s in enumerate(result["summary"]):
+        c = colors[i % len(colors)]
+        mask = result["coherence"][i] >= MIN_COHERENCE
+        ax.plot(f, db(result["H_theoretical"][i]), color=c, alpha=0.4, label=f"Theoretical MA{s['n_taps']}")
+        ax.plot(f[mask], db(result["H1"][i][mask]), ".", color=c, markersize=3, label=f"Measured {s['capture']}")
+
+    ax.set_title("FPGA - measured vs theoretical frequency response")
+    ax.set_xlabel("Frequency [Hz]")
+    ax.set_ylabel("Magnitude [dB]")
+    ax.set_ylim(-80, 10)
+    ax.grid(True)
+    ax.legend()
+
+    return finish(fig, filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measured H(f) of the FPGA filter from input/output captures.")
+    parser.add_argument("pattern", nargs="?", default=DEFAULT_GLOB, help="glob of the capture files (quote it)")
+    parser.add_argument("--channel", default="L", choices=("L", "R"))
+    parser.add_argument("--nperseg", type=int, default=NPERSEG)
+    parser.add_argument("--n-taps", type=int, default=None, help="fir_MA N_TAPS (default: from file name)")
+    parser.add_argument("--out", default=None, help="save the overlay plot to this file")
+    args = parser.parse_args(argv)
+
+    if args.out:
+        import render
+        render.configure(headless=True, fmt=None) # save only: finish() must not block on plt.show()
+
+    paths = sorted(glob.glob(args.pattern))
+    if not paths:
+        print("ERROR: None captures were found!")
+        return 2
+
+    result = sweep_response(paths, args.channel, nperseg=args.nperseg, n_taps=args.n_taps)
+    for s in result["summary"]:
+        print(s)
+
+    if args.out:
+        plot_sweep(result, args.out)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+#########
+# Real-time monitor of the filter over an audio loopback: the stimulus of play_sine.py is played
+# on a duplex stream, the return path is recorded, filtered by the bit-exact fir_MA model block by
+# block (state kept between blocks) and shown as a live spectrum with an SNR readout.
+#
+# The audio callback only renders the stimulus into outdata and copies indata into a preallocated
+# single-producer/single-consumer ring; a worker thread drains the ring, filters and analyzes.
+# Without hardware, FakeStream stands in for the sound card: it replays a file (.wav, .npy or the
+# input columns of an ILA/simulation CSV capture, at the file's own sample rate) as the recorded
+# signal, or loops the played signal back. The SNR readout assumes the play_sine.py stimulus.
+#
+# Usage (from the scripts folder):
+#   python monitor.py --n-taps 20 --noise multi                      # sound card (sounddevice)
+#   python monitor.py --fake loopback --noise multi --duration 5 --no-plot
+#   python monitor.py --fake ../log_simulations/vectors/sine_multi_merged.csv --noise multi --fast --no-plot
+##################
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from capture_io import WS_frequency
+from fir_model import FirStream, ma_coeff
+from sine_metrics import sine_metrics
+from spectrogram import Stft
+from stimulus import NOISE_FREQS, SIGNAL_FREQ, TONE10K_FREQ, ToneBank, WhiteNoise
+
+Fs = 44100 # sound card rate (a replayed file uses its own, see recording_rate)
+BLOCKSIZE = 256 # frames per callback (small = low latency)
+NPERSEG = 4096 # samples per analysis block (spectrum and SNR)
+RING_SECONDS = 2.0 # capacity of the ring between the callback and the worker
+AVERAGING = 0.8 # weight of the previous spectrum in the exponential average
+DRAIN_TIMEOUT = 5.0 # seconds the worker is given, at the end, to process what is left in the ring
+A_NOISE = 0.3
+DATA_W = 24
+
+
+class SpscRing:
+    """
+    Single-producer / single-consumer ring buffer of frames (frames, channels).
+
+    Lock-free: the producer only moves head, the consumer only moves tail (both count frames since
+    the start, so full and empty are never ambiguous), and each publishes its counter after copying
+    the data. write() and read_into() copy into preallocated memory and never block: a write that
+    does not fit is truncated and the missing frames are counted in dropped.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float32):
+        self.buf = np.zeros((capacity, channels), dtype=dtype)
+        self.capacity = capacity
+        self.head = 0 # frames written (producer)
+        self.tail = 0 # frames read (consumer)
+        self.dropped = 0 # frames lost because the ring was full (producer)
+
+    def available(self):
+        return self.head - self.tail
+
+    def write(self, x):
+        n = len(x)
+        free = self.capacity - (self.head - self.tail)
+        if n > free:
+            self.dropped += n - free
+            n = free
+
+        i = self.head % self.capacity
+        first = min(n, self.capacity - i)
+        self.buf[i:i + first] = x[:first]
+        self.buf[:n - first] = x[first:n]
+        self.head += n # publish after the copy
+
+        return n
+
+    def read_into(self, out):
+        """
+        Move up to len(out) frames into out. Returns the number of frames read.
+        """
+        n = min(len(out), self.head - self.tail)
+        i = self.tail % self.capacity
+        first = min(n, self.capacity - i)
+        out[:first] = self.buf[i:i + first]
+        out[first:n] = self.buf[:n - first]
+        self.tail += n # release after the copy
+
+        return n
+
+
+def load_recording(path, channels=2):
+    """
+    Frames (n, channels) in [-1, 1] of a file replayed by FakeStream: .wav (PCM), .npy (float, or
+    integers scaled as DATA_W-bit samples), or a CSV capture (input columns, one sample per frame:
+    the monitor filters what it records, so it must be fed the unfiltered signal).
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".wav":
+        import wave
+        with wave.open(path, "rb") as w:
+            width, n_ch = w.getsampwidth(), w.getnchannels()
+            raw = np.frombuffer(w.readframes(w.getnframes()), dtype=np.uint8).reshape(-1, width)
+        if width == 1:
+            x = raw[:, 0].astype(np.float32) / 128 - 1 # 8-bit PCM is unsigned
+        else:
+            # little-endian signed PCM of 2..4 bytes: sign-extend to int32
+            padded = np.zeros((len(raw), 4), dtype=np.uint8)
+            padded[:, 4 - width:] = raw
+            x = padded.view("<i4")[:, 0].astype(np.float32) / 2**31
+        x = x.reshape(-1, n_ch)
+    elif ext == ".npy":
+        x = np.load(path)
+        if np.issubdtype(x.dtype, np.integer):
+            x = x.astype(np.float32) / (2**(DATA_W - 1) - 1)
+    elif ext == ".csv":
+        from capture_cache import load_cached
+        from capture_io import io_signals
+        pairs = io_signals(load_cached(path))
+        if not pairs:
+            raise KeyError(f"No input/output columns found in {path}")
+        x = np.stack([inp for _, inp, _ in pairs[:channels]], axis=1) / (2**(DATA_W - 1) - 1)
+    else:
+        raise ValueError(f"Unsupported file '{path}' (expected .wav, .npy or .csv)")
+
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[:, None]
+
+    return x[:, np.arange(channels) % x.shape[1]] # repeat mono on every channel
+
+
+def recording_rate(path):
+    """
+    Sample rate (Hz) of a file replayed by FakeStream: the header of a .wav, WS_frequency for a CSV
+    capture, None if the file does not say (.npy).
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".wav":
+        import wave
+        with wave.open(path, "rb") as w:
+            return float(w.getframerate())
+    if ext == ".csv":
+        return WS_frequency
+
+    return None
+
+
+class CallbackStop(Exception):
+    """
+    Raised by a callback to end a FakeStream (as sounddevice.CallbackStop).
+    """
+
+
+class FakeStream:
+    """
+    File-backed stand-in for sounddevice.Stream (duplex, float32): a thread calls
+    callback(indata, outdata, frames, time_info, status) every blocksize frames.
+
+    indata is the next block of the file (source=path, until its end or for ever with loop=True),
+    or the outdata of latency blocks before (source=None, loopback). With realtime=False the blocks
+    follow each other as fast as the callback allows, or as the consumer allows if ready is given
+    (a function telling whether the next block can be delivered, e.g. the ring has room for it).
+    """
+
+    def __init__(self, samplerate, blocksize, channels, callback, source=None, loop=False, latency=1,
+                 realtime=True, ready=None, finished_callback=None, dtype="float32"):
+        if dtype != "float32":
+            raise ValueError("FakeStream supports float32 only")
+
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.loop = loop
+        self.realtime = realtime
+        self.ready = ready
+
+        self.recording = None if source is None else load_recording(source, channels)
+        self.pos = 0
+        self.delay = np.zeros((max(1, latency), blocksize, channels), dtype=np.float32) # loopback delay line
+        self.active = False
+        self._thread = None
+
+    def _next_input(self, indata, k):
+        if self.recording is None:
+            indata[:] = self.delay[k % len(self.delay)]
+            return True
+
+        n = len(self.recording)
+        if self.pos >= n:
+            if not self.loop or n == 0:
+                return False
+            self.pos = 0
+        m = min(self.blocksize, n - self.pos)
+        indata[:m] = self.recording[self.pos:self.pos + m]
+        indata[m:] = 0
+        self.pos += m
+
+        return True
+
+    def _run(self):
+        indata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        period = self.blocksize / self.samplerate
+        t0 = time.perf_counter()
+        k = 0
+
+        try:
+            while self.active and self._next_input(indata, k):
+                try:
+                    self.callback(indata, outdata, self.blocksize, None, None)
+                except CallbackStop:
+                    break
+                self.delay[k % len(self.delay)] = outdata
+                k += 1
+
+                if self.realtime:
+                    wait = t0 + k * period - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                elif self.ready is not None:
+                    while self.active and not self.ready():
+                        time.sleep(period / 4)
+        finally:
+            self.active = False
+            if self.finished_callback:
+                self.finished_callback()
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Monitor:
+    """
+    Stimulus, ring and analysis worker of the duplex monitor.
+
+    callback() is the audio callback (no allocation, no lock); start()/stop() run the worker thread,
+    which filters every NPERSEG frames of the recording with the bit-exact model and publishes a
+    snapshot: averaged spectra (dB) of the recorded and filtered signals, SNR in and out, counters.
+    """
+
+    def __init__(self, fs=Fs, n_taps=20, channels=2, noise=None, amplitude=0.5, a_noise=A_NOISE,
+                 nperseg=NPERSEG, ring_seconds=RING_SECONDS, averaging=AVERAGING, coeff=None):
+        self.fs = fs
+        self.channels = channels
+        self.nperseg = nperseg
+        self.averaging = averaging
+
+        # stimulus, as play_sine.py
+        freqs = np.concatenate([[SIGNAL_FREQ, TONE10K_FREQ], NOISE_FREQS])
+        amps = np.zeros(freqs.size)
+        amps[0] = amplitude
+        if noise == "tone10k":
+            amps[1] = a_noise
+        elif noise == "multi":
+            amps[2:] = a_noise / NOISE_FREQS.size
+        self.tones = ToneBank(freqs, amps, fs, phases=np.random.default_rng(0).uniform(0, 2*np.pi, freqs.size))
+        self.white = WhiteNoise(a_noise, seed=0) if noise == "white" else None
+        self.tone_freqs = {"tone10k": [TONE10K_FREQ], "multi": list(NOISE_FREQS)}.get(noise, [])
+
+        # callback -> worker
+        self.ring = SpscRing(int(ring_seconds * fs), channels)
+        self.callbacks = 0
+        self.status_flags = 0
+
+        # worker state
+        coeff = ma_coeff(n_taps) if coeff is None else coeff
+        self.firs = [FirStream(coeff) for _ in range(channels)]
+        self.stft = Stft(nperseg, overlap=0)
+        self.block = np.zeros((nperseg, channels), dtype=np.float32)
+        self.f = np.fft.rfftfreq(nperseg, d=1/fs)
+        self.psd = None
+        self.snapshot = None # latest results, replaced as a whole (readers never see a partial update)
+        self.blocks = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.error = None # exception that ended the worker, re-raised by stop()
+
+    def callback(self, indata, outdata, frames, time_info, status):
+        self.tones.render(outdata, frames)
+        if self.white is not None:
+            self.white.render(outdata, frames, add=True)
+        if status:
+            self.status_flags += 1
+        self.ring.write(indata)
+        self.callbacks += 1
+
+    def process(self, x):
+        """
+        Filter and analyze one block (nperseg, channels) of the recording; returns the snapshot.
+        """
+        lim = (1 << (DATA_W - 1)) - 1
+        xq = np.clip(np.rint(x.T.astype(np.float64) * lim), -lim - 1, lim).astype(np.int64) # vectors.to_fixed
+        yq = np.stack([fir.process(c) for fir, c in zip(self.firs, xq)])
+
+        rows = np.concatenate([xq, yq]) / lim # rec_0, rec_1, ..., filt_0, filt_1, ...
+        P = next(self.stft.frames(rows))[:, 0, :]
+        self.psd = P if self.psd is None else self.averaging * self.psd + (1 - self.averaging) * P
+
+        m = sine_metrics(rows, self.fs, SIGNAL_FREQ, self.tone_freqs, refine=False)
+        c = self.channels
+        self.blocks += 1
+        self.snapshot = {
+            "blocks": self.blocks,
+            "f": self.f,
+            "recorded_db": 10*np.log10(np.maximum(self.psd[:c], 1e-20)),
+            "filtered_db": 10*np.log10(np.maximum(self.psd[c:], 1e-20)),
+            "snr_in_db": m["snr_db"][:c],
+            "snr_out_db": m["snr_db"][c:],
+            "dropped": self.ring.dropped,
+            "status_flags": self.status_flags,
+        }
+
+        return self.snapshot
+
+    def _work(self):
+        try:
+            while not self._stop.is_set():
+                if self.ring.available() < self.nperseg:
+                    time.sleep(0.25 * self.nperseg / self.fs)
+                    continue
+                self.ring.read_into(self.block)
+                self.process(self.block)
+        except BaseException as e: # kept for stop(): an exception in a thread is otherwise lost
+            self.error = e
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self.error = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the worker; re-raise the exception that ended it, if any.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+def open_stream(monitor, fake=None, blocksize=BLOCKSIZE, realtime=True, device=None):
+    """
+    Duplex stream feeding monitor.callback: the sound card (sounddevice), or a FakeStream when fake
+    is "loopback" or a file path.
+    """
+    if fake is None:
+        import sounddevice as sd
+        return sd.Stream(samplerate=monitor.fs, blocksize=blocksize, channels=monitor.channels, dtype="float32",
+                         callback=monitor.callback, device=device)
+
+    source = None if fake == "loopback" else fake
+    ring = monitor.ring
+
+    def ready():
+        return ring.capacity - ring.available() >= blocksize
+
+    return FakeStream(monitor.fs, blocksize, monitor.channels, monitor.callback, source=source, realtime=realtime,
+                      ready=ready)
+
+
+class LivePlot:
+    """
+    Live spectrum of the recorded and filtered signals (channel 0), decimated to the axes width.
+    """
+
+    def __init__(self):
+        import matplotlib.pyplot as plt
+        import render
+
+        self.plt, self.render = plt, render
+        plt.ion()
+        self.fig, self.ax = render.new_axes("monitor", figsize=(10, 5))
+        self.lines = None
+
+    def update(self, snap):
+        n_px = self.render.axes_width_px(self.ax)
+        data = [self.render.minmax_decimate(snap[k][0], n_px, x=snap["f"]) for k in ("recorded_db", "filtered_db")]
+
+        if self.lines is None:
+            self.lines = [self.ax.plot(f, p, label=lbl, alpha=0.7)[0]
+                          for (f, p), lbl in zip(data, ("Recorded", "Filtered (model)"))]
+            self.ax.set_xlabel("Frequency [Hz]")
+            self.ax.set_ylabel("PSD [dB]")
+            self.ax.set_ylim(-160, 0)
+            self.ax.grid(True)
+            self.ax.legend(loc="upper right")
+        else:
+            for line, (f, p) in zip(self.lines, data):
+                line.set_data(f, p)
+
+        self.ax.set_title(f"SNR in {snap['snr_in_db'][0]:.1f} dB, out {snap['snr_out_db'][0]:.1f} dB "
+                          f"(dropped {snap['dropped']})")
+        self.plt.pause(0.001)
+
+
+def run(monitor, stream, duration=None, plot=True, interval=0.2, log=print):
+    """
+    Run the stream and the worker for duration seconds (until Ctrl+C or the end of a fake file if None),
+    refreshing the plot (or printing a readout) every interval seconds. Returns the last snapshot.
+    """
+    live = LivePlot() if plot else None
+    last = 0
+    t_end = None if duration is None else time.perf_counter() + duration
+
+    monitor.start()
+    try:
+        with stream:
+            while stream.active and monitor.alive and (t_end is None or time.perf_counter() < t_end):
+                time.sleep(interval)
+                snap = monitor.snapshot
+                if snap is None or snap["blocks"] == last:
+                    continue
+                last = snap["blocks"]
+                if live:
+                    live.update(snap)
+                else:
+                    log(f"block {snap['blocks']:>5}  SNR in {np.round(snap['snr_in_db'], 1)} dB  "
+                        f"out {np.round(snap['snr_out_db'], 1)} dB  dropped {snap['dropped']}")
+    except KeyboardInterrupt:
+        log("Interrotto.")
+    finally:
+        # let the worker drain what is left in the ring (unless it died, or takes too long)
+        t_drain = time.perf_counter() + DRAIN_TIMEOUT
+        while monitor.alive and monitor.ring.available() >= monitor.nperseg and time.perf_counter() < t_drain:
+            time.sleep(0.01)
+        monitor.stop()
+
+    return monitor.snapshot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live FIR monitor over an audio loopback.")
+    parser.add_argument("--fs", type=float, default=None,
+                        help=f"sample rate in Hz (default: the rate of the --fake file, else {Fs})")
+    parser.add_argument("--n-taps", type=int, default=20)
+    parser.add_argument("--noise", choices=("tone10k", "multi", "white"), default=None)
+    parser.add_argument("--amplitude", type=float, default=0.5)
+    parser.add_argument("--blocksize", type=int, default=BLOCKSIZE)
+    parser.add_argument("--nperseg", type=int, default=NPERSEG)
+    parser.add_argument("--device", default=None, help="sounddevice device (default: system default)")
+    parser.add_argument("--fake", default=None, help='"loopback" or a .wav/.npy/.csv file instead of the sound card')
+    parser.add_argument("--fast", action="store_true", help="fake device as fast as possible (not real time)")
+    parser.add_argument("--duration", type=float, default=None, help="seconds (default: until Ctrl+C)")
+    parser.add_argument("--no-plot", action="store_true", help="print the readout instead of the live plot")
+    args = parser.parse_args(argv)
+
+    fs = args.fs
+    if fs is None and args.fake not in (None, "loopback"):
+        fs = recording_rate(args.fake)
+    monitor = Monitor(fs or Fs, args.n_taps, noise=args.noise, amplitude=args.amplitude, nperseg=args.nperseg)
+    stream = open_stream(monitor, args.fake, args.blocksize, realtime=not args.fast, device=args.device)
+    snap = run(monitor, stream, args.duration, plot=not args.no_plot)
+
+    if snap is None:
+        print("ERROR: no complete analysis block")
+        return 1
+    print(f"{snap['blocks']} blocks, SNR in {np.round(snap['snr_in_db'], 2)} dB, out {np.round(snap['snr_out_db'], 2)} dB, "
+          f"dropped {snap['dropped']} frames, {snap['status_flags']} status flags")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
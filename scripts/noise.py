@@ -1,27 +1,16 @@
-import numpy as np
-import sounddevice as sd
+from stimulus import white_noise, play
 
 
 # Parameters
 fs = 44100            # sampling rate (Hz)
-duration =  600      # seconds:  1 ms → ~9 ripetizioni in 90 ms ILA
 noise_std = 0.05
 
-# Build rectangular pulse input signal
-N = int(fs * duration) #number of samples in the signal
-
-x = np.random.normal(0.0, noise_std, size=N)
+# Rumore bianco generato a blocchi: memoria costante, riproduzione senza fine
+x = white_noise(noise_std, fs, duration=None)
 
 
 print("CTRL+C to stop...") 
 try: 
-    while True: 
-        sd.play(x, fs, blocking=True) # blocking=True aspetta la fine prima di ricominciare 
+    play(x, fs, channels=1)
 except KeyboardInterrupt: 
         print("\nInterrupted.")
-
-
-
-
-
-
@@ -2,72 +2,71 @@ import numpy as np
 import sounddevice as sd
 import time
 
+from stimulus import ToneBank, WhiteNoise, SIGNAL_FREQ, NOISE_FREQS, TONE10K_FREQ
+
 # Settings
 Fs = 44100
-f0 = 1000.0
+f0 = SIGNAL_FREQ
 amplitude = 1.0
 #amplitude = 0  # if you want only noise
-phase_signal = 0.0
+blocksize = 256  # frames per callback (small = low latency)
 
 
 # COnfigurazione noise
 add_noise = False
 
 noise_mode = "multi"  # "tone10k" oppure "white" oppure "multi"
-f_noise10k = 10000.0
-noise_freqs = np.array([5500.0, 7500.0, 11000.0, 13000.0, 16000.0], dtype=float)
+f_noise10k = TONE10K_FREQ
+noise_freqs = NOISE_FREQS
 A_noise = 0.3
 
 rng = np.random.default_rng()
 phase_noise = rng.uniform(0, 2*np.pi, size=noise_freqs.size)
 
 
-def callback(outdata, frames, time_info, status):
-    global phase_signal, phase_noise, add_noise, noise_mode
-    
-    t = np.arange(frames) / Fs
-    
-    # segnale principale
-    sig = amplitude * np.sin(2*np.pi*f0*t + phase_signal)
-    phase_signal = (phase_signal + 2*np.pi*f0*frames/Fs) % (2*np.pi)
-
-    # rumore / tono
+# Tutti i toni (segnale, 10 kHz, multi) in un unico banco: accendere/spegnere il rumore
+# cambia solo le ampiezze, le fasi restano continue.
+freqs = np.concatenate([[f0, f_noise10k], noise_freqs])
+phases = np.concatenate([[0.0, phase_noise[0]], phase_noise])
+tones = ToneBank(freqs, np.zeros(freqs.size), Fs, phases=phases)
+white = WhiteNoise(A_noise, seed=None)
+
+
+def tone_amplitudes():
+    """
+    Amplitude of each tone of the bank for the current noise settings.
+    """
+    amps = np.zeros(freqs.size)
+    amps[0] = amplitude
     if add_noise:
         if noise_mode == "tone10k":
-            noise = A_noise * np.sin(2*np.pi*10000.0*t + phase_noise)
-            phase_noise = (phase_noise + 2*np.pi*10000.0*frames/Fs) % (2*np.pi)
-        elif noise_mode == "white":
-            noise = A_noise * rng.standard_normal(frames)
+            amps[1] = A_noise
         elif noise_mode == "multi":
             # divide total noise amplitude equally for each tone
-            A_per_tone = A_noise / noise_freqs.size
+            amps[2:] = A_noise / noise_freqs.size
+    return amps
+
 
-            noise = np.zeros(frames)
-            for i, f in enumerate(noise_freqs):
-                # genero la sinusoide per la freq f
-                tone = np.sin(2*np.pi*f*t + phase_noise[i])
-                noise += A_per_tone * tone
+tones.set_amplitudes(tone_amplitudes())
 
-                # aggiorno la fase di questo tono per il prossimo blocco
-                phase_noise[i] = (phase_noise[i] + 2*np.pi*f*frames/Fs) % (2*np.pi)
 
-        else:
-            noise = 0.0
-    else:
-        noise = 0.0
+def callback(outdata, frames, time_info, status):
+    # segnale principale + toni di rumore, scritti direttamente in outdata (L=R)
+    tones.render(outdata, frames)
 
-    stereo = np.column_stack([sig+noise, sig+noise])
-    outdata[:] = stereo.astype(np.float32)
+    if add_noise and noise_mode == "white":
+        white.render(outdata, frames, add=True)
 
 
 # avvia lo stream
-with sd.OutputStream(channels=2, samplerate=Fs, callback=callback):
+with sd.OutputStream(channels=2, samplerate=Fs, blocksize=blocksize, dtype="float32", callback=callback):
     print("Riproduzione... premi n per toggle rumore, Ctrl+C per uscire")
     try:
         while True:
             cmd = input()
             if cmd.strip().lower() == "n":
                 add_noise = not add_noise
+                tones.set_amplitudes(tone_amplitudes())
                 print(f"Noise {'ON' if add_noise else 'OFF'}")
     except KeyboardInterrupt:
         print("Interrotto.")
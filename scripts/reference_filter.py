@@ -0,0 +1,256 @@
+#########
+# Floating point reference FIR filtering for long filters and long captures.
+# Three evaluations of y[n] = sum_k h[k] x[n-k], chosen by tap count and block size:
+#   direct:       one vectorized pass per tap, O(N*M), fastest for short filters;
+#   overlap-save: FFT convolution in segments, O(N log M), for long filters on long blocks;
+#   partitioned:  uniformly partitioned overlap-save (the filter is split into sub-filters of the
+#                 block length, whose spectra are applied to a delay line of input block spectra),
+#                 for long filters on short blocks, e.g. audio callbacks.
+# All of them take (..., n) inputs (many channels at once) and keep their state between blocks.
+#
+# Usage (from the scripts folder), crossover benchmark:
+#   python reference_filter.py
+##################
+
+import argparse
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+METHODS = ("direct", "overlap-save", "partitioned")
+
+# crossovers measured with benchmark() (numpy FFT, 2 channels, 2**17 samples)
+DIRECT_MAX_TAPS = 16 # up to this many taps the direct form is the fastest
+PARTITIONED_MIN_TAPS = 1024 # partitioned for filters at least this long on blocks shorter than the filter
+BATCH = 64 # overlap-save segments transformed together
+
+
+def _next_pow2(n):
+    return 1 << (int(n) - 1).bit_length()
+
+
+def choose_method(n_taps, block):
+    """
+    Fastest method for a filter of n_taps taps applied to blocks of block samples.
+    """
+    if n_taps <= DIRECT_MAX_TAPS:
+        return "direct"
+    if n_taps >= PARTITIONED_MIN_TAPS and block < n_taps:
+        return "partitioned"
+
+    return "overlap-save"
+
+
+class FirFilter:
+    """
+    Streaming FIR filter: process() can be called with blocks of any length and shape (..., n);
+    the concatenated outputs equal np.convolve(x, h)[:len(x)] of the whole signal.
+
+    Example:
+        fir = FirFilter(h, block=256)   # method chosen for 256-sample blocks
+        for block in blocks:
+            y = fir.process(block)
+    """
+
+    def __init__(self, h, method="auto", block=4096, nfft=None):
+        """
+        Args:
+        h: filter coefficients.
+        method: one of METHODS, or "auto" (choose_method for the given block length).
+        block: typical block length (auto choice) and partition length of the partitioned method.
+        nfft: FFT length of overlap-save (default: next power of two >= min(4 * len(h), block + len(h) - 1)).
+        """
+        self.h = np.asarray(h, dtype=np.float64)
+        self.m = len(self.h)
+        self.method = choose_method(self.m, block) if method == "auto" else method
+        if self.method not in METHODS:
+            raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+
+        self.hist = None # last m-1 input samples (direct, overlap-save)
+
+        if self.method == "overlap-save":
+            self.nfft = nfft or _next_pow2(min(4 * self.m, block + self.m - 1))
+            if self.nfft < self.m:
+                raise ValueError(f"nfft={self.nfft} shorter than the filter ({self.m} taps)")
+            self.H = np.fft.rfft(self.h, self.nfft)
+
+        elif self.method == "partitioned":
+            self.b = block
+            self.p = -(-self.m // block) # number of partitions
+            hp = np.zeros(self.p * block)
+            hp[:self.m] = self.h
+            self.Hp = np.fft.rfft(hp.reshape(self.p, block), 2 * block, axis=-1) # (p, b+1)
+
+            self.prev = None # last complete input block
+            self.pending = None # samples of the incomplete block
+            self.fdl = None # spectra of the last p-1 complete blocks (frequency-domain delay line)
+
+    def reset(self):
+        self.hist = None
+        if self.method == "partitioned":
+            self.prev = self.pending = self.fdl = None
+
+    def _history(self, x):
+        if self.hist is None:
+            self.hist = np.zeros(x.shape[:-1] + (self.m - 1,))
+
+        return np.concatenate([self.hist, x], axis=-1)
+
+    def _direct(self, x):
+        xp = self._history(x)
+        n = x.shape[-1]
+
+        y = np.zeros(x.shape)
+        for i, c in enumerate(self.h):
+            start = self.m - 1 - i
+            y += c * xp[..., start:start + n]
+
+        self.hist = xp[..., n:]
+
+        return y
+
+    def _overlap_save(self, x):
+        xp = self._history(x)
+        n = x.shape[-1]
+        step = self.nfft - self.m + 1 # new output samples per segment
+        n_seg = -(-n // step)
+
+        pad = np.zeros(x.shape[:-1] + (n_seg * step - n,))
+        segs = sliding_window_view(np.concatenate([xp, pad], axis=-1), self.nfft, axis=-1)[..., ::step, :][..., :n_seg, :]
+
+        y = np.empty(x.shape[:-1] + (n_seg, step))
+        for i in range(0, n_seg, BATCH):
+            Y = np.fft.irfft(np.fft.rfft(segs[..., i:i + BATCH, :], axis=-1) * self.H, self.nfft, axis=-1)
+            y[..., i:i + BATCH, :] = Y[..., self.m - 1:]
+
+        self.hist = xp[..., n:]
+
+        return y.reshape(x.shape[:-1] + (n_seg * step,))[..., :n]
+
+    def _partitioned(self, x):
+        b, p = self.b, self.p
+        lead = x.shape[:-1]
+        if self.prev is None:
+            self.prev = np.zeros(lead + (b,))
+            self.pending = np.zeros(lead + (0,))
+            self.fdl = np.zeros(lead + (p - 1, b + 1), dtype=complex)
+
+        r0 = self.pending.shape[-1]
+        n = x.shape[-1]
+        n_blocks = -(-(r0 + n) // b)
+        seq = np.concatenate([self.prev, self.pending, x, np.zeros(lead + (n_blocks * b - r0 - n,))], axis=-1)
+
+        # spectra of [previous block, block] for every (possibly incomplete, zero padded) block
+        X = np.fft.rfft(sliding_window_view(seq, 2 * b, axis=-1)[..., ::b, :], axis=-1) # (..., n_blocks, b+1)
+        Xall = np.concatenate([self.fdl, X], axis=-2)
+
+        Y = np.zeros(X.shape, dtype=complex)
+        for k in range(p):
+            Y += self.Hp[k] * Xall[..., p - 1 - k:p - 1 - k + n_blocks, :]
+        y = np.fft.irfft(Y, 2 * b, axis=-1)[..., b:].reshape(lead + (n_blocks * b,))[..., r0:r0 + n]
+
+        # only complete blocks enter the delay line; the incomplete one is recomputed next time
+        n_full = (r0 + n) // b
+        if n_full:
+            self.fdl = np.concatenate([self.fdl, X[..., :n_full, :]], axis=-2)[..., n_full:, :]
+            self.prev = seq[..., n_full * b:(n_full + 1) * b].copy()
+        self.pending = seq[..., (n_full + 1) * b:b + r0 + n].copy()
+
+        return y
+
+    def process(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if x.shape[-1] == 0:
+            return np.zeros(x.shape)
+
+        if self.method == "direct":
+            return self._direct(x)
+        if self.method == "overlap-save":
+            return self._overlap_save(x)
+
+        return self._partitioned(x)
+
+
+def fir_filter(x, h, method="auto", block=None):
+    """
+    Causal FIR output of x, shape (..., n): np.convolve(x, h)[:n] on every row.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    block = block or x.shape[-1]
+
+    return FirFilter(h, method, block=max(1, block)).process(x)
+
+
+def convolve(x, h, mode="full", method="auto"):
+    """
+    Drop-in replacement of np.convolve(x, h, mode) for a filter h, batched on the rows of x.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n, m = x.shape[-1], len(h)
+
+    y = fir_filter(np.concatenate([x, np.zeros(x.shape[:-1] + (m - 1,))], axis=-1), h, method)
+    if mode == "full":
+        return y
+    if mode == "same":
+        start = (min(n, m) - 1) // 2
+        return y[..., start:start + max(n, m)]
+    if mode == "valid":
+        return y[..., min(n, m) - 1:max(n, m)]
+
+    raise ValueError(f"Unknown mode '{mode}'")
+
+
+def benchmark(taps=(4, 16, 32, 64, 256, 1024), blocks=(256, 4096, 65536), channels=2, total=1 << 18, repeat=3):
+    """
+    Throughput of every method for every (taps, block) pair, streaming total samples per channel
+    in blocks. Returns a list of dicts with taps, block, seconds per method and the fastest one.
+    """
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((channels, total))
+
+    rows = []
+    for m in taps:
+        h = rng.standard_normal(m)
+        for b in blocks:
+            times = {}
+            for method in METHODS:
+                if method == "direct" and m * total > (1 << 30):
+                    continue # far too slow, not a candidate
+
+                best = np.inf
+                for _ in range(repeat):
+                    fir = FirFilter(h, method, block=b)
+                    t0 = time.perf_counter()
+                    for i in range(0, total, b):
+                        fir.process(x[:, i:i + b])
+                    best = min(best, time.perf_counter() - t0)
+                times[method] = best
+
+            rows.append({"taps": m, "block": b, **times, "fastest": min(times, key=times.get),
+                         "auto": choose_method(m, b)})
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crossover benchmark of the reference FIR methods.")
+    parser.add_argument("--taps", type=int, nargs="+", default=[4, 16, 32, 64, 256, 1024])
+    parser.add_argument("--blocks", type=int, nargs="+", default=[256, 4096, 65536])
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--total", type=int, default=1 << 18, help="samples per channel")
+    args = parser.parse_args(argv)
+
+    rows = benchmark(args.taps, args.blocks, args.channels, args.total)
+
+    print(f"{'taps':>6} {'block':>7} " + " ".join(f"{m:>13}" for m in METHODS) + f" {'fastest':>13} {'auto':>13}")
+    for r in rows:
+        ms = " ".join(f"{r[m] * 1e3:>10.1f} ms" if m in r else f"{'-':>13}" for m in METHODS)
+        print(f"{r['taps']:>6} {r['block']:>7} {ms} {r['fastest']:>13} {r['auto']:>13}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import os
+
+import matplotlib
+import numpy as np
+
+# Rendering helpers shared by sim/plot.py and hw/plot_hw.py.
+# In headless mode (Agg backend) the figures are reused between calls and never shown;
+# in both modes long signals are reduced to min/max pairs per pixel column before drawing
+# (images to one cell per pixel), which looks the same on screen but makes the saved files
+# orders of magnitude smaller. In interactive mode the lines are decimated again on every zoom,
+# from the full signal, so zooming in down to the raw samples works as with a plain ax.plot.
+
+HEADLESS = False
+FORMAT = None # None: keep the extension given by the caller (svg in the scripts), otherwise "png" or "svg"
+DPI = 100
+
+_figures = {} # reused figures, by key (headless mode only)
+
+# HEADLESS_PLOTS=png (or svg) switches the analysis scripts to headless mode without editing them
+# (any other non-empty value, e.g. 1, means png)
+HEADLESS_ENV = "HEADLESS_PLOTS"
+
+
+def configure(headless=True, fmt="png", dpi=DPI):
+    """
+    Select the rendering mode. Must be called before the first plot.
+
+    Args:
+    headless: use the Agg backend, reuse figures and never call plt.show().
+    fmt: output format of the saved plots ("png" or "svg"), None to keep the caller's extension.
+    """
+    global HEADLESS, FORMAT, DPI
+
+    if fmt not in (None, "png", "svg"):
+        raise ValueError(f"Unsupported format '{fmt}'")
+
+    if headless:
+        matplotlib.use("Agg")
+
+    HEADLESS, FORMAT, DPI = headless, fmt, dpi
+
+
+def minmax_decimate(y, n_px, x=None):
+    """
+    Reduce a signal to (at most) 2*n_px points: the min and the max of each of n_px buckets,
+    kept in their original order. Every vertical extent of the line survives, so the drawing
+    at n_px pixel columns is unchanged.
+
+    Returns x, y (x defaults to the sample index).
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if x is None:
+        x = np.arange(n)
+
+    if n_px <= 0 or n <= 2 * n_px:
+        return x, y
+
+    bucket = -(-n // n_px) # ceil
+    n_full = n // bucket
+    blocks = y[:n_full * bucket].reshape(n_full, bucket)
+    offsets = np.arange(n_full) * bucket
+
+    idx = np.stack([blocks.argmin(axis=1) + offsets, blocks.argmax(axis=1) + offsets], axis=1)
+    idx.sort(axis=1)
+    idx = idx.ravel()
+
+    if n_full * bucket < n: # last, shorter bucket
+        tail = y[n_full * bucket:]
+        t = np.sort([tail.argmin(), tail.argmax()]) + n_full * bucket
+        idx = np.concatenate([idx, t])
+
+    return x[idx], y[idx]
+
+
+def max_decimate(img, n_rows, n_cols):
+    """
+    Reduce a 2-D image to at most n_rows x n_cols cells, each the maximum of its block of cells
+    (narrow lines, e.g. tones in a spectrogram, stay visible).
+    """
+    img = np.asarray(img)
+    for axis, n_px in ((0, n_rows), (1, n_cols)):
+        n = img.shape[axis]
+        if 0 < n_px < n:
+            edges = (np.arange(n_px) * n) // n_px
+            img = np.maximum.reduceat(img, edges, axis=axis)
+
+    return img
+
+
+def axes_width_px(ax):
+    """
+    Width of the axes in pixels.
+    """
+    fig = ax.figure
+
+    return int(np.ceil(fig.get_figwidth() * fig.dpi * ax.get_position().width))
+
+
+def axes_height_px(ax):
+    """
+    Height of the axes in pixels.
+    """
+    fig = ax.figure
+
+    return int(np.ceil(fig.get_figheight() * fig.dpi * ax.get_position().height))
+
+
+def new_axes(key="default", figsize=None):
+    """
+    Figure and axes for a new plot. In headless mode the figure of the same key is cleared and reused.
+    """
+    import matplotlib.pyplot as plt
+
+    if not HEADLESS:
+        fig = plt.figure(figsize=figsize)
+        return fig, fig.add_subplot()
+
+    fig = _figures.get(key)
+    if fig is None or not plt.fignum_exists(fig.number):
+        fig = plt.figure(figsize=figsize, dpi=DPI)
+        fig.add_subplot()
+        _figures[key] = fig
+
+    ax = fig.axes[0]
+    ax.cla()
+
+    return fig, ax
+
+
+def new_grid(key, rows, cols, figsize=None):
+    """
+    Figure with a rows x cols grid of axes (2-D array). In headless mode the figure of the same key
+    is cleared and reused.
+    """
+    import matplotlib.pyplot as plt
+
+    fig = _figures.get(key) if HEADLESS else None
+    if fig is None or not plt.fignum_exists(fig.number):
+        fig = plt.figure(figsize=figsize, dpi=DPI if HEADLESS else None)
+        if HEADLESS:
+            _figures[key] = fig
+    else:
+        fig.clf()
+        if figsize:
+            fig.set_size_inches(figsize)
+
+    return fig, fig.subplots(rows, cols, squeeze=False)
+
+
+def plot_decimated(ax, y, *args, x=None, **kwargs):
+    """
+    ax.plot of a (possibly very long) signal, decimated to the pixel width of the axes.
+    In interactive mode the visible range is decimated again when the x limits change (zoom, pan).
+    """
+    y = np.asarray(y)
+    x = np.arange(len(y)) if x is None else np.asarray(x)
+    xd, yd = minmax_decimate(y, axes_width_px(ax), x=x)
+    lines = ax.plot(xd, yd, *args, **kwargs)
+
+    if not HEADLESS and len(x) > 1 and np.all(x[1:] >= x[:-1]): # range lookup needs a sorted x
+        line = lines[0]
+
+        def redecimate(ax):
+            lo, hi = sorted(ax.get_xlim())
+            i0 = max(np.searchsorted(x, lo, side="left") - 1, 0) # one sample beyond each edge
+            i1 = min(np.searchsorted(x, hi, side="right") + 1, len(x))
+            line.set_data(*minmax_decimate(y[i0:i1], axes_width_px(ax), x=x[i0:i1]))
+
+        ax.callbacks.connect("xlim_changed", redecimate)
+
+    return lines
+
+
+def plot_image(ax, img, x, y, fmax=None, **kwargs):
+    """
+    ax.imshow of an image img[i, j] sampled at x[i] (horizontal, e.g. time) and y[j] (vertical,
+    e.g. frequency, cropped at fmax), decimated to the pixel size of the axes with max_decimate.
+    """
+    img = np.asarray(img)
+    if fmax is not None:
+        keep = np.searchsorted(y, fmax, side="right")
+        img, y = img[:, :keep], y[:keep]
+
+    img = max_decimate(img, axes_width_px(ax), axes_height_px(ax)).T
+    extent = (x[0], x[-1] if len(x) > 1 else x[0] + 1, y[0], y[-1] if len(y) > 1 else y[0] + 1)
+
+    return ax.imshow(img, origin="lower", aspect="auto", extent=extent, interpolation="nearest", **kwargs)
+
+
+def output_path(path):
+    """
+    Path with the extension of the selected output format.
+    """
+    if FORMAT is None:
+        return path
+
+    return os.path.splitext(path)[0] + "." + FORMAT
+
+
+def finish(fig, path=None):
+    """
+    Save the figure (if a path is given) and show it, unless in headless mode.
+    """
+    import matplotlib.pyplot as plt
+
+    if path:
+        path = output_path(path)
+        fig.savefig(path, format=os.path.splitext(path)[1][1:] or None)
+
+    if not HEADLESS:
+        plt.show()
+
+    return path
+
+
+if os.environ.get(HEADLESS_ENV):
+    _fmt = os.environ[HEADLESS_ENV].lower()
+    configure(headless=True, fmt=_fmt if _fmt in ("png", "svg") else "png")
@@ -3,7 +3,9 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 
-from utils import load_csv, db
+from utils import load_csv
+from spectrum import welch
+from reference_filter import convolve
 from plot import plot_time, plot_freqz
 
 # CONFIGURATION
@@ -43,24 +45,21 @@ def analyze_logged(data, fs):
     plot_freqz(COEFF, fs, filename="fir_freq_response.svg", signal_type=signal_type)
 
 
-    # Fast Fourier Transform (FFT) of the input and output signals
-    # To plot the frequency responce
-    N = min(len(out_l), 4096) # 4096 è tipica lunghezza, prendi il minimo tra la lunghezza del segnale di output e 4096
-    
-    IN = np.fft.rfft(in_l[:N]) 
-    OUT = np.fft.rfft(out_l[:N])
-    f = np.fft.rfftfreq(N, d=1/fs) # frequency bins corresponding to the FFT points
+    # Welch power spectral density of the input and output signals, over the whole log
+    # (averaged over overlapping Hann windowed segments of up to 4096 samples)
+    f, P = welch(np.stack([in_l, out_l]), fs, nperseg=4096)
+    P_IN, P_OUT = P
 
 
     plt.figure()
 
-    plt.semilogx(f+1e-9, db(IN), label="Input", alpha=0.5)
-    plt.semilogx(f+1e-9, db(OUT), label="Output", alpha=0.5)
+    plt.semilogx(f+1e-9, 10*np.log10(np.maximum(P_IN, 1e-24)), label="Input", alpha=0.5)
+    plt.semilogx(f+1e-9, 10*np.log10(np.maximum(P_OUT, 1e-24)), label="Output", alpha=0.5)
 
     plt.title("Input vs Output spectrum (Left)")
 
     plt.xlabel("Frequency [Hz] (log)")
-    plt.ylabel("Magnitude [dB]")
+    plt.ylabel("PSD [dB/Hz]")
     plt.grid(True, which='both')
     plt.legend()
     plt.savefig("../../plots_sim/plots_"+ signal_type + "_sim/"+"input_output_spectrum.svg", format='svg')
@@ -79,7 +78,7 @@ def demo_square(coeff, fs):
     sq8 = (127*sq).astype(float) # 8-bit representation (scaled to [-127, 127])
     
     # Apply the FIR filter to the square wave signal
-    y = np.convolve(sq8, coeff, mode='full')[:N]
+    y = convolve(sq8, coeff, mode='full')[:N]
 
     # Plot the input and output signals in time domain
     plot_time(sq8, "DEMO input: 1 kHz square (8-bit)", signal_type)
@@ -1,6 +1,5 @@
-import matplotlib.pyplot as plt
-import numpy as np
-from utils import db
+from freq_response import freq_response
+from render import new_axes, plot_decimated, finish
 
 def plot_time(sig, title, signal_type=None, ylabel="Amplitude", filename=None):
     """
@@ -8,17 +7,16 @@ def plot_time(sig, title, signal_type=None, ylabel="Amplitude", filename=None):
 
     signal_type: either "squarewave" or "sinusoidal".
     """
-    plt.figure()
+    fig, ax = new_axes("time")
 
-    plt.plot(sig)
+    plot_decimated(ax, sig)
 
-    plt.title(title)
-    plt.xlabel("Samples")
-    plt.ylabel(ylabel)
-    plt.grid(True)
+    ax.set_title(title)
+    ax.set_xlabel("Samples")
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
 
-    plt.savefig("../../plots_sim/plots_"+ signal_type +"_sim/"+filename) if (filename and signal_type) else None
-    plt.show()
+    finish(fig, "../../plots_sim/plots_"+ signal_type +"_sim/"+filename if (filename and signal_type) else None)
 
 
 def plot_freqz(coeff, fs, signal_type, filename=None):
@@ -29,21 +27,20 @@ def plot_freqz(coeff, fs, signal_type, filename=None):
     """
     nfft = 4096 # Number of points for FFT. Must be a power of 2 for performance.
 
-    H = np.fft.rfft(coeff, n=nfft) #rfft: real fast-Fourier transform. Evita di calcolare la FFT completa, che sarebbe simmetrica (ridontante). 
+    # risposta memoizzata (freq_response.py): rfft dei coefficienti sulla griglia np.fft.rfftfreq(nfft, d=1/fs).
     # H è il guadagno in frequenza della risposta del filtro FIR: ti dice quanto amplifica (H>0) o attenua (H<0) il segnale in ciascuna frequenza.
-    f = np.fft.rfftfreq(nfft, d=1/fs) # Calcola i valori di frequenza (in Hz) corrispondenti a ciascun punto dell’FFT. 1/fs è il periodo di campionamento (word select).
+    r = freq_response(coeff, fs, nfft=nfft)
 
-    plt.figure()
+    fig, ax = new_axes("freqz")
 
-    plt.plot(f, db(H)) # Plot the magnitude response in dB
+    ax.plot(r["f"], r["mag_db"]) # Plot the magnitude response in dB
 
-    plt.title("FIR |H(f)| dB (coeff = [1,2,2,1])")
-    plt.xlabel("Frequency [Hz]")
-    plt.ylabel("Magnitude [dB]")
-    plt.grid(True)
+    ax.set_title("FIR |H(f)| dB (coeff = [1,2,2,1])")
+    ax.set_xlabel("Frequency [Hz]")
+    ax.set_ylabel("Magnitude [dB]")
+    ax.grid(True)
 
-    plt.savefig("../../plots_sim/plots_"+signal_type+"_sim/"+filename) if filename else None
-    plt.show()
+    finish(fig, "../../plots_sim/plots_"+signal_type+"_sim/"+filename if filename else None)
 
 def input_vs_output_time(in_signal, out_signal, signal_type):
     """
@@ -52,14 +49,13 @@ def input_vs_output_time(in_signal, out_signal, signal_type):
     out_signal: Output signal (numpy array).
     signal_type: either "squarewave" or "sinusoidal".
     """
-    plt.figure()
-    plt.plot(in_signal, label="Input", color="blue", alpha=0.5)
-    plt.plot(out_signal, label="Output", color="red", alpha=0.5)
-    plt.title("Input vs Output signals")
-    plt.xlabel("Samples")
-    plt.ylabel("Amplitude")
-    plt.grid(True)
-    plt.legend()
-    plt.savefig("../../plots_sim/plots_"+signal_type+"_sim/input_output_time.svg", format='svg')
-    plt.show()
+    fig, ax = new_axes("input_output")
+    plot_decimated(ax, in_signal, label="Input", color="blue", alpha=0.5)
+    plot_decimated(ax, out_signal, label="Output", color="red", alpha=0.5)
+    ax.set_title("Input vs Output signals")
+    ax.set_xlabel("Samples")
+    ax.set_ylabel("Amplitude")
+    ax.grid(True)
+    ax.legend()
+    finish(fig, "../../plots_sim/plots_"+signal_type+"_sim/input_output_time.svg")
 
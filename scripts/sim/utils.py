@@ -1,21 +1,20 @@
-import numpy as np
+import os
+import sys
 
-def db(x):
-    """
-    Convert a signal to decibels (dB).
-    """
+# shared modules (capture_io, ...) live in the parent "scripts" folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from capture_io import db, load_ila_csv
+from capture_cache import load_cached
 
-    eps = 1e-12 # needed to avoid log(0)
 
-    return 20*np.log10(np.maximum(np.abs(x), eps))
-
-
-def load_csv(path):
+def load_csv(path, cache=True):
     '''
     This function attempts to load the data contained in the CSV file containing the input and output signals to the FIR filter, simulated on Vivado.
+    The data are returned as an int32 structured array: the radix row of the ILA exports is already removed.
+    With cache=True the capture is parsed only once, then memory-mapped from the binary cache (see capture_cache.py).
     '''
     try:
-        data = np.genfromtxt(path, delimiter=',', names=True, dtype=None, encoding='utf-8')
+        data = load_cached(path) if cache else load_ila_csv(path)
 
         return data
     
@@ -0,0 +1,183 @@
+#########
+# SNR / THD / SINAD / ENOB and per-tone attenuation of filtered sinusoid captures.
+# The tones of the stimulus are known (stimulus.py): their amplitudes are fitted by least squares
+# on consecutive windows, for all windows, channels and input/output signals in one matrix product.
+#
+# Usage (from the scripts folder):
+#   python sine_metrics.py ../log_from_hardware/log_i2s_filter_sinusoidal_noise.csv
+##################
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from capture_cache import load_cached
+from capture_io import WS_frequency, io_signals
+from stimulus import SIGNAL_FREQ, NOISE_FREQS
+
+WINDOW = 4096 # samples per fitted window
+N_HARMONICS = 5 # harmonics of the fundamental (2nd to 6th) used for THD
+
+
+def refine_freqs(x, freqs, fs, search=0.02):
+    """
+    Refine nominal tone frequencies on the spectrum of x (Hann window + parabolic interpolation of the
+    log magnitude), looking within +-search (relative) of each nominal frequency.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    X = np.abs(np.fft.rfft((x - x.mean()) * np.hanning(n)))
+    logX = np.log(np.maximum(X, 1e-30))
+    df = fs / n
+
+    out = []
+    for f in freqs:
+        lo = max(1, int((f * (1 - search)) / df))
+        hi = min(len(X) - 2, int(np.ceil(f * (1 + search) / df)))
+        if hi <= lo:
+            out.append(f)
+            continue
+
+        k = lo + int(np.argmax(X[lo:hi + 1]))
+        a, b, c = logX[k - 1], logX[k], logX[k + 1]
+        denom = a - 2*b + c
+        delta = 0.5 * (a - c) / denom if denom != 0 else 0.0
+        out.append((k + delta) * df)
+
+    return np.array(out)
+
+
+def tone_basis(freqs, n, fs):
+    """
+    Least squares basis [cos(2 pi f_k t), sin(2 pi f_k t), 1] of n samples, shape (n, 2K+1).
+    """
+    t = np.arange(n)[:, None] / fs
+    arg = 2*np.pi*np.asarray(freqs)[None, :]*t
+
+    return np.hstack([np.cos(arg), np.sin(arg), np.ones((n, 1))])
+
+
+def fit_windows(x, freqs, fs, window=WINDOW):
+    """
+    Fit the amplitudes of the given tones (plus DC) on consecutive windows of x.
+
+    x has shape (..., n): all the leading rows (signals, channels) share the same basis, so the
+    fit of every window of every row is one product with its pseudo-inverse.
+
+    Returns:
+    amps: tone amplitudes, shape (..., n_windows, K).
+    total: power of each window without DC, shape (..., n_windows).
+    resid: power of what the tones do not explain, shape (..., n_windows).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    window = min(window, x.shape[-1])
+    n_win = x.shape[-1] // window
+    w = x[..., :n_win * window].reshape(x.shape[:-1] + (n_win, window))
+
+    B = tone_basis(freqs, window, fs)
+    coef = w @ np.linalg.pinv(B).T # (..., n_windows, 2K+1)
+
+    k = len(freqs)
+    amps = np.hypot(coef[..., :k], coef[..., k:2*k])
+    total = np.var(w, axis=-1)
+    resid = np.mean((w - coef @ B.T)**2, axis=-1)
+
+    return amps, total, resid
+
+
+def sine_metrics(x, fs, fundamental=SIGNAL_FREQ, tones=NOISE_FREQS, n_harmonics=N_HARMONICS,
+                 window=WINDOW, refine=True):
+    """
+    Quality metrics of signals carrying a known fundamental and known interfering tones.
+
+    x: shape (n,) or (rows, n). Frequencies are refined on the first row when refine=True.
+
+    Per row, median over the windows:
+    snr_db:   fundamental vs everything except harmonics (interfering tones count as noise).
+    thd_db:   harmonics vs fundamental.
+    sinad_db: fundamental vs everything else.
+    enob:     (SINAD - 1.76) / 6.02.
+    tone_amps: amplitude of [fundamental, tones...].
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+
+    freqs = np.concatenate([[fundamental], tones])
+    if refine:
+        freqs = refine_freqs(x[0], freqs, fs)
+    harmonics = freqs[0] * np.arange(2, n_harmonics + 2)
+    # harmonics that fall on a stimulus tone (within one bin of the window) cannot be told apart from it
+    n = min(window, x.shape[-1])
+    apart = np.min(np.abs(harmonics[:, None] - freqs[None, :]), axis=1) > fs / n
+    harmonics = harmonics[(harmonics < fs / 2) & apart]
+
+    amps, _, resid = fit_windows(x, np.concatenate([freqs, harmonics]), fs, window)
+    p = amps**2 / 2 # power of each sinusoid
+
+    p_fund = p[..., 0]
+    p_tones = p[..., 1:len(freqs)].sum(axis=-1)
+    p_harm = p[..., len(freqs):].sum(axis=-1)
+    eps = 1e-30
+
+    # noise + distortion from the fit itself (not var(w) - p_fund: on windows without a whole number
+    # of periods that difference is off by more than the noise), so SINAD <= min(SNR, -THD) by construction
+    p_fund = np.maximum(p_fund, eps) # silent outputs: very low metrics instead of divide-by-zero warnings
+    sinad = 10*np.log10(p_fund / np.maximum(resid + p_harm + p_tones, eps))
+    snr = 10*np.log10(p_fund / np.maximum(resid + p_tones, eps))
+    thd = 10*np.log10(np.maximum(p_harm, eps) / p_fund)
+
+    return {
+        "freqs": freqs,
+        "snr_db": np.median(snr, axis=-1),
+        "thd_db": np.median(thd, axis=-1),
+        "sinad_db": np.median(sinad, axis=-1),
+        "enob": (np.median(sinad, axis=-1) - 1.76) / 6.02,
+        "tone_amps": np.median(amps[..., :len(freqs)], axis=-2),
+    }
+
+
+def measure_capture(data, fs=WS_frequency, fundamental=SIGNAL_FREQ, tones=NOISE_FREQS, window=WINDOW):
+    """
+    Metrics of input and output of every channel of a capture, computed in one pass, plus the
+    attenuation of every stimulus tone (output amplitude / input amplitude, dB).
+    """
+    pairs = io_signals(data)
+    if not pairs:
+        raise KeyError(f"No input/output columns found; fields found: {data.dtype.names}")
+
+    n = min(len(x) for _, x, _ in pairs)
+    rows = np.stack([s[:n] for _, x, y in pairs for s in (x, y)]) # in_L, out_L, in_R, out_R...
+    m = sine_metrics(rows, fs, fundamental, tones, window=window)
+
+    result = {"freqs_hz": m["freqs"].tolist()}
+    for i, (ch, _, _) in enumerate(pairs):
+        res = {}
+        for side, r in (("in", 2*i), ("out", 2*i + 1)):
+            for key in ("snr_db", "thd_db", "sinad_db", "enob"):
+                res[f"{side}_{key}"] = float(m[key][r])
+        att = 20*np.log10(np.maximum(m["tone_amps"][2*i + 1], 1e-30) / np.maximum(m["tone_amps"][2*i], 1e-30))
+        res["tone_attenuation_db"] = att.tolist()
+        result[ch] = res
+
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SNR/THD/SINAD/ENOB of a filtered sinusoid capture.")
+    parser.add_argument("path")
+    parser.add_argument("--fs", type=float, default=WS_frequency)
+    parser.add_argument("--fundamental", type=float, default=SIGNAL_FREQ)
+    parser.add_argument("--tones", type=float, nargs="*", default=list(NOISE_FREQS),
+                        help="interfering stimulus tones in Hz (default: play_sine.py multi mode)")
+    parser.add_argument("--window", type=int, default=WINDOW)
+    args = parser.parse_args(argv)
+
+    result = measure_capture(load_cached(args.path), args.fs, args.fundamental, np.array(args.tones), args.window)
+    print(json.dumps(result, indent=1))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#########
+# Spectrograms (short-time Fourier transform) of long captures with time-varying stimuli, e.g. the
+# melody of play_song.py / play_song_wnoise.py, which changes note every 0.4 s.
+# The segments are a strided view of the signal, windowed and transformed in batches in float32
+# into preallocated buffers; the frames are pooled in time so that the image has at most max_cols
+# columns, whatever the length of the capture (pairs of columns are merged when it fills up).
+# For every input/output pair of a capture: input, output and difference (output/input, dB) images.
+#
+# Usage (from the scripts folder):
+#   python spectrogram.py ../log_from_hardware/song.csv --nperseg 1024 --out plots/song_spectrogram.png
+##################
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from capture_io import WS_frequency
+from spectrum import BATCH, get_window
+
+NPERSEG = 1024 # samples per frame: 21 ms, 48 Hz resolution at WS_frequency (a note lasts 0.4 s)
+OVERLAP = 0.75 # fraction of overlap between consecutive frames
+MAX_COLS = 2048 # time columns kept (frames are averaged in groups beyond that)
+FLOOR_DB = -160.0 # floor of the dB images (empty bins)
+
+
+class Stft:
+    """
+    Batched STFT of one or more channels: frames(x) yields the power spectra of the complete
+    frames of x, batch frames at a time, as float32 arrays (..., n, nperseg//2 + 1).
+
+    The window, the frame buffer and the spectrum buffer are allocated once and reused by every
+    batch (numpy caches the FFT plan of a given length).
+    """
+
+    def __init__(self, nperseg=NPERSEG, overlap=OVERLAP, window="hann", batch=BATCH):
+        self.nperseg = nperseg
+        self.step = max(1, int(round(nperseg * (1 - overlap))))
+        self.nfreq = nperseg // 2 + 1
+        self.w = get_window(window, nperseg).astype(np.float32)
+        self.batch = batch
+        self._buf = None
+
+    def n_frames(self, n):
+        return 0 if n < self.nperseg else (n - self.nperseg) // self.step + 1
+
+    def _buffers(self, lead):
+        if self._buf is None or self._buf[0].shape[:-2] != lead:
+            self._buf = (np.empty(lead + (self.batch, self.nperseg), dtype=np.float32),
+                         np.empty(lead + (self.batch, self.nfreq), dtype=np.complex64))
+
+        return self._buf
+
+    def frames(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        n_frames = self.n_frames(x.shape[-1])
+        if n_frames == 0:
+            return
+
+        segs = sliding_window_view(x, self.nperseg, axis=-1)[..., ::self.step, :][..., :n_frames, :]
+        seg_buf, spec_buf = self._buffers(x.shape[:-1])
+
+        for i in range(0, n_frames, self.batch):
+            k = min(self.batch, n_frames - i)
+            seg, spec = seg_buf[..., :k, :], spec_buf[..., :k, :]
+            np.multiply(segs[..., i:i + k, :], self.w, out=seg)
+            np.fft.rfft(seg, axis=-1, out=spec)
+
+            yield spec.real**2 + spec.imag**2
+
+
+class SpectrogramStream:
+    """
+    Spectrogram updated chunk by chunk, with bounded memory.
+
+    As in spectrum.WelchStream the samples left over at the end of a chunk are joined with the next
+    one, so the frames are the same as for the whole signal. Consecutive frames are averaged in groups
+    of pool frames; when max_cols columns are filled, pairs of columns are merged and pool doubles.
+
+    Example:
+        sg = SpectrogramStream(fs)
+        for block in blocks:      # shape (n,) or (channels, n)
+            sg.update(block)
+        t, f, S = sg.result()
+    """
+
+    def __init__(self, fs, nperseg=NPERSEG, overlap=OVERLAP, window="hann", max_cols=MAX_COLS, batch=BATCH):
+        self.fs = fs
+        self.stft = Stft(nperseg, overlap, window, batch)
+        self.max_cols = max_cols + max_cols % 2 # even, so that a full image halves exactly
+        self.scale = np.float32(1 / (fs * np.sum(self.stft.w.astype(np.float64)**2)))
+
+        self.acc = None # (..., max_cols, nfreq) sums of the frame spectra of every column
+        self.pool = 1 # frames per column
+        self.n_frames = 0
+        self.tail = None
+
+    def _add(self, P):
+        """
+        Accumulate frame spectra P (..., k, nfreq) into the columns.
+        """
+        i = 0
+        k = P.shape[-2]
+        while i < k:
+            col = self.n_frames // self.pool
+            if col == self.max_cols:
+                # full: merge pairs of columns (their sums add up)
+                self.acc[..., :self.max_cols // 2, :] = self.acc[..., 0::2, :] + self.acc[..., 1::2, :]
+                self.acc[..., self.max_cols // 2:, :] = 0
+                self.pool *= 2
+                continue
+
+            # frames that fall in complete columns are summed with one reshape, the rest one column at a time
+            offset = self.n_frames % self.pool
+            take = min(k - i, self.pool - offset)
+            if offset == 0 and take == self.pool:
+                n_cols = min((k - i) // self.pool, self.max_cols - col)
+                take = n_cols * self.pool
+                block = P[..., i:i + take, :].reshape(P.shape[:-2] + (n_cols, self.pool, P.shape[-1]))
+                self.acc[..., col:col + n_cols, :] = block.sum(axis=-2)
+            else:
+                self.acc[..., col, :] += P[..., i:i + take, :].sum(axis=-2)
+
+            i += take
+            self.n_frames += take
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        if self.tail is not None:
+            x = np.concatenate([self.tail, x], axis=-1)
+
+        if self.acc is None:
+            self.acc = np.zeros(x.shape[:-1] + (self.max_cols, self.stft.nfreq), dtype=np.float32)
+
+        n_frames = self.stft.n_frames(x.shape[-1])
+        for P in self.stft.frames(x):
+            self._add(P)
+
+        self.tail = x[..., n_frames * self.stft.step:].copy()
+
+        return self
+
+    def result(self):
+        """
+        Returns:
+        t: time of every column in seconds (center of its frames).
+        f: frequency bins in Hz.
+        S: one-sided PSD (units^2/Hz), float32 (..., n_cols, nfreq); the last column may average
+           fewer frames than the others.
+        """
+        if self.n_frames == 0:
+            raise ValueError(f"Not enough samples for one frame of {self.stft.nperseg}")
+
+        n_cols = -(-self.n_frames // self.pool)
+        counts = np.full(n_cols, self.pool, dtype=np.float32)
+        counts[-1] = self.n_frames - (n_cols - 1) * self.pool
+
+        S = self.acc[..., :n_cols, :] * (self.scale / counts)[:, None]
+        last = -1 if self.stft.nperseg % 2 == 0 else None
+        S[..., 1:last] *= 2 # one-sided
+
+        step, nperseg = self.stft.step, self.stft.nperseg
+        first = np.arange(n_cols) * self.pool
+        t = ((first + (counts - 1) / 2) * step + nperseg / 2) / self.fs
+
+        return t, np.fft.rfftfreq(nperseg, d=1/self.fs), S
+
+
+def spectrogram(x, fs, nperseg=NPERSEG, overlap=OVERLAP, window="hann", max_cols=MAX_COLS, batch=BATCH):
+    """
+    Spectrogram of x, shape (n,) or (channels, n). Returns t, f, S (see SpectrogramStream.result).
+    """
+    return SpectrogramStream(fs, nperseg, overlap, window, max_cols, batch).update(x).result()
+
+
+def power_db(S, floor=FLOOR_DB):
+    return np.maximum(10 * np.log10(np.maximum(S, np.float32(1e-30))), np.float32(floor))
+
+
+def difference_db(S_in, S_out, floor=FLOOR_DB):
+    """
+    Gain of every time-frequency cell, output over input in dB (cells where the input is below the
+    floor are set to 0 dB).
+    """
+    d = power_db(S_out, floor) - power_db(S_in, floor)
+
+    return np.where(power_db(S_in, floor) > floor, d, np.float32(0))
+
+
+class SpectrogramReducer:
+    """
+    Input, output and difference spectrograms of input/output column pairs, fed by
+    chunked.FrameReader blocks (chunked.run).
+    """
+
+    def __init__(self, pairs, fs=WS_frequency, nperseg=NPERSEG, overlap=OVERLAP, window="hann", max_cols=MAX_COLS):
+        """
+        Args:
+        pairs: list of (channel, input column, output column).
+        """
+        self.pairs = list(pairs)
+        self.columns = [c for _, a, b in self.pairs for c in (a, b)]
+        self.sg = SpectrogramStream(fs, nperseg, overlap, window, max_cols)
+
+    def update(self, start, block):
+        self.sg.update(np.stack([block[c] for c in self.columns]).astype(np.float32))
+
+    def result(self):
+        """
+        Returns t, f and {channel: {"in": S, "out": S, "diff_db": gain}}, or None if the capture is
+        shorter than one frame.
+        """
+        if self.sg.n_frames == 0:
+            return None
+
+        t, f, S = self.sg.result()
+        out = {}
+        for i, (ch, _, _) in enumerate(self.pairs):
+            out[ch] = {"in": S[2 * i], "out": S[2 * i + 1], "diff_db": difference_db(S[2 * i], S[2 * i + 1])}
+
+        return t, f, out
+
+
+def capture_spectrograms(path, chunk_rows=None, fs=WS_frequency, nperseg=NPERSEG, overlap=OVERLAP, max_cols=MAX_COLS):
+    """
+    Spectrograms of every input/output pair of a capture, streamed chunk by chunk (see SpectrogramReducer).
+    """
+    from capture_io import CHUNK_ROWS, IO_PAIRS
+    from chunked import FrameReader, capture_columns
+
+    names = capture_columns(path)
+    pairs, seen = [], set()
+    for ch, a, b in IO_PAIRS:
+        if {a, b}.issubset(names) and ch not in seen:
+            pairs.append((ch, a, b))
+            seen.add(ch)
+    if not pairs:
+        raise KeyError(f"No input/output columns found; fields found: {names}")
+
+    reducer = SpectrogramReducer(pairs, fs, nperseg, overlap, max_cols=max_cols)
+    for start, block in FrameReader(path, reducer.columns, chunk_rows or CHUNK_ROWS):
+        reducer.update(start, block)
+
+    return reducer.result()
+
+
+def plot_spectrograms(t, f, channels, path=None, fmax=None, title=None):
+    """
+    One row per channel: input, output (dB/Hz) and difference (dB), each image decimated to the
+    pixel size of its axes (render.plot_image).
+    """
+    import render
+
+    n = len(channels)
+    fig, axes = render.new_grid("spectrogram", n, 3, figsize=(15, 3.5 * n))
+    fmax = fmax or f[-1]
+
+    for row, (ch, s) in zip(axes, channels.items()):
+        S_in, S_out = power_db(s["in"]), power_db(s["out"])
+        vmax = float(max(S_in.max(), S_out.max()))
+        for ax, img, name, kw in (
+            (row[0], S_in, "input", {"vmin": vmax - 120, "vmax": vmax, "cmap": "magma"}),
+            (row[1], S_out, "output", {"vmin": vmax - 120, "vmax": vmax, "cmap": "magma"}),
+            (row[2], s["diff_db"], "output - input", {"vmin": -60, "vmax": 10, "cmap": "RdBu_r"}),
+        ):
+            im = render.plot_image(ax, img, t, f, fmax=fmax, **kw)
+            fig.colorbar(im, ax=ax, label="dB")
+            ax.set_title(f"{title + ' - ' if title else ''}{ch} {name}")
+            ax.set_xlabel("Time [s]")
+            ax.set_ylabel("Frequency [Hz]")
+
+    fig.tight_layout()
+
+    return render.finish(fig, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Input/output spectrograms of a capture, streamed in chunks.")
+    parser.add_argument("path")
+    parser.add_argument("--fs", type=float, default=WS_frequency)
+    parser.add_argument("--nperseg", type=int, default=NPERSEG)
+    parser.add_argument("--overlap", type=float, default=OVERLAP)
+    parser.add_argument("--max-cols", type=int, default=MAX_COLS, help="time columns kept")
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    parser.add_argument("--fmax", type=float, default=None, help="highest frequency shown (Hz)")
+    parser.add_argument("--out", default=None, help="image file (default: next to the capture)")
+    args = parser.parse_args(argv)
+
+    import render
+    render.configure(headless=True, fmt=None) # the image is saved: finish() must not block on plt.show()
+
+    res = capture_spectrograms(args.path, args.chunk_rows, args.fs, args.nperseg, args.overlap, args.max_cols)
+    if res is None:
+        print(f"ERROR: capture shorter than one frame of {args.nperseg} samples")
+        return 1
+
+    t, f, channels = res
+    out = args.out or os.path.splitext(args.path)[0] + "_spectrogram.png"
+    print(f"{len(t)} columns of {t[1] - t[0] if len(t) > 1 else 0:.4f} s, {len(f)} bins")
+    print(f"Written {plot_spectrograms(t, f, channels, out, args.fmax, os.path.basename(args.path))}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
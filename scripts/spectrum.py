@@ -0,0 +1,170 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Welch power spectral density (averaged periodogram) for long captures.
+# The segments are a strided view of the signal (no copy); they are windowed and transformed
+# in batches with one 2-D rfft, so that the whole capture contributes with bounded memory.
+
+NPERSEG = 4096 # samples per segment (frequency resolution fs/NPERSEG)
+OVERLAP = 0.5 # fraction of overlap between consecutive segments
+BATCH = 64 # segments transformed together
+
+
+def get_window(name, n):
+    """
+    Periodic window of n samples ("hann", "hamming", "blackman" or "boxcar").
+    """
+    if name == "boxcar":
+        return np.ones(n)
+
+    windows = {"hann": np.hanning, "hamming": np.hamming, "blackman": np.blackman}
+    if name not in windows:
+        raise ValueError(f"Unknown window '{name}'")
+
+    return windows[name](n + 1)[:-1] # periodic version, as used for spectral analysis
+
+
+def _segment_ffts(segs, w, detrend, batch):
+    """
+    rfft of the windowed segments (view of shape (..., n_seg, nperseg)), batch segments at a time.
+    """
+    for i in range(0, segs.shape[-2], batch):
+        seg = segs[..., i:i + batch, :]
+        if detrend:
+            seg = seg - seg.mean(axis=-1, keepdims=True)
+
+        yield np.fft.rfft(seg * w, axis=-1)
+
+
+def _one_sided(P, nperseg):
+    # one-sided spectrum: double everything except DC (and Nyquist, for even nperseg)
+    last = -1 if nperseg % 2 == 0 else None
+    P[..., 1:last] *= 2
+
+    return P
+
+
+class WelchStream:
+    """
+    Welch estimate updated chunk by chunk.
+
+    The samples left over at the end of a chunk are kept and joined with the next one, so the
+    segments (and the result) are exactly the same as for the whole signal at once.
+
+    Example:
+        ws = WelchStream(fs)
+        for block in blocks:      # shape (n,) or (channels, n)
+            ws.update(block)
+        f, P = ws.result()
+    """
+
+    def __init__(self, fs, nperseg=NPERSEG, overlap=OVERLAP, window="hann", detrend=True, batch=BATCH):
+        self.fs = fs
+        self.nperseg = nperseg
+        self.step = max(1, int(round(nperseg * (1 - overlap))))
+        self.w = get_window(window, nperseg)
+        self.detrend = detrend
+        self.batch = batch
+
+        self.acc = None # sum of |X|^2 over the segments
+        self.n_seg = 0
+        self.tail = None # samples not yet used by a complete segment
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if self.tail is not None:
+            x = np.concatenate([self.tail, x], axis=-1)
+
+        n = x.shape[-1]
+        n_seg = 0 if n < self.nperseg else (n - self.nperseg) // self.step + 1
+
+        if n_seg:
+            segs = sliding_window_view(x, self.nperseg, axis=-1)[..., ::self.step, :][..., :n_seg, :]
+
+            if self.acc is None:
+                self.acc = np.zeros(x.shape[:-1] + (self.nperseg // 2 + 1,))
+
+            for X in _segment_ffts(segs, self.w, self.detrend, self.batch):
+                self.acc += np.sum(X.real**2 + X.imag**2, axis=-2)
+
+            self.n_seg += n_seg
+
+        # keep what the next segment will need
+        self.tail = x[..., n_seg * self.step:].copy()
+
+        return self
+
+    def result(self):
+        """
+        Returns:
+        f: frequency bins in Hz.
+        P: one-sided PSD (units^2/Hz), shape (nfreq,) or (channels, nfreq).
+        """
+        if self.n_seg == 0:
+            raise ValueError(f"Not enough samples for one segment of {self.nperseg}")
+
+        P = _one_sided(self.acc / (self.n_seg * self.fs * np.sum(self.w**2)), self.nperseg)
+
+        return np.fft.rfftfreq(self.nperseg, d=1/self.fs), P
+
+
+def welch(x, fs, nperseg=NPERSEG, overlap=OVERLAP, window="hann", detrend=True, batch=BATCH):
+    """
+    Welch PSD of x, shape (n,) or (channels, n): all channels are processed together.
+
+    nperseg is reduced to the signal length for short signals.
+    """
+    x = np.asarray(x)
+    nperseg = min(nperseg, x.shape[-1])
+
+    return WelchStream(fs, nperseg, overlap, window, detrend, batch).update(x).result()
+
+
+def welch_blocks(blocks, fs, nperseg=NPERSEG, overlap=OVERLAP, window="hann", detrend=True, batch=BATCH):
+    """
+    Welch PSD of a signal given as an iterable of blocks (e.g. the chunks of capture_io.iter_ila_csv).
+    Memory depends on the block size, not on the length of the signal.
+    """
+    ws = WelchStream(fs, nperseg, overlap, window, detrend, batch)
+    for block in blocks:
+        ws.update(block)
+
+    return ws.result()
+
+
+def cross_welch(x, y, fs, nperseg=NPERSEG, overlap=OVERLAP, window="hann", detrend=True, batch=BATCH):
+    """
+    Auto and cross spectral densities of x and y with Welch's method.
+    x and y have the same shape, (n,) or (..., n) to process many signal pairs together.
+
+    Returns:
+    f: frequency bins in Hz.
+    Pxx, Pyy: PSD of x and y.
+    Pxy: cross spectral density E[conj(X) Y].
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.shape != y.shape:
+        raise ValueError(f"x and y must have the same shape, got {x.shape} and {y.shape}")
+
+    nperseg = min(nperseg, x.shape[-1])
+    step = max(1, int(round(nperseg * (1 - overlap))))
+    w = get_window(window, nperseg)
+
+    segs_x = sliding_window_view(x, nperseg, axis=-1)[..., ::step, :]
+    segs_y = sliding_window_view(y, nperseg, axis=-1)[..., ::step, :]
+    n_seg = segs_x.shape[-2]
+
+    shape = x.shape[:-1] + (nperseg // 2 + 1,)
+    Pxx, Pyy = np.zeros(shape), np.zeros(shape)
+    Pxy = np.zeros(shape, dtype=complex)
+
+    for X, Y in zip(_segment_ffts(segs_x, w, detrend, batch), _segment_ffts(segs_y, w, detrend, batch)):
+        Pxx += np.sum(X.real**2 + X.imag**2, axis=-2)
+        Pyy += np.sum(Y.real**2 + Y.imag**2, axis=-2)
+        Pxy += np.sum(np.conj(X) * Y, axis=-2)
+
+    scale = 1 / (n_seg * fs * np.sum(w**2))
+    Pxx, Pyy, Pxy = (_one_sided(P * scale, nperseg) for P in (Pxx, Pyy, Pxy))
+
+    return np.fft.rfftfreq(nperseg, d=1/fs), Pxx, Pyy, Pxy
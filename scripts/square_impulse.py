@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import sounddevice as sd
+
+from stimulus import square_pulse, repeat, collect, play
+from reference_filter import convolve
 
 PLAY = False
 #PLAY = True
@@ -18,39 +20,27 @@ noise_std = 0.05      # standard deviation of Gaussian noise
 N_repetitions = 50
 
 
-# Build rectangular pulse input signal
-N = int(fs * duration) #number of samples in the signal
-
-x = np.zeros(N, dtype=float)
-x[int(pulse_start*fs):int(pulse_end*fs)] = amplitude
-
-
+def pulse():
+    # Rectangular pulse input signal (with random noise), generated block by block
+    return square_pulse(fs, duration, pulse_start, pulse_end, amplitude, noise_std if add_noise else 0.0)
 
-# Add random noise
-if add_noise:
-    x = x + np.random.normal(0.0, noise_std, size=N)
-
-# RIpeti il segnale più volte per poterlo vedere in ILA
-x_tot = np.tile(x, N_repetitions)
-
-# Build time axis
-N_tot = len(x)
-t = np.arange(N_tot) / fs
 
+N = int(fs * duration) #number of samples in the signal
 
 if PLAY:
 
-
-    sd.play(x_tot, fs)  # blocking=True aspetta la fine prima di ricominciare
-    sd.wait()
+    # RIpeti il segnale più volte per poterlo vedere in ILA (senza costruire le copie in memoria)
+    play(repeat(pulse, N_repetitions), fs, channels=1)
 
 
 else: #plot simulation results
 
+    x = collect(pulse()).astype(float)
+
     # 4-tap moving-average FIR 
     M = 4 #order of the filter
     h = np.ones(M) / float(M)
-    y = np.convolve(x, h, mode='full')
+    y = convolve(x, h, mode='full')
     print(y.shape)
     y = y[:N] #for plot reason discard the last few output samples
 
@@ -0,0 +1,331 @@
+import numpy as np
+
+# Stimulus generation for the pMod tests.
+# ToneBank renders any number of sinusoids straight into the output buffer of an audio callback:
+# the sin/cos tables of one block are computed once, then every block is a single matrix-vector
+# product, with no allocation in the callback.
+
+SIGNAL_FREQ = 1000.0 # main tone of play_sine.py (Hz)
+NOISE_FREQS = np.array([5500.0, 7500.0, 11000.0, 13000.0, 16000.0]) # "multi" HF noise tones (Hz)
+TONE10K_FREQ = 10000.0
+
+MAX_FRAMES = 4096 # largest block rendered in one piece
+
+
+class ToneBank:
+    """
+    Sum of sinusoids A_k sin(2 pi f_k n / fs + phi_k), rendered block by block with continuous phase.
+
+    sin(w n + phi) = sin(w n) cos(phi) + cos(w n) sin(phi): with the tables T = [sin(w_k n) | cos(w_k n)]
+    of one block, a block is T @ [A cos(phi); A sin(phi)]. Only the phases are updated between blocks.
+    """
+
+    def __init__(self, freqs, amps, fs, phases=None, max_frames=MAX_FRAMES):
+        freqs = np.asarray(freqs, dtype=np.float64)
+        self.k = len(freqs)
+        self.fs = fs
+        self.max_frames = max_frames
+
+        self.omega = 2*np.pi*freqs/fs # phase increment per sample
+        self.amps = np.zeros(self.k)
+        self.set_amplitudes(amps)
+        self.phases = np.zeros(self.k) if phases is None else np.array(phases, dtype=np.float64)
+
+        n = np.arange(max_frames)[:, None]
+        self.table = np.hstack([np.sin(self.omega * n), np.cos(self.omega * n)]) # (max_frames, 2k)
+
+        # preallocated work buffers
+        self.coef = np.empty(2 * self.k)
+        self.y = np.empty(max_frames)
+        self._tmp = np.empty(self.k)
+
+    def set_amplitudes(self, amps):
+        """
+        Change the amplitudes (e.g. to switch tones on and off) without touching the phases.
+        """
+        self.amps[:] = amps
+
+    def _render_piece(self, frames):
+        # coefficients [A cos(phi), A sin(phi)]
+        np.cos(self.phases, out=self._tmp)
+        np.multiply(self.amps, self._tmp, out=self.coef[:self.k])
+        np.sin(self.phases, out=self._tmp)
+        np.multiply(self.amps, self._tmp, out=self.coef[self.k:])
+
+        y = self.y[:frames]
+        np.dot(self.table[:frames], self.coef, out=y)
+
+        # phase advance: phi = (phi + w * frames) mod 2 pi
+        np.multiply(self.omega, frames, out=self._tmp)
+        self.phases += self._tmp
+        np.mod(self.phases, 2*np.pi, out=self.phases)
+
+        return y
+
+    def render(self, outdata, frames=None, add=False):
+        """
+        Write (or add, with add=True) the next frames samples into every channel of outdata,
+        shape (frames, channels) as in the sounddevice callbacks, or (frames,).
+        """
+        frames = len(outdata) if frames is None else frames
+        cols = outdata if outdata.ndim == 2 else outdata[:, None]
+
+        for start in range(0, frames, self.max_frames):
+            n = min(self.max_frames, frames - start)
+            y = self._render_piece(n)
+            block = cols[start:start + n]
+
+            for c in range(block.shape[1]):
+                if add:
+                    block[:, c] += y
+                else:
+                    block[:, c] = y
+
+        return outdata
+
+
+class WhiteNoise:
+    """
+    Gaussian white noise added in place to an output buffer (no allocation per block).
+    """
+
+    def __init__(self, std, max_frames=MAX_FRAMES, seed=None):
+        self.std = std
+        self.rng = np.random.default_rng(seed)
+        self.buf = np.empty(max_frames)
+        self.max_frames = max_frames
+
+    def render(self, outdata, frames=None, add=True):
+        frames = len(outdata) if frames is None else frames
+        cols = outdata if outdata.ndim == 2 else outdata[:, None]
+
+        for start in range(0, frames, self.max_frames):
+            n = min(self.max_frames, frames - start)
+            buf = self.buf[:n]
+            self.rng.standard_normal(out=buf)
+            buf *= self.std
+            block = cols[start:start + n]
+
+            for c in range(block.shape[1]):
+                if add:
+                    block[:, c] += buf
+                else:
+                    block[:, c] = buf
+
+        return outdata
+
+
+# ----------------------------------------------------------------------------------------------
+# Lazy signal sources: generators of float32 blocks, composed without building the whole signal.
+# Endless sources (duration=None) use constant memory; playback starts with the first block.
+
+BLOCK = 4096 # samples per block of the sources
+
+
+def _n_samples(duration, fs):
+    return None if duration is None else int(fs * duration)
+
+
+def _blocks(n, block):
+    """
+    (start, length) of the blocks covering n samples (forever if n is None).
+    """
+    start = 0
+    while n is None or start < n:
+        length = block if n is None else min(block, n - start)
+        yield start, length
+        start += length
+
+
+def tone(f, dur, fs, amp=0.2, fade=0.005, block=BLOCK):
+    """
+    Sine tone of dur seconds, with fade-in/out of fade seconds to avoid clicks (as in play_song.py).
+    """
+    n = int(fs * dur)
+    n_fade = int(fs * fade)
+    if n < 2 * n_fade:
+        n_fade = 0
+    ramp = np.linspace(0, 1, n_fade) if n_fade else None
+
+    for start, length in _blocks(n, block):
+        k = np.arange(start, start + length)
+        x = np.sin(2*np.pi*f*k/fs)
+
+        if n_fade:
+            head = k < n_fade
+            x[head] *= ramp[k[head]]
+            tail = k >= n - n_fade
+            x[tail] *= ramp[::-1][k[tail] - (n - n_fade)]
+
+        yield (amp * x).astype(np.float32)
+
+
+def silence(dur, fs, block=BLOCK):
+    for _, length in _blocks(int(fs * dur), block):
+        yield np.zeros(length, dtype=np.float32)
+
+
+def melody(notes, fs, amp=0.2, gap=0.02, block=BLOCK):
+    """
+    Sequence of (frequency, duration) notes, each followed by gap seconds of silence.
+    """
+    for f, d in notes:
+        yield from tone(f, d, fs, amp, block=block)
+        yield from silence(gap, fs, block)
+
+
+def square_pulse(fs, duration, pulse_start, pulse_end, amplitude=1.0, noise_std=0.0, seed=None, block=BLOCK):
+    """
+    Rectangular pulse between pulse_start and pulse_end (seconds), optionally with Gaussian noise
+    (as in square_impulse.py).
+    """
+    rng = np.random.default_rng(seed)
+    i0, i1 = int(pulse_start * fs), int(pulse_end * fs)
+
+    for start, length in _blocks(int(fs * duration), block):
+        k = np.arange(start, start + length)
+        x = np.where((k >= i0) & (k < i1), amplitude, 0.0)
+        if noise_std:
+            x = x + rng.normal(0.0, noise_std, size=length)
+
+        yield x.astype(np.float32)
+
+
+def white_noise(std, fs, duration=None, seed=None, block=BLOCK):
+    """
+    Gaussian white noise, endless if duration is None.
+    """
+    rng = np.random.default_rng(seed)
+    for _, length in _blocks(_n_samples(duration, fs), block):
+        yield rng.standard_normal(length, dtype=np.float32) * np.float32(std)
+
+
+def multitone(freqs, amps, fs, phases=None, duration=None, block=BLOCK):
+    """
+    Sum of sinusoids (e.g. the HF noise of play_song_wnoise.py), endless if duration is None.
+    """
+    bank = ToneBank(freqs, amps, fs, phases=phases, max_frames=block)
+    buf = np.empty(block)
+
+    for _, length in _blocks(_n_samples(duration, fs), block):
+        bank.render(buf[:length], length)
+        yield buf[:length].astype(np.float32)
+
+
+def rechunk(source, block=BLOCK):
+    """
+    Regroup the samples of a source in blocks of exactly block samples (the last one may be shorter).
+    """
+    pending, n_pending = [], 0
+    for x in source:
+        pending.append(x)
+        n_pending += len(x)
+
+        if n_pending >= block:
+            buf = np.concatenate(pending)
+            n_full = len(buf) // block * block
+            for i in range(0, n_full, block):
+                yield buf[i:i + block]
+            pending, n_pending = [buf[n_full:]], len(buf) - n_full
+
+    if n_pending:
+        yield np.concatenate(pending)
+
+
+def mix(*sources, block=BLOCK):
+    """
+    Sum of sources. The first source sets the length: the others may be endless, or are padded
+    with zeros if shorter.
+    """
+    first, *others = [rechunk(s, block) for s in sources]
+
+    for x in first:
+        out = x.copy()
+        for s in others:
+            y = next(s, None)
+            if y is not None:
+                n = min(len(y), len(out))
+                out[:n] += y[:n]
+        yield out
+
+
+def gain(source, g):
+    for x in source:
+        yield x * np.float32(g)
+
+
+def normalize(source, peak=0.99, bound=None):
+    """
+    Keep the signal below peak without reading it all first.
+
+    With a known bound of |x| (e.g. the sum of the amplitudes) a single gain min(1, peak/bound)
+    is applied. Otherwise the gain follows the running maximum and never increases (soft limiter).
+    """
+    if bound is not None:
+        yield from gain(source, min(1.0, peak / bound))
+        return
+
+    g = 1.0
+    for x in source:
+        m = float(np.max(np.abs(x))) if len(x) else 0.0
+        if m * g > peak:
+            g = peak / m
+        yield x * np.float32(g)
+
+
+def repeat(factory, times=None):
+    """
+    Play the source built by factory() times times (forever if None). factory is called again
+    at every repetition, since a generator can be consumed only once.
+    """
+    i = 0
+    while times is None or i < times:
+        yield from factory()
+        i += 1
+
+
+def take(source, n):
+    """
+    First n samples of a source.
+    """
+    for x in source:
+        if n <= 0:
+            return
+        yield x[:n]
+        n -= len(x)
+
+
+def collect(source):
+    """
+    Whole signal of a finite source as one float32 array (for plots and offline analysis).
+    """
+    blocks = list(source)
+
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def play(source, fs, channels=2, block=BLOCK):
+    """
+    Stream a source to the sound card (same signal on every channel) until it ends or Ctrl+C.
+    """
+    import threading
+    import sounddevice as sd
+
+    blocks = rechunk(source, block)
+    done = threading.Event()
+
+    def callback(outdata, frames, time_info, status):
+        x = next(blocks, None)
+        if x is None:
+            outdata.fill(0)
+            raise sd.CallbackStop
+
+        outdata[:len(x)] = x[:, None]
+        outdata[len(x):] = 0
+        if len(x) < frames:
+            raise sd.CallbackStop
+
+    with sd.OutputStream(samplerate=fs, channels=channels, blocksize=block, dtype="float32",
+                         callback=callback, finished_callback=done.set):
+        while not done.wait(0.1): # short waits: a wait without timeout ignores Ctrl+C on Windows
+            pass
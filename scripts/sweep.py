@@ -0,0 +1,389 @@
+#########
+# Design-space sweep of the fixed-point FIR datapath: a grid of fir_MA generics (DATA_W, COEFF_W,
+# ACC_W, N_TAPS) and coefficient families is evaluated with the bit-exact model on a stimulus corpus
+# (the signal set of vectors.py). The corpus is generated once and shared with the worker processes
+# through shared memory; designs that differ only by ACC_W share one accumulator computation.
+# Results go to a SQLite database, one row per (design, signal): a sweep can be interrupted and
+# resumed (designs already stored are skipped), and queried afterwards.
+#
+# Usage (from the scripts folder):
+#   python sweep.py run --families ma sinc --n-taps 2:64 --data-w 16 20 24 --coeff-w 8:16 --acc-w 30:44:2
+#   python sweep.py query "SELECT * FROM designs WHERE overflow = 0 ORDER BY min_q_snr_db DESC LIMIT 10"
+##################
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from capture_io import WS_frequency
+from fir_model import FIR_MA_LATENCY, FRAC, fir_accumulator, ma_coeff, saturate_signed, signed_bits, wrap_signed
+from reference_filter import fir_filter
+from sine_metrics import sine_metrics
+from spectrum import welch
+from stimulus import NOISE_FREQS, SIGNAL_FREQ, TONE10K_FREQ
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DB_PATH = os.path.join(REPO_DIR, "sweep.db")
+
+PASS_BAND = (100.0, 2000.0) # band (Hz) of the pass gain
+STOP_MIN = 5000.0 # lower edge (Hz) of the stop gain (the HF noise of the stimuli)
+NPERSEG = 1024 # Welch segment of the band gains
+SINC_CUTOFF = 3500.0 # cutoff (Hz) of the "sinc" family
+
+# interfering tones of the stimuli with a SIGNAL_FREQ fundamental (SNR and tone attenuation)
+SIGNAL_TONES = {
+    "sine": [],
+    "sine_tone10k": [TONE10K_FREQ],
+    "sine_multi": list(NOISE_FREQS),
+    "sine_white": [],
+}
+
+METRICS = ("coeff_wraps", "samples", "acc_bits", "overflow", "saturated", "q_snr_db", "pass_gain_db", "stop_gain_db",
+           "snr_db", "tone_atten_db")
+KEY = ("corpus", "family", "n_taps", "data_w", "coeff_w", "acc_w", "signal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    corpus TEXT, family TEXT, n_taps INTEGER, data_w INTEGER, coeff_w INTEGER, acc_w INTEGER, signal TEXT,
+    coeff TEXT, coeff_wraps INTEGER,
+    samples INTEGER, acc_bits INTEGER, overflow INTEGER, saturated INTEGER,
+    q_snr_db REAL, pass_gain_db REAL, stop_gain_db REAL, snr_db REAL, tone_atten_db REAL,
+    PRIMARY KEY (corpus, family, n_taps, data_w, coeff_w, acc_w, signal)
+);
+CREATE INDEX IF NOT EXISTS results_design ON results (family, n_taps, data_w, coeff_w, acc_w);
+CREATE INDEX IF NOT EXISTS results_signal ON results (signal, stop_gain_db);
+CREATE VIEW IF NOT EXISTS designs AS
+    SELECT corpus, family, n_taps, data_w, coeff_w, acc_w, coeff,
+           MAX(coeff_wraps) AS coeff_wraps, COUNT(*) AS signals, MAX(acc_bits) AS acc_bits, SUM(overflow) AS overflow, SUM(saturated) AS saturated,
+           MIN(q_snr_db) AS min_q_snr_db, AVG(pass_gain_db) AS pass_gain_db, AVG(stop_gain_db) AS stop_gain_db,
+           MIN(snr_db) AS min_snr_db, AVG(tone_atten_db) AS tone_atten_db
+    FROM results GROUP BY corpus, family, n_taps, data_w, coeff_w, acc_w;
+"""
+
+
+# ----------------------------------------------------------------------------------------------
+# Coefficient families: name -> (float design h, intended integer coefficients in Q0.FRAC)
+
+def _ma(n_taps, coeff_w, frac):
+    # as fir_MA: COEFF_VALUE = 2**FRAC / N_TAPS (integer division) on every tap
+    return np.full(n_taps, 1 / n_taps), ma_coeff(n_taps, coeff_w=64, frac=frac)
+
+
+def _fixed(h):
+    h = np.asarray(h, dtype=np.float64)
+    return lambda n_taps, coeff_w, frac: (h, np.rint(h * 2**frac).astype(np.int64))
+
+
+def _sinc(n_taps, coeff_w, frac):
+    from coeff_design import design_matrix, quantize
+    h = design_matrix([n_taps], SINC_CUTOFF, WS_frequency, "sinc")[0]
+    q, _ = quantize(h[None, :], coeff_w=64, frac=frac)
+    return h, q[0]
+
+
+FAMILIES = {
+    "ma": _ma,
+    "1221": _fixed(np.array([1, 2, 2, 1]) / 6),
+    "big": _fixed(np.array([-10, 110, 127, -20]) / 207), # C0..C3 of fir_filter_4_24bit.vhd (commented block)
+    "sinc": _sinc,
+}
+FIXED_TAPS = {"1221": 4, "big": 4} # families with a fixed tap count (N_TAPS of the grid ignored)
+
+
+def parse_range(values):
+    """
+    Grid values from the command line: integers, or ranges "a:b" / "a:b:step" (b included).
+    """
+    out = []
+    for v in values:
+        parts = [int(p) for p in str(v).split(":")]
+        if len(parts) == 1:
+            out.append(parts[0])
+        else:
+            out.extend(range(parts[0], parts[1] + 1, parts[2] if len(parts) > 2 else 1))
+
+    return sorted(set(out))
+
+
+def design_groups(families, n_taps, data_w, coeff_w, acc_w):
+    """
+    Designs of the grid, grouped by everything but ACC_W: list of
+    (family, n_taps, data_w, coeff_w, [acc_w...]). Fixed-size families appear once per width.
+    """
+    groups = {}
+    for fam in families:
+        if fam not in FAMILIES:
+            raise ValueError(f"Unknown family '{fam}', expected one of {list(FAMILIES)}")
+        for n in ([FIXED_TAPS[fam]] if fam in FIXED_TAPS else n_taps):
+            for d in data_w:
+                for c in coeff_w:
+                    groups[(fam, n, d, c)] = list(acc_w)
+
+    return [(*k, v) for k, v in groups.items()]
+
+
+# ----------------------------------------------------------------------------------------------
+# Corpus in shared memory
+
+def corpus_key(duration, amp, seed, fs):
+    return f"{duration:g}s/amp{amp:g}/seed{seed}/fs{fs:g}"
+
+
+def make_corpus(signals, duration, amp, seed, fs):
+    """
+    Float32 stimuli of vectors.SIGNALS, one row per signal (cut to the shortest).
+    """
+    from stimulus import collect
+    from vectors import SIGNALS
+
+    rows = [collect(SIGNALS[s](fs, duration, amp, seed)) for s in signals]
+    n = min(len(r) for r in rows)
+
+    return np.stack([r[:n] for r in rows]).astype(np.float32)
+
+
+_corpus = None # (shared memory, array) attached by every worker
+_signals = None
+
+
+def _attach(name, shape, signals):
+    global _corpus, _signals
+    shm = shared_memory.SharedMemory(name=name)
+    _corpus = (shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+    _signals = signals
+
+
+# ----------------------------------------------------------------------------------------------
+# Evaluation (worker side)
+
+def _band_gain(P_in, P_out, mask):
+    return float(10*np.log10(max(P_out[mask].sum(), 1e-30) / max(P_in[mask].sum(), 1e-30)))
+
+
+def evaluate_group(family, n_taps, data_w, coeff_w, acc_ws, fs=WS_frequency, frac=FRAC, corpus=None, signals=None):
+    """
+    Metrics of the designs (family, n_taps, data_w, coeff_w, acc_w) for every acc_w of acc_ws on
+    every signal of the corpus (default: the shared corpus of the worker).
+
+    Returns (coeff, rows): rows are dicts with acc_w, signal and METRICS.
+      coeff_wraps: 1 if some intended coefficient does not fit in COEFF_W bits (and wraps);
+      q_snr_db: output vs the float filter with the designed (unquantized) coefficients, same input;
+      pass_gain_db / stop_gain_db: output/input power in PASS_BAND / above STOP_MIN (Welch);
+      snr_db, tone_atten_db: sine_metrics of the output (signals of SIGNAL_TONES only, else None).
+    """
+    if corpus is None:
+        corpus, signals = _corpus[1], _signals
+
+    h, q = FAMILIES[family](n_taps, coeff_w, frac)
+    wraps = int(np.any(wrap_signed(q, coeff_w) != q)) # the hardware keeps only COEFF_W bits
+    lim = (1 << (data_w - 1)) - 1
+    rows = []
+
+    for s, x in zip(signals, corpus):
+        xq = np.clip(np.rint(x.astype(np.float64) * lim), -lim - 1, lim).astype(np.int64) # vectors.to_fixed
+        acc = fir_accumulator(xq, q, data_w, coeff_w, FIR_MA_LATENCY)
+        bits = signed_bits(acc)
+        acc_bits = int(bits.max())
+
+        ref = np.concatenate([np.zeros(FIR_MA_LATENCY), fir_filter(xq, h)])[:len(xq)]
+        p_ref = float(np.sum(ref**2))
+
+        # ACC_W at least acc_bits gives the same output: evaluate every distinct output once
+        outs, n_sat = {}, {}
+        for a in acc_ws:
+            k = min(a, acc_bits)
+            if k not in outs:
+                scaled = wrap_signed(acc, k) >> frac
+                outs[k] = saturate_signed(scaled, data_w)
+                n_sat[k] = int(np.count_nonzero(outs[k] != scaled))
+        keys = sorted(outs)
+
+        f, P = welch(np.stack([xq] + [outs[k] for k in keys]), fs, nperseg=NPERSEG)
+        in_pass = (f >= PASS_BAND[0]) & (f <= PASS_BAND[1])
+        in_stop = f >= STOP_MIN
+
+        sm = None
+        if s in SIGNAL_TONES:
+            sm = sine_metrics(np.stack([xq] + [outs[k] for k in keys]), fs, SIGNAL_FREQ, SIGNAL_TONES[s], refine=False)
+
+        per_key = {}
+        for i, k in enumerate(keys):
+            y = outs[k]
+            m = {
+                "coeff_wraps": wraps,
+                "samples": len(y),
+                "acc_bits": acc_bits,
+                "saturated": n_sat[k],
+                "q_snr_db": float(10*np.log10(max(p_ref, 1e-30) / max(float(np.sum((y - ref)**2)), 1e-30))),
+                "pass_gain_db": _band_gain(P[0], P[i + 1], in_pass),
+                "stop_gain_db": _band_gain(P[0], P[i + 1], in_stop),
+                "snr_db": None,
+                "tone_atten_db": None,
+            }
+            if sm is not None:
+                m["snr_db"] = float(sm["snr_db"][i + 1])
+                if len(SIGNAL_TONES[s]):
+                    ratio = np.maximum(sm["tone_amps"][i + 1][1:], 1e-30) / np.maximum(sm["tone_amps"][0][1:], 1e-30)
+                    m["tone_atten_db"] = float(np.mean(-20*np.log10(ratio)))
+            per_key[k] = m
+
+        for a in acc_ws:
+            m = dict(per_key[min(a, acc_bits)])
+            m["overflow"] = int(np.count_nonzero(bits > a))
+            rows.append({"acc_w": a, "signal": s, **m})
+
+    return [int(c) for c in q], rows
+
+
+def _task(group, fs, frac):
+    t0 = time.perf_counter()
+    coeff, rows = evaluate_group(*group, fs=fs, frac=frac)
+
+    return group, coeff, rows, time.perf_counter() - t0
+
+
+# ----------------------------------------------------------------------------------------------
+# Database
+
+def connect(path=DB_PATH):
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(SCHEMA)
+
+    return con
+
+
+def done_designs(con, corpus, signals):
+    """
+    Designs already complete (a row for every one of the given signals) for a corpus: set of
+    (family, n_taps, data_w, coeff_w, acc_w).
+    """
+    signals = sorted(set(signals))
+    cur = con.execute("SELECT family, n_taps, data_w, coeff_w, acc_w FROM results WHERE corpus = ? "
+                      f"AND signal IN ({', '.join('?' * len(signals))}) "
+                      "GROUP BY family, n_taps, data_w, coeff_w, acc_w HAVING COUNT(DISTINCT signal) >= ?",
+                      (corpus, *signals, len(signals)))
+
+    return set(cur.fetchall())
+
+
+def _store(con, corpus, group, coeff, rows):
+    family, n_taps, data_w, coeff_w, _ = group
+    con.executemany(
+        f"INSERT OR REPLACE INTO results ({', '.join(KEY)}, coeff, {', '.join(METRICS)}) "
+        f"VALUES ({', '.join('?' * (len(KEY) + 1 + len(METRICS)))})",
+        [(corpus, family, n_taps, data_w, coeff_w, r["acc_w"], r["signal"], json.dumps(coeff),
+          *(r[m] for m in METRICS)) for r in rows])
+
+
+def run_sweep(groups, db=DB_PATH, signals=None, duration=1.0, amp=0.9, seed=0, fs=WS_frequency, frac=FRAC,
+              jobs=None, commit_every=50, log=print):
+    """
+    Evaluate the design groups (see design_groups) on the corpus, in parallel, skipping the
+    designs already stored in db for the same corpus. Returns the number of designs evaluated.
+    """
+    from vectors import SIGNALS
+
+    signals = list(signals or SIGNALS)
+    corpus = corpus_key(duration, amp, seed, fs)
+    con = connect(db)
+
+    done = done_designs(con, corpus, signals)
+    todo = []
+    for fam, n, d, c, accs in groups:
+        missing = [a for a in accs if (fam, n, d, c, a) not in done]
+        if missing:
+            todo.append((fam, n, d, c, missing))
+    n_designs = sum(len(g[4]) for g in todo)
+    log(f"{n_designs} designs to evaluate ({sum(len(g[4]) for g in groups) - n_designs} already in {db})")
+    if not todo:
+        return 0
+
+    data = make_corpus(signals, duration, amp, seed, fs)
+    shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    try:
+        shape = data.shape # not derived from shm.size: it is rounded up to whole pages on some platforms
+        np.ndarray(shape, dtype=np.float32, buffer=shm.buf)[:] = data
+        del data
+
+        t0 = time.perf_counter()
+        n_done = 0
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_attach,
+                                 initargs=(shm.name, shape, signals)) as pool:
+            futures = [pool.submit(_task, g, fs, frac) for g in todo]
+            for i, fut in enumerate(as_completed(futures), 1):
+                group, coeff, rows, _ = fut.result()
+                _store(con, corpus, group, coeff, rows)
+                n_done += len(group[4])
+                if i % commit_every == 0 or i == len(futures):
+                    con.commit()
+                    elapsed = time.perf_counter() - t0
+                    log(f"{n_done}/{n_designs} designs, {elapsed:.0f} s, {n_done / elapsed:.1f} designs/s")
+    finally:
+        con.commit()
+        con.close()
+        shm.close()
+        shm.unlink()
+
+    return n_designs
+
+
+def query(sql, db=DB_PATH, params=()):
+    """
+    Run a query on the results database. Returns (column names, rows).
+    """
+    con = connect(db)
+    try:
+        cur = con.execute(sql, params)
+        return [d[0] for d in cur.description or []], cur.fetchall()
+    finally:
+        con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel design-space sweep of the fixed-point FIR datapath.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="evaluate a grid of designs (resumable)")
+    p.add_argument("--db", default=DB_PATH)
+    p.add_argument("--families", nargs="+", default=["ma"], help=f"subset of {list(FAMILIES)}")
+    p.add_argument("--n-taps", nargs="+", default=["4", "10", "20"], help="values or ranges a:b[:step]")
+    p.add_argument("--data-w", nargs="+", default=["24"])
+    p.add_argument("--coeff-w", nargs="+", default=["12"])
+    p.add_argument("--acc-w", nargs="+", default=["44"])
+    p.add_argument("--signals", nargs="+", default=None)
+    p.add_argument("--duration", type=float, default=1.0, help="seconds of every stimulus")
+    p.add_argument("--amp", type=float, default=0.9, help="stimulus amplitude relative to full scale")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--fs", type=float, default=WS_frequency)
+    p.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+
+    p = sub.add_parser("query", help="run an SQL query (tables: results, view designs)")
+    p.add_argument("sql")
+    p.add_argument("--db", default=DB_PATH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        groups = design_groups(args.families, parse_range(args.n_taps), parse_range(args.data_w),
+                               parse_range(args.coeff_w), parse_range(args.acc_w))
+        run_sweep(groups, args.db, args.signals, args.duration, args.amp, args.seed, args.fs, jobs=args.jobs)
+        return 0
+
+    columns, rows = query(args.sql, args.db)
+    print(",".join(columns))
+    for r in rows:
+        print(",".join("" if v is None else f"{v:.4g}" if isinstance(v, float) else str(v) for v in r))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+# shared modules live in the parent "scripts" folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fir_model import FRAC
+from sweep import FAMILIES
+
+VHDL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "i2s_pMod_HowToUse_2.srcs", "sources_1",
+                    "new", "fir_filter_4_24bit.vhd")
+
+
+def vhdl_filters(path=VHDL):
+    """
+    Coefficient blocks of fir_filter_4_24bit.vhd (active or commented out), by the label of their
+    "-- FILTRO <label>" header: {"[1,2,2,1]/6": [683, 1365, 1365, 683], ...}.
+    """
+    filters, label, consts = {}, None, {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = re.search(r"--\s*FILTRO\s+(\S+)", line)
+            if m:
+                label, consts = m.group(1), {}
+                filters[label] = consts
+                continue
+
+            m = re.search(r"constant\s+(C\d)\s*:.*:=\s*(?:to_signed\(\s*(-?\d+)|(C\d))", line)
+            if m and label is not None:
+                name, value, alias = m.groups()
+                consts[name] = int(value) if value is not None else consts[alias]
+
+    return {k: [c[f"C{i}"] for i in range(len(c))] for k, c in filters.items() if c}
+
+
+@pytest.mark.parametrize("family, label", [("ma", "[1,1,1,1]/4"), ("1221", "[1,2,2,1]/6"),
+                                           ("big", "[-10,110,127,-20]/207")])
+def test_sweep_families_match_vhdl(family, label):
+    _, q = FAMILIES[family](4, 12, FRAC)
+
+    assert q.tolist() == vhdl_filters()[label]
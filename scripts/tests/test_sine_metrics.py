@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# shared modules live in the parent "scripts" folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sine_metrics import sine_metrics
+from stimulus import NOISE_FREQS, SIGNAL_FREQ
+
+FS = 48820.0
+
+
+@pytest.mark.parametrize("noise, harmonic, tones", [
+    (1e-3, 0.0, 0.0),
+    (1e-4, 1e-2, 0.0),
+    (1e-3, 1e-3, 0.1),
+    (0.0, 0.0, 0.0),
+])
+def test_sinad_below_snr_and_thd(noise, harmonic, tones):
+    # noise + distortion is the sum of the noise and distortion powers, so SINAD <= min(SNR, -THD)
+    rng = np.random.default_rng(0)
+    t = np.arange(6 * 4096) / FS
+    x = np.sin(2*np.pi*SIGNAL_FREQ*t) + harmonic * np.sin(2*np.pi*3*SIGNAL_FREQ*t)
+    x = x + tones * np.sin(2*np.pi*NOISE_FREQS[:, None]*t).sum(axis=0) + noise * rng.standard_normal(len(t))
+    x = np.stack([x, 0.5 * x, np.zeros_like(x)])
+
+    m = sine_metrics(x, FS)
+
+    assert np.all(m["sinad_db"] <= np.minimum(m["snr_db"], -m["thd_db"]) + 1e-9)
@@ -0,0 +1,278 @@
+#########
+# Stimulus vector files for the VHDL testbenches (sim_vectors/new/fir_vectors_tb.vhd).
+# A stimulus of the play scripts' signal set (or any array) is quantized to DATA_W-bit signed
+# words and written as hex (or binary) text, one word per line, split into shards that can be
+# simulated by separate simulator processes. Every shard starts with a few samples of the previous
+# one, so the filter state is warm when its own samples begin; merge() drops them and joins the
+# shard logs into one CSV with the columns of the simulation logs (sample,in_l_24,out_l_24).
+#
+# Usage (from the scripts folder):
+#   python vectors.py export sine_multi --duration 60 --shard 1000000
+#   python vectors.py run ../log_simulations/vectors/sine_multi.json --cmd "xsim_run.sh {vectors} {log}" --jobs 4
+#   python vectors.py merge ../log_simulations/vectors/sine_multi.json
+##################
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from capture_io import WS_frequency
+from stimulus import (NOISE_FREQS, SIGNAL_FREQ, TONE10K_FREQ, collect, mix, multitone, normalize,
+                      square_pulse, white_noise)
+
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "log_simulations", "vectors")
+
+SHARD_SAMPLES = 1_000_000
+OVERLAP = 8 # warm-up samples of every shard besides the filter taps (pipeline and logging delay)
+A_NOISE = 0.3 # total noise amplitude, as in play_sine.py
+LOG_HEADER = "sample,in_l_24,out_l_24" # columns written by fir_vectors_tb.vhd
+
+
+def _sine(fs, duration, amp, seed):
+    return multitone([SIGNAL_FREQ], [amp], fs, duration=duration)
+
+
+def _sine_tone10k(fs, duration, amp, seed):
+    return normalize(multitone([SIGNAL_FREQ, TONE10K_FREQ], [amp, A_NOISE], fs, duration=duration),
+                     bound=amp + A_NOISE)
+
+
+def _sine_multi(fs, duration, amp, seed):
+    phases = np.random.default_rng(seed).uniform(0, 2*np.pi, size=NOISE_FREQS.size)
+    freqs = np.concatenate([[SIGNAL_FREQ], NOISE_FREQS])
+    amps = np.concatenate([[amp], np.full(NOISE_FREQS.size, A_NOISE / NOISE_FREQS.size)])
+    phases = np.concatenate([[0.0], phases])
+
+    return normalize(multitone(freqs, amps, fs, phases=phases, duration=duration), bound=amp + A_NOISE)
+
+
+def _sine_white(fs, duration, amp, seed):
+    return normalize(mix(multitone([SIGNAL_FREQ], [amp], fs, duration=duration),
+                         white_noise(A_NOISE, fs, seed=seed)))
+
+
+def _white(fs, duration, amp, seed):
+    return normalize(white_noise(amp / 4, fs, duration=duration, seed=seed))
+
+
+def _square(fs, duration, amp, seed):
+    return normalize(square_pulse(fs, duration, duration / 3, 2 * duration / 3, amp, noise_std=0.05, seed=seed))
+
+
+# signal set of the play scripts: name -> factory(fs, duration, amp, seed) of a stimulus source
+SIGNALS = {
+    "sine": _sine,
+    "sine_tone10k": _sine_tone10k,
+    "sine_multi": _sine_multi,
+    "sine_white": _sine_white,
+    "white": _white,
+    "square": _square,
+}
+
+
+def to_fixed(x, data_w=24):
+    """
+    Quantize x in [-1, 1) to data_w-bit signed integers, as real_to_s24 in sinusoidal_tb.vhd
+    (round(x * (2**(data_w-1) - 1)), clamped to the signed range).
+    """
+    lim = (1 << (data_w - 1)) - 1
+    q = np.rint(np.asarray(x, dtype=np.float64) * lim)
+
+    return np.clip(q, -lim - 1, lim).astype(np.int64)
+
+
+def format_words(words, data_w=24, fmt="hex"):
+    """
+    Text lines of the vector file (bytes): two's complement words, hex digits (ceil(data_w/4),
+    read with hread) or data_w binary digits (read with read), MSB first.
+    """
+    words = np.asarray(words, dtype=np.int64) & ((1 << data_w) - 1)
+
+    if fmt == "hex":
+        n_dig = -(-data_w // 4)
+        shifts = 4 * np.arange(n_dig - 1, -1, -1)
+        digits = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)[(words[:, None] >> shifts) & 0xF]
+    elif fmt == "bin":
+        shifts = np.arange(data_w - 1, -1, -1)
+        digits = (((words[:, None] >> shifts) & 1) + ord("0")).astype(np.uint8)
+    else:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+    lines = np.empty((len(words), digits.shape[1] + 1), dtype=np.uint8)
+    lines[:, :-1] = digits
+    lines[:, -1] = ord("\n")
+
+    return lines.tobytes()
+
+
+def read_vectors(path, data_w=24, fmt="hex"):
+    """
+    Words of a vector file, as signed integers.
+    """
+    with open(path) as f:
+        values = np.array([int(line, 16 if fmt == "hex" else 2) for line in f if line.strip()], dtype=np.int64)
+    sign = np.int64(1) << (data_w - 1)
+
+    return (values ^ sign) - sign
+
+
+def export(x, name, out_dir=OUT_DIR, data_w=24, fmt="hex", shard_samples=SHARD_SAMPLES, n_taps=20,
+           overlap=None, meta=None):
+    """
+    Write the vector shards of the integer samples x and their manifest <out_dir>/<name>.json.
+
+    Shard k holds the samples [first - overlap, first + n): the leading samples (overlap, default
+    n_taps + OVERLAP, fewer for the first shard) only warm up the filter and are dropped by merge().
+
+    Returns the manifest (dict).
+    """
+    x = np.asarray(x, dtype=np.int64)
+    overlap = n_taps + OVERLAP if overlap is None else overlap
+    os.makedirs(out_dir, exist_ok=True)
+    ext = "hex" if fmt == "hex" else "bin"
+
+    shards = []
+    for k, first in enumerate(range(0, len(x), shard_samples)):
+        n = min(shard_samples, len(x) - first)
+        ov = min(overlap, first)
+        vectors = f"{name}_{k:04d}.{ext}"
+
+        with open(os.path.join(out_dir, vectors), "wb") as f:
+            f.write(format_words(x[first - ov:first + n], data_w, fmt))
+
+        shards.append({"index": k, "vectors": vectors, "log": f"{name}_{k:04d}_out.csv",
+                       "first": first, "n": n, "overlap": ov})
+
+    manifest = {"name": name, "data_w": data_w, "format": fmt, "n_samples": len(x), "n_taps": n_taps,
+                "shards": shards, **(meta or {})}
+    with open(os.path.join(out_dir, f"{name}.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    return manifest
+
+
+def export_signal(signal, duration, fs=WS_frequency, amp=0.5, seed=0, name=None, **kwargs):
+    """
+    Export a stimulus of SIGNALS (duration in seconds, amplitude relative to full scale).
+    """
+    if signal not in SIGNALS:
+        raise ValueError(f"Unknown signal '{signal}', expected one of {list(SIGNALS)}")
+
+    data_w = kwargs.get("data_w", 24)
+    x = to_fixed(collect(SIGNALS[signal](fs, duration, amp, seed)), data_w)
+    meta = {"signal": signal, "fs": fs, "duration": duration, "amp": amp, "seed": seed}
+
+    return export(x, name or signal, meta=meta, **kwargs)
+
+
+def _load_manifest(path):
+    with open(path) as f:
+        return json.load(f), os.path.dirname(os.path.abspath(path))
+
+
+def run(manifest_path, cmd, jobs=os.cpu_count()):
+    """
+    Simulate every shard with a user command, jobs at a time. cmd is a template with the fields
+    {vectors}, {log} (absolute paths), {index}, {first}, {n} and {n_taps}.
+
+    Returns the list of shards whose command failed.
+    """
+    manifest, base = _load_manifest(manifest_path)
+
+    def one(shard):
+        fields = {**shard, "vectors": os.path.join(base, shard["vectors"]),
+                  "log": os.path.join(base, shard["log"]), "n_taps": manifest["n_taps"]}
+        return shard, subprocess.run(cmd.format(**fields), shell=True).returncode
+
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        return [shard for shard, rc in ex.map(one, manifest["shards"]) if rc != 0]
+
+
+def merge(manifest_path, output=None):
+    """
+    Join the shard logs of a manifest into <name>_merged.csv (or output): the warm-up rows of every
+    shard are dropped and the sample column becomes the index in the whole stimulus.
+    The input column of every shard is checked against its vector file (wrong or stale logs).
+
+    Returns the path of the merged CSV.
+    """
+    manifest, base = _load_manifest(manifest_path)
+    output = output or os.path.join(base, f"{manifest['name']}_merged.csv")
+
+    with open(output, "w") as out:
+        out.write(LOG_HEADER + "\n")
+
+        for shard in manifest["shards"]:
+            log = os.path.join(base, shard["log"])
+            if not os.path.exists(log):
+                raise FileNotFoundError(f"Missing log of shard {shard['index']}: {log}")
+
+            rows = np.loadtxt(log, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
+            ov, n = shard["overlap"], shard["n"]
+            if len(rows) < ov + n:
+                raise ValueError(f"Shard {shard['index']}: {len(rows)} rows logged, {ov + n} expected")
+
+            expected = read_vectors(os.path.join(base, shard["vectors"]), manifest["data_w"], manifest["format"])
+            if not np.array_equal(rows[:ov + n, 1], expected):
+                raise ValueError(f"Shard {shard['index']}: logged inputs differ from {shard['vectors']}")
+
+            rows = rows[ov:ov + n]
+            rows[:, 0] = shard["first"] + np.arange(n)
+            np.savetxt(out, rows, fmt="%d", delimiter=",")
+
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stimulus vector files for the VHDL testbenches.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="export a stimulus of the signal set")
+    p.add_argument("signal", choices=list(SIGNALS))
+    p.add_argument("--duration", type=float, default=1.0, help="seconds")
+    p.add_argument("--fs", type=float, default=WS_frequency)
+    p.add_argument("--amp", type=float, default=0.5, help="amplitude relative to full scale")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--name", default=None)
+    p.add_argument("--out", default=OUT_DIR)
+    p.add_argument("--format", choices=("hex", "bin"), default="hex")
+    p.add_argument("--data-w", type=int, default=24)
+    p.add_argument("--shard", type=int, default=SHARD_SAMPLES, help="samples per shard")
+    p.add_argument("--n-taps", type=int, default=20, help="filter taps (sizes the warm-up of the shards)")
+
+    p = sub.add_parser("run", help="simulate every shard with a command, then merge")
+    p.add_argument("manifest")
+    p.add_argument("--cmd", required=True, help="template with {vectors} {log} {index} {first} {n} {n_taps}")
+    p.add_argument("--jobs", type=int, default=os.cpu_count())
+
+    p = sub.add_parser("merge", help="merge the shard logs")
+    p.add_argument("manifest")
+    p.add_argument("--output", default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        m = export_signal(args.signal, args.duration, args.fs, args.amp, args.seed, args.name, out_dir=args.out,
+                          data_w=args.data_w, fmt=args.format, shard_samples=args.shard, n_taps=args.n_taps)
+        print(f"Written {len(m['shards'])} shards, {m['n_samples']} samples, manifest "
+              f"{os.path.join(args.out, m['name'] + '.json')}")
+        return 0
+
+    if args.command == "run":
+        failed = run(args.manifest, args.cmd, args.jobs)
+        if failed:
+            print(f"ERROR: shards {[s['index'] for s in failed]} failed")
+            return 1
+
+    print(f"Merged log written to {merge(args.manifest, getattr(args, 'output', None))}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
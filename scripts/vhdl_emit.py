@@ -0,0 +1,160 @@
+#########
+# Writes a designed coefficient set as a VHDL package (signed coefficient array, ACC_W sized from
+# the worst-case sum, FRAC) and the matching Python model configuration, so the RTL and
+# fir_model.py always use the same numbers.
+#
+# Usage (from the scripts folder):
+#   python vhdl_emit.py --coeff 683,1365,1365,683 --name fir_1221
+#   python vhdl_emit.py --design 2000 8000 40 --name fir_lp2k
+##################
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from coeff_design import explore
+from fir_model import FRAC, acc_width, wrap_signed
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+VHDL_DIR = os.path.join(REPO_DIR, "i2s_pMod_HowToUse_2.srcs", "sources_1", "new")
+PY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEADER = "THIS FILE IS GENERATED BY scripts/vhdl_emit.py: DO NOT EDIT BY HAND"
+
+
+def check_coeff(coeff, coeff_w):
+    """
+    Integer coefficients as an int64 array; raise if some of them do not fit in COEFF_W bits
+    (to_signed would silently wrap them).
+    """
+    coeff = np.asarray(coeff, dtype=np.int64)
+    bad = coeff[wrap_signed(coeff, coeff_w) != coeff]
+    if len(bad):
+        raise ValueError(f"Coefficients {bad.tolist()} do not fit in {coeff_w} bits")
+
+    return coeff
+
+
+def vhdl_package(coeff, package, data_w=24, coeff_w=12, frac=FRAC, acc_w=None):
+    """
+    Text of a VHDL package with the filter constants. The names have a FIR_ prefix so that they do
+    not clash with the generics of fir_MA (N_TAPS, ACC_W, ...) when the package is used.
+    """
+    coeff = check_coeff(coeff, coeff_w)
+    acc_w = acc_w or int(acc_width(coeff, data_w))
+    total = int(np.abs(coeff).sum())
+
+    values = ",\n".join(f"    {i} => to_signed({int(c)}, FIR_COEFF_W)" for i, c in enumerate(coeff))
+
+    return f"""-- {HEADER}
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+
+package {package} is
+
+  constant FIR_N_TAPS  : integer := {len(coeff)};
+  constant FIR_DATA_W  : integer := {data_w};
+  constant FIR_COEFF_W : integer := {coeff_w};
+  constant FIR_FRAC    : integer := {frac};  -- coefficients in Q0.{frac}: shift_right(acc, FIR_FRAC) after the sum
+  constant FIR_ACC_W   : integer := {acc_w};  -- worst case |acc| = 2**(DATA_W-1) * sum|coeff| = 2**{data_w - 1} * {total}
+
+  type fir_coeff_arr_t is array (0 to FIR_N_TAPS-1) of signed(FIR_COEFF_W-1 downto 0);
+
+  constant FIR_COEFFS : fir_coeff_arr_t := (
+{values}
+  );
+
+end package;
+"""
+
+
+def python_config(coeff, data_w=24, coeff_w=12, frac=FRAC, acc_w=None):
+    """
+    Text of the Python module with the same constants, for fir_model.fir_fixed_point.
+    """
+    coeff = check_coeff(coeff, coeff_w)
+    acc_w = acc_w or int(acc_width(coeff, data_w))
+
+    return f"""# {HEADER}
+# Usage: fir_fixed_point(x, COEFF, data_w=DATA_W, coeff_w=COEFF_W, acc_w=ACC_W, frac=FRAC)
+import numpy as np
+
+N_TAPS = {len(coeff)}
+DATA_W = {data_w}
+COEFF_W = {coeff_w}
+FRAC = {frac}
+ACC_W = {acc_w}
+COEFF = np.array({[int(c) for c in coeff]}, dtype=np.int64)
+"""
+
+
+def _write_atomic(path, text):
+    # write to a temporary file and rename it, so that a failed write never leaves a truncated source
+    tmp = path + f".{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def emit(coeff, name, vhdl_dir=VHDL_DIR, py_dir=PY_DIR, data_w=24, coeff_w=12, frac=FRAC, acc_w=None):
+    """
+    Write <vhdl_dir>/<name>_pkg.vhd (package <name>_pkg) and <py_dir>/<name>_config.py.
+    Both texts are generated (and the coefficients checked) before any file is touched.
+    Returns the two paths.
+    """
+    vhd = os.path.join(vhdl_dir, f"{name}_pkg.vhd")
+    py = os.path.join(py_dir, f"{name}_config.py")
+
+    vhd_text = vhdl_package(coeff, f"{name}_pkg", data_w, coeff_w, frac, acc_w)
+    py_text = python_config(coeff, data_w, coeff_w, frac, acc_w)
+
+    _write_atomic(vhd, vhd_text)
+    _write_atomic(py, py_text)
+
+    return vhd, py
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emit the VHDL package and Python config of a FIR design.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--coeff", help="comma separated integer coefficients (Q0.FRAC)")
+    src.add_argument("--design", nargs=3, type=float, metavar=("FPASS", "FSTOP", "ATTEN"),
+                     help="design the smallest filter meeting the spec (see coeff_design.py)")
+    parser.add_argument("--name", required=True, help="base name, e.g. fir_lp2k -> fir_lp2k_pkg.vhd")
+    parser.add_argument("--data-w", type=int, default=24)
+    parser.add_argument("--coeff-w", type=int, default=12)
+    parser.add_argument("--vhdl-dir", default=VHDL_DIR)
+    parser.add_argument("--py-dir", default=PY_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.coeff:
+            coeff = [int(c) for c in args.coeff.split(",")]
+        else:
+            _, best = explore(*args.design, coeff_w=args.coeff_w, data_w=args.data_w)
+            if best is None:
+                print("ERROR: no design meets the spec")
+                return 1
+            coeff = best["coeff"]
+
+        paths = emit(coeff, args.name, args.vhdl_dir, args.py_dir, args.data_w, args.coeff_w)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    for path in paths:
+        print(f"Written {path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())